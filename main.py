@@ -1,6 +1,19 @@
 # -*- coding: utf-8 -*-
-import os, sys, json, time, math, threading, tempfile, datetime, queue, shutil
-from collections import defaultdict
+import os, re, sys, ast, json, time, math, threading, tempfile, datetime, queue, shutil, sqlite3, hashlib, random
+import tracemalloc
+import functools
+import heapq
+import bisect
+import gzip
+import csv
+import base64
+import weakref
+import html as html_lib
+from collections import defaultdict, deque
+from collections.abc import MutableMapping
+from array import array
+from xml.sax.saxutils import escape as xml_escape, quoteattr
+import numpy as np
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from tkinter import font as tkfont
@@ -26,6 +39,14 @@ try:
 except Exception:
     HAVE_RAPIDFUZZ = False
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    HAVE_PYARROW = True
+except Exception:
+    HAVE_PYARROW = False
+
 # -------------------------
 # 全局配置
 # -------------------------
@@ -34,6 +55,10 @@ TEMP_DIR = os.path.join(tempfile.gettempdir(), "wmnt_pro_tmp")
 if not os.path.exists(TEMP_DIR):
     os.makedirs(TEMP_DIR, exist_ok=True)
 
+# 帖子库、基准基线等数据文件放在程序所在目录（打包后为 exe 所在目录），不随工作目录变化
+APP_DIR = os.path.dirname(os.path.abspath(sys.executable if getattr(sys, 'frozen', False) else __file__))
+STORE_PATH = os.environ.get("WMNT_STORE_PATH") or os.path.join(APP_DIR, "moments_store.db")
+
 LIKE_WEIGHT = 1
 COMMENT_WEIGHT = 2
 BG_COLOR = "#f5f5f5"
@@ -43,63 +68,404 @@ BUTTON_COLOR = "#0066cc"
 FONT_NAME = "Microsoft YaHei"
 FONT_SIZE_LOG = 12
 FONT_SIZE_LABEL = 11
+LOG_MAX_LINES = 5000        # 每个日志控件保留的最大行数
+LOG_FLUSH_BUDGET_MS = 30    # 每次刷新日志的时间预算（毫秒），超出部分留到下一次
+SEARCH_DISPLAY_LIMIT = 2000  # 检索结果在数据表中最多显示的行数
+NODE_TABLE_PAGE_SIZE = 500   # 关系图窗口节点表每页行数
 
 
 # -------------------------
 # UILogHandler
 # -------------------------
 class UILogHandler:
-    def __init__(self, data_text_widget, sys_text_widget):
+    """线程安全的日志队列，由主线程定时批量写入 Text 控件
+
+    每次刷新在 budget_ms 时间预算内取出消息，按控件合并为一次插入；
+    log_progress 的进度类消息在同一 key 连续出现时原地覆盖上一行；
+    控件只保留最近 max_lines 行。
+    """
+
+    def __init__(self, data_text_widget, sys_text_widget, max_lines=LOG_MAX_LINES, budget_ms=LOG_FLUSH_BUDGET_MS):
         self.data_widget = data_text_widget
         self.sys_widget = sys_text_widget
         self.queue = queue.Queue()
+        self.max_lines = max_lines
+        self.budget_ms = budget_ms
+        # 各控件最后一行若为进度消息，记录其 key，便于下次原地覆盖
+        self._tail_key = {"data": None, "sys": None}
 
     def log_data(self, msg):
-        self.queue.put(("data", str(msg)))
+        self.queue.put(("data", str(msg), time.time(), None))
 
     def log_sys(self, msg):
-        self.queue.put(("sys", str(msg)))
+        self.queue.put(("sys", str(msg), time.time(), None))
+
+    def log_progress(self, msg, key="progress", channel="sys"):
+        """进度类消息：同一 key 连续输出时只保留最新一行"""
+        self.queue.put((channel, str(msg), time.time(), key))
+
+    def pending(self):
+        return self.queue.qsize()
 
     def flush_to_widgets(self):
+        deadline = time.perf_counter() + self.budget_ms / 1000.0
+        batches = {"data": [], "sys": []}
         processed = 0
         while True:
             try:
-                typ, msg = self.queue.get_nowait()
+                typ, msg, t, key = self.queue.get_nowait()
             except queue.Empty:
                 break
-            ts = datetime.datetime.now().strftime("%H:%M:%S")
-            if typ == "data":
-                try:
-                    self.data_widget.configure(state='normal')
-                    self.data_widget.insert('end', f"[{ts}] {msg}\n")
-                    self.data_widget.see('end')
-                    self.data_widget.configure(state='disabled')
-                except Exception:
-                    pass
+            batch = batches["data" if typ == "data" else "sys"]
+            line = [key, f"[{time.strftime('%H:%M:%S', time.localtime(t))}] {msg}\n"]
+            if key is not None and batch and batch[-1][0] == key:
+                batch[-1] = line
             else:
+                batch.append(line)
+            processed += 1
+            if processed % 64 == 0 and time.perf_counter() > deadline:
+                break
+        for typ, widget in (("data", self.data_widget), ("sys", self.sys_widget)):
+            if batches[typ]:
                 try:
-                    self.sys_widget.configure(state='normal')
-                    self.sys_widget.insert('end', f"[{ts}] {msg}\n")
-                    self.sys_widget.see('end')
-                    self.sys_widget.configure(state='disabled')
+                    self._write(typ, widget, batches[typ])
                 except Exception:
                     pass
-            processed += 1
         return processed
 
+    def _write(self, typ, widget, batch):
+        at_bottom = widget.yview()[1] >= 0.999
+        widget.configure(state='normal')
+        if batch[0][0] is not None and batch[0][0] == self._tail_key[typ]:
+            widget.delete('end-1c -1l linestart', 'end-1c')
+        if len(batch) > self.max_lines:
+            batch = batch[-self.max_lines:]
+        widget.insert('end', "".join(text for _, text in batch))
+        self._tail_key[typ] = batch[-1][0]
+        excess = int(widget.index('end-1c').split('.')[0]) - 1 - self.max_lines
+        if excess > 0:
+            widget.delete('1.0', f'{excess + 1}.0')
+        if at_bottom:
+            widget.see('end')
+        widget.configure(state='disabled')
+
+
+# -------------------------
+# 性能剖析
+# -------------------------
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('prof', 'name', 'args', 't0', 'rss0', 'mem0', 'mem_peak')
+
+    def __init__(self, prof, name, args):
+        self.prof = prof
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.prof._enter(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.prof._exit(self, failed=exc[0] is not None)
+        return False
+
+
+class ProfileMark:
+    """Profiler.mark() 的返回值：累计其后的全部事件汇总，不受 max_events 限制
+
+    只被弱引用登记在 Profiler 中，调用方不再持有后自动停止累计。
+    """
+
+    __slots__ = ('seq', 'stats', '__weakref__')
+
+    def __init__(self, seq):
+        self.seq = seq
+        self.stats = {}
+
+
+def _accumulate_event(stats, ev):
+    """把一个事件计入按 span 名称的汇总 stats"""
+    st = stats.get(ev['name'])
+    if st is None:
+        st = stats[ev['name']] = {'calls': 0, 'total': 0.0, 'max': 0.0, 'mem_peak': None,
+                                  'rss_delta': 0, 'counters': defaultdict(int), 'first': ev['start']}
+    st['calls'] += 1
+    st['total'] += ev['dur']
+    st['max'] = max(st['max'], ev['dur'])
+    if 'mem_peak' in ev:
+        st['mem_peak'] = max(st['mem_peak'] or 0, ev['mem_peak'])
+    st['rss_delta'] += ev.get('rss_delta', 0)
+    for k, v in (ev.get('args') or {}).items():
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            st['counters'][k] += v
+
+
+class Profiler:
+    """阶段计时器：记录嵌套的 span、计数器与各阶段内存峰值
+
+    span 以 with PROFILER.span("构图") 包裹；计数器通过 count() 累加到当前 span 及全局。
+    track_memory=True 时借助 tracemalloc 统计每个 span 内的 Python 内存峰值（有额外开销），
+    否则只记录进程 RSS 的变化。按名称的汇总始终完整累计；事件明细只保留最近 max_events 条
+    （环形缓冲），更早的明细计入 dropped。
+    """
+
+    def __init__(self, enabled=True, track_memory=False, max_events=200000):
+        self.enabled = enabled
+        self.track_memory = track_memory
+        self.max_events = max_events
+        self.events = deque(maxlen=max_events)
+        self.counters = defaultdict(int)
+        self.dropped = 0
+        self.seq = 0                # 已记录的事件总数（单调递增，含已移出缓冲的明细）
+        self._totals = {}
+        self._marks = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._proc = psutil.Process()
+        self._epoch = time.perf_counter()
+
+    def _stack(self):
+        st = getattr(self._local, 'stack', None)
+        if st is None:
+            st = self._local.stack = []
+        return st
+
+    def set_memory_tracking(self, on):
+        self.track_memory = bool(on)
+        if on and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not on and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def _enter(self, sp):
+        stack = self._stack()
+        sp.mem0 = sp.mem_peak = None
+        if self.track_memory and tracemalloc.is_tracing():
+            cur, peak = tracemalloc.get_traced_memory()
+            if stack and stack[-1].mem_peak is not None:
+                stack[-1].mem_peak = max(stack[-1].mem_peak, peak)
+            if hasattr(tracemalloc, 'reset_peak'):   # Python 3.9+；更早版本峰值为全局峰值
+                tracemalloc.reset_peak()
+            sp.mem0 = sp.mem_peak = cur
+        try:
+            sp.rss0 = self._proc.memory_info().rss
+        except Exception:
+            sp.rss0 = None
+        stack.append(sp)
+        sp.t0 = time.perf_counter()
+
+    def _exit(self, sp, failed=False):
+        t1 = time.perf_counter()
+        stack = self._stack()
+        if stack and stack[-1] is sp:
+            stack.pop()
+        event = {'name': sp.name, 'start': sp.t0 - self._epoch, 'dur': t1 - sp.t0,
+                 'tid': threading.get_ident(), 'depth': len(stack)}
+        if sp.mem0 is not None and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            sp.mem_peak = max(sp.mem_peak, peak)
+            event['mem_peak'] = sp.mem_peak - sp.mem0
+            if stack and stack[-1].mem_peak is not None:
+                stack[-1].mem_peak = max(stack[-1].mem_peak, sp.mem_peak)
+        if sp.rss0 is not None:
+            try:
+                event['rss_delta'] = self._proc.memory_info().rss - sp.rss0
+            except Exception:
+                pass
+        if failed:
+            event['failed'] = True
+        if sp.args:
+            event['args'] = sp.args
+        self._append(event)
+
+    def _append(self, event):
+        with self._lock:
+            if len(self.events) == self.max_events:
+                self.dropped += 1
+            self.events.append(event)
+            self.seq += 1
+            _accumulate_event(self._totals, event)
+            for mark in self._marks:
+                _accumulate_event(mark.stats, event)
+
+    def record(self, name, start, end, **args):
+        """补记一个已结束的区间（如进程池中执行的任务），start/end 为 perf_counter 时间"""
+        if not self.enabled:
+            return
+        event = {'name': name, 'start': start - self._epoch, 'dur': end - start,
+                 'tid': threading.get_ident(), 'depth': len(self._stack())}
+        if args:
+            event['args'] = args
+        self._append(event)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += n
+        stack = self._stack()
+        if stack:
+            sp = stack[-1]
+            sp.args[name] = sp.args.get(name, 0) + n
+
+    def mark(self):
+        """返回 ProfileMark，供 summary(since=...) 只汇总其后的事件（明细被丢弃后依然完整）"""
+        with self._lock:
+            mark = ProfileMark(self.seq)
+            self._marks.add(mark)
+            return mark
+
+    def reset(self):
+        with self._lock:
+            self.events = deque(maxlen=self.max_events)
+            self.counters = defaultdict(int)
+            self.dropped = 0
+            self._totals = {}
+            for mark in self._marks:
+                mark.stats = {}
+
+    def _events_since(self, since):
+        """缓冲中序号不小于 since（事件序号或 ProfileMark）的事件明细"""
+        seq = since.seq if isinstance(since, ProfileMark) else since
+        with self._lock:
+            start = max(0, seq - (self.seq - len(self.events)))
+            return [ev for i, ev in enumerate(self.events) if i >= start]
+
+    def summary(self, since=0):
+        """按 span 名称汇总：次数、总耗时、最大耗时、内存峰值与计数器
+
+        since 为 ProfileMark 或 0 时来自完整的累计汇总；为其他整数时按缓冲中的事件明细现场汇总。
+        """
+        if isinstance(since, ProfileMark) or not since:
+            with self._lock:
+                src = since.stats if isinstance(since, ProfileMark) else self._totals
+                return {name: dict(st, counters=defaultdict(int, st['counters'])) for name, st in src.items()}
+        stats = {}
+        for ev in self._events_since(since):
+            _accumulate_event(stats, ev)
+        return stats
+
+    def summary_lines(self, since=0):
+        stats = self.summary(since)
+        lines = []
+        for name, st in sorted(stats.items(), key=lambda kv: kv[1]['first']):
+            line = f"{name}: {st['calls']} 次，共 {st['total']:.3f}s"
+            if st['calls'] > 1:
+                line += f"，最长 {st['max']:.3f}s"
+            if st['mem_peak'] is not None:
+                line += f"，内存峰值 {st['mem_peak'] / 1048576:.1f}MB"
+            elif st['rss_delta']:
+                line += f"，RSS 变化 {st['rss_delta'] / 1048576:+.1f}MB"
+            if st['counters']:
+                line += "，" + "，".join(f"{k}={v:g}" for k, v in st['counters'].items())
+            lines.append(line)
+        return lines
+
+    def log_summary(self, log_sys, title="性能统计", since=0):
+        if not log_sys or not self.enabled:
+            return
+        lines = self.summary_lines(since)
+        if not lines:
+            return
+        log_sys(f"{title}：")
+        for line in lines:
+            log_sys("  " + line)
+
+    def export_json(self, path, since=0):
+        """导出汇总与事件明细为 JSON"""
+        events = self._events_since(since)
+        with self._lock:
+            counters = dict(self.counters)
+        stats = self.summary(since)
+        for st in stats.values():
+            st['counters'] = dict(st['counters'])
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': stats, 'counters': counters, 'events': events, 'dropped': self.dropped},
+                      f, ensure_ascii=False, indent=2)
+
+    def export_chrome_trace(self, path, since=0):
+        """导出 Chrome Trace 格式（chrome://tracing 或 Perfetto 打开）"""
+        events = self._events_since(since)
+        pid = os.getpid()
+        trace = []
+        for ev in events:
+            args = dict(ev.get('args') or {})
+            for k in ('mem_peak', 'rss_delta', 'failed'):
+                if k in ev:
+                    args[k] = ev[k]
+            trace.append({'name': ev['name'], 'cat': ev['name'].split('.', 1)[0], 'ph': 'X', 'pid': pid,
+                          'tid': ev['tid'], 'ts': ev['start'] * 1e6, 'dur': ev['dur'] * 1e6, 'args': args})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+
+
+PROFILER = Profiler()
+
+
+def profiled(name):
+    """装饰器：整个函数调用记为一个 span"""
+    def deco(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with PROFILER.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return deco
+
 
 # -------------------------
 # 微信采集相关
 # -------------------------
-def get_wechat_pid():
+def get_wechat_pids():
+    """列出所有 WeChat.exe 进程号（每个已登录账号一个进程）"""
+    pids = []
     for proc in psutil.process_iter(['pid', 'name']):
         try:
             name = proc.info.get('name') or ''
             if name.lower() == 'wechat.exe':
-                return proc.info['pid']
+                pids.append(proc.info['pid'])
         except Exception:
             continue
-    return None
+    return pids
+
+
+def get_wechat_pid():
+    pids = get_wechat_pids()
+    return pids[0] if pids else None
+
+
+def list_wechat_accounts():
+    """枚举微信进程及其窗口标题，返回 [{'name', 'pid', 'windows'}]"""
+    accounts = []
+    for pid in get_wechat_pids():
+        titles = []
+        try:
+            app = Application(backend='uia').connect(process=pid)
+            titles = [w.window_text() for w in app.windows() if w.window_text()]
+        except Exception:
+            pass
+        accounts.append({'name': f"微信[{pid}]", 'pid': pid, 'windows': titles})
+    return accounts
 
 
 def extract_likes_from_element(post_element):
@@ -162,9 +528,9 @@ def extract_comments_from_element(post_element):
         return []
 
 
-def parse_moments_collect(target_count=100, timeout=5, progress_callback=None, log_sys=None, log_data=None):
-    if log_sys: log_sys(f"开始采集（目标 {target_count} 条，超时 {timeout}s）")
-    pid = get_wechat_pid()
+def _locate_moments_list(pid=None):
+    """连接微信进程（默认第一个）并定位朋友圈列表控件"""
+    pid = pid or get_wechat_pid()
     if not pid:
         raise RuntimeError("未检测到 WeChat.exe 进程，请启动微信桌面客户端。")
     app = Application(backend='uia').connect(process=pid)
@@ -192,15 +558,86 @@ def parse_moments_collect(target_count=100, timeout=5, progress_callback=None, l
             moments_list = None
     if not moments_list:
         raise RuntimeError("朋友圈列表控件未找到，请确保页面处于朋友圈界面（中文）。")
+    return moments_list
+
+
+@profiled("采集")
+def parse_moments_collect(target_count=100, timeout=5, progress_callback=None, log_sys=None, log_data=None,
+                          pid=None, source=None, scroll_delay=0.45, on_post=None):
+    """从朋友圈列表采集动态
+
+    pid 指定微信进程（多账号时）；source 可直接传入列表控件或 ReplayMomentsList 回放源，
+    此时不连接微信。on_post 在每采集到一条时调用（如增量建立全文索引）。
+    """
+    if log_sys: log_sys(f"开始采集（目标 {target_count} 条，超时 {timeout}s）")
+    if source is not None:
+        moments_list = source
+    else:
+        with PROFILER.span("采集.连接微信"):
+            moments_list = _locate_moments_list(pid)
     all_posts = []
+    try:
+        _collect_loop(moments_list, all_posts, target_count, timeout, progress_callback, log_sys, log_data,
+                      scroll_delay, on_post)
+    except TaskCancelled:
+        # 采集被取消时保留已采集的数据
+        if log_sys: log_sys(f"采集已取消，保留已采集的 {len(all_posts)} 条。")
+    if log_sys: log_sys(f"采集结束，共 {len(all_posts)} 条。")
+    return all_posts
+
+
+# 列表项中的图片提示行（如"包含3张图片"）；采集时以" (包含N张图片)"后缀并入内容。
+# 回放还原与帖子指纹都由同一模式派生，保证三处识别一致
+_IMAGE_NOTICE = r'包含\d+张图片'
+_IMAGE_NOTICE_LINE_RE = re.compile(_IMAGE_NOTICE)
+_IMAGE_SUFFIX_RE = re.compile(rf'\s*\(({_IMAGE_NOTICE})\)$')
+_IMAGE_NOTICE_RE = re.compile(rf'\(?{_IMAGE_NOTICE}\)?')
+
+# 多账号并行采集时各子进程共享的焦点锁（见 _init_collector_process）；单进程采集时为 None
+_FOCUS_LOCK = None
+
+
+def _scroll_down(moments_list, use_pattern=False):
+    """列表向下滚动一行
+
+    默认发送方向键（需先把窗口置前）；use_pattern 为真时（多账号并行采集）先用 UIA ScrollPattern，
+    不需要窗口焦点，多个微信同时采集时互不干扰，控件不支持时同样退回方向键，
+    多进程之间用 _FOCUS_LOCK 串行"置前 + 按键"。
+    """
+    if use_pattern:
+        try:
+            moments_list.scroll("down", "line")
+            return
+        except Exception:
+            pass
+    lock = _FOCUS_LOCK
+    if lock is not None:
+        lock.acquire()
+    try:
+        moments_list.type_keys("{DOWN}")
+    except Exception:
+        pass
+    finally:
+        if lock is not None:
+            lock.release()
+
+
+def _collect_loop(moments_list, all_posts, target_count, timeout, progress_callback, log_sys, log_data,
+                  scroll_delay=0.45, on_post=None):
+    """滚动朋友圈列表逐条采集，结果追加到 all_posts"""
     seen = set()
-    scroll_delay = 0.45
     last_new = time.time()
+    collected_at = time.time()
+    # 仅并行采集时用 ScrollPattern；部分控件的 line 滚动不推进列表，一旦滚动后没有新条目就改回方向键
+    use_pattern = _FOCUS_LOCK is not None
     while len(all_posts) < target_count:
-        try:
-            posts = moments_list.children(control_type="ListItem")
-        except Exception:
-            posts = []
+        checkpoint()
+        with PROFILER.span("采集.遍历列表"):
+            try:
+                posts = moments_list.children(control_type="ListItem")
+            except Exception:
+                posts = []
+        PROFILER.count("列表项", len(posts))
         new_found = False
         for p in posts:
             try:
@@ -208,7 +645,9 @@ def parse_moments_collect(target_count=100, timeout=5, progress_callback=None, l
             except Exception:
                 continue
             if not text or text in seen:
+                PROFILER.count("重复项")
                 continue
+            checkpoint()
             seen.add(text)
             new_found = True
             last_new = time.time()
@@ -216,15 +655,23 @@ def parse_moments_collect(target_count=100, timeout=5, progress_callback=None, l
             if len(lines) < 2:
                 continue
             publisher = lines[0].rstrip(':').strip()
-            content = lines[1]
             time_str = lines[-1]
-            if len(lines) >= 3 and "包含" in lines[-2] and "图片" in lines[-2]:
-                content += " (" + lines[-2] + ")"
-            likes = extract_likes_from_element(p) or ""
-            comments = extract_comments_from_element(p) or []
+            # 列表项文本为"发布者 / 正文 / [包含N张图片] / 时间"，纯图片帖没有正文行
+            body = lines[1:-1]
+            notice = body.pop() if body and _IMAGE_NOTICE_LINE_RE.fullmatch(body[-1]) else ""
+            content = body[0] if body else ""
+            if notice:
+                content = f"{content} ({notice})" if content else f"({notice})"
+            with PROFILER.span("采集.点赞提取"):
+                likes = extract_likes_from_element(p) or ""
+            with PROFILER.span("采集.评论提取"):
+                comments = extract_comments_from_element(p) or []
+            PROFILER.count("动态")
             item = {"编号": len(all_posts) + 1, "发布者": publisher, "内容": content, "时间": time_str, "点赞": likes,
-                    "评论": comments}
+                    "评论": comments, "时间戳": parse_wechat_time(time_str, collected_at)}
             all_posts.append(item)
+            if on_post:
+                on_post(item)
             if progress_callback:
                 try:
                     progress_callback(len(all_posts), target_count)
@@ -233,24 +680,1468 @@ def parse_moments_collect(target_count=100, timeout=5, progress_callback=None, l
             if log_data: log_data(f"采集到第 {len(all_posts)} 条：{publisher}")
             if len(all_posts) >= target_count:
                 break
-        try:
-            moments_list.type_keys("{DOWN}")
-        except Exception:
-            pass
-        time.sleep(scroll_delay)
+        if use_pattern and not new_found:
+            use_pattern = False
+            if log_sys: log_sys("列表滚动未带来新动态，改用方向键滚动。")
+        with PROFILER.span("采集.滚动等待"):
+            _scroll_down(moments_list, use_pattern)
+            time.sleep(scroll_delay)
+        PROFILER.count("滚动")
         if time.time() - last_new > timeout:
             if log_sys: log_sys(f"超时 {timeout}s 未发现新动态，停止采集。")
             break
-    if log_sys: log_sys(f"采集结束，共 {len(all_posts)} 条。")
-    return all_posts
+
+
+# -------------------------
+# 离线回放与多账号采集
+# -------------------------
+class _ReplayElementInfo:
+    __slots__ = ('control_type', 'name')
+
+    def __init__(self, control_type, name):
+        self.control_type = control_type
+        self.name = name
+
+
+class ReplayElement:
+    """模拟 pywinauto UIA 控件的最小接口（element_info / children / window_text）"""
+
+    __slots__ = ('element_info', '_children')
+
+    def __init__(self, control_type, name="", children=()):
+        self.element_info = _ReplayElementInfo(control_type, name)
+        self._children = list(children)
+
+    def children(self, control_type=None):
+        if control_type is None:
+            return list(self._children)
+        return [c for c in self._children if c.element_info.control_type == control_type]
+
+    def window_text(self):
+        return self.element_info.name
+
+
+class ReplayMomentsList(ReplayElement):
+    """离线回放源：把已保存的帖子还原成朋友圈列表控件树，供采集流程在无微信环境下运行
+
+    每条帖子生成一个 ListItem，文本与真实列表项相同："发布者\n正文\n包含N张图片\n时间"
+    （内容末尾的"(包含N张图片)"还原为单独一行，正文或图片行为空时省略），下挂点赞 Text 与
+    "评论" List；每次 type_keys("{DOWN}") 向下滚动 step 条，可见窗口为 page_size 条。
+    scroll（ScrollPattern）在 scroll_advances 为假时不推进列表，用于模拟 line 滚动无效的控件。
+    采集结果再次回放得到的帖子与原文件相同。
+    """
+
+    __slots__ = ('posts', 'page_size', 'step', 'pos', 'scroll_advances', '_items')
+
+    def __init__(self, posts, page_size=6, step=2, scroll_advances=True):
+        super().__init__("List", "朋友圈")
+        self.posts = posts
+        self.page_size = page_size
+        self.step = step
+        self.pos = 0
+        self.scroll_advances = scroll_advances
+        self._items = {}
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """从导出的 JSON / Excel / CSV / Parquet 帖子文件构造回放源"""
+        return cls(load_posts_file(path), **kwargs)
+
+    def _item(self, i):
+        item = self._items.get(i)
+        if item is None:
+            post = self.posts[i]
+            content = str(post.get('内容', '') or '').strip()
+            m = _IMAGE_SUFFIX_RE.search(content)
+            lines = [str(post.get('发布者', '') or '')]
+            lines += [content[:m.start()], m.group(1)] if m else [content]
+            lines.append(str(post.get('时间', '') or ''))
+            text = "\n".join(line for line in lines if line)
+            comments = post.get('评论', []) or []
+            if not isinstance(comments, list):
+                comments = _decode_comment_cell(comments)
+            kids = []
+            likes = post.get('点赞', '')
+            if isinstance(likes, str) and likes:
+                kids.append(ReplayElement("Text", likes))
+            if comments:
+                kids.append(ReplayElement("List", "评论", [ReplayElement("ListItem", str(c)) for c in comments]))
+            item = self._items[i] = ReplayElement("ListItem", text, [ReplayElement("Pane", "", kids)])
+        return item
+
+    def children(self, control_type=None):
+        if control_type not in (None, "ListItem"):
+            return []
+        end = min(len(self.posts), self.pos + self.page_size)
+        return [self._item(i) for i in range(self.pos, end)]
+
+    def _advance(self, n):
+        self.pos = min(self.pos + n, max(0, len(self.posts) - 1))
+
+    def scroll(self, direction, amount, count=1):
+        if direction == "down" and self.scroll_advances:
+            self._advance(self.step * count)
+
+    def type_keys(self, keys):
+        if keys == "{DOWN}":
+            self._advance(self.step)
+
+
+def _init_collector_process(focus_lock):
+    global _FOCUS_LOCK
+    _FOCUS_LOCK = focus_lock
+
+
+def _collect_account(account, target_count, timeout, scroll_delay):
+    """单个账号的采集任务（在子进程中运行），返回 (账号名, posts, 耗时)"""
+    t0 = time.perf_counter()
+    source = ReplayMomentsList.from_file(account['replay']) if account.get('replay') else None
+    posts = parse_moments_collect(target_count=target_count, timeout=timeout, pid=account.get('pid'),
+                                  source=source, scroll_delay=scroll_delay)
+    for post in posts:
+        post['账号'] = account['name']
+    return account['name'], posts, time.perf_counter() - t0
+
+
+def collect_accounts(accounts, target_count=100, timeout=5, store_path=None, scroll_delay=0.45,
+                     max_workers=None, log_sys=None):
+    """多账号并行采集：每个账号一个子进程，结果按帖子指纹去重合并
+
+    accounts 为 [{'name', 'pid'}] 或 [{'name', 'replay': 帖子文件路径}]（离线回放）；
+    store_path 不为空时各账号结果分别以 "collect:<账号>" 会话写入帖子库。
+    任务被取消时结束仍在采集的子进程，已完成账号的结果照常合并入库后返回（与单账号采集一致）。
+    返回 (合并后的 posts, 各账号统计列表)，统计中的"状态"为 完成 / 失败 / 已取消。
+    """
+    import concurrent.futures as cf
+    import multiprocessing
+    if not accounts:
+        return [], []
+    results = {}
+    pool = cf.ProcessPoolExecutor(max_workers=max_workers or len(accounts), initializer=_init_collector_process,
+                                  initargs=(multiprocessing.Lock(),))
+    cancelled = False
+    try:
+        # 结果按账号序号登记：回放等场景下账号名可能重复，按名登记会互相覆盖
+        futures = {pool.submit(_collect_account, acc, target_count, timeout, scroll_delay): i
+                   for i, acc in enumerate(accounts)}
+        pending = set(futures)
+        while pending:
+            checkpoint()
+            finished, pending = cf.wait(pending, timeout=0.2, return_when=cf.FIRST_COMPLETED)
+            for fut in finished:
+                i = futures[fut]
+                acc = accounts[i]
+                try:
+                    name, posts, elapsed = fut.result()
+                    results[i] = (posts, elapsed, "完成")
+                    if log_sys: log_sys(f"账号 {name} 采集完成：{len(posts)} 条，用时 {elapsed:.1f}s")
+                except Exception as e:
+                    results[i] = ([], 0.0, "失败")
+                    if log_sys: log_sys(f"账号 {acc['name']} 采集失败：{e}")
+    except TaskCancelled:
+        cancelled = True
+        if log_sys: log_sys(f"多账号采集已取消，保留已完成的 {len(results)} 个账号。")
+    finally:
+        _shutdown_pool(pool, cancelled, log_sys=log_sys)
+
+    merged, seen, stats = [], set(), []
+    with CancelShield(cancelled):
+        for i, acc in enumerate(accounts):
+            posts, elapsed, status = results.get(i, ([], 0.0, "已取消"))
+            new = 0
+            for post in posts:
+                fp = post_fingerprint(post)
+                if fp in seen:
+                    continue
+                seen.add(fp)
+                post = dict(post)
+                post['编号'] = len(merged) + 1
+                merged.append(post)
+                new += 1
+            stats.append({'账号': acc['name'], '状态': status, '采集条数': len(posts), '新增条数': new,
+                          '用时': round(elapsed, 2), '条/秒': round(len(posts) / elapsed, 2) if elapsed else 0.0})
+            if store_path and posts:
+                with PostStore(store_path) as store:
+                    store.upsert_posts(posts, source=f"collect:{acc['name']}")
+    if log_sys:
+        for st in stats:
+            log_sys(f"账号 {st['账号']}（{st['状态']}）：采集 {st['采集条数']} 条，去重后新增 {st['新增条数']} 条，"
+                    f"{st['条/秒']} 条/秒")
+        log_sys(f"多账号采集合并完成：共 {len(merged)} 条（去重前 {sum(st['采集条数'] for st in stats)} 条）")
+    return merged, stats
+
+
+# -------------------------
+# 互动数据规范化
+# -------------------------
+KIND_LIKE = "点赞"
+KIND_COMMENT = "评论"
+KIND_REPLY = "回复"
+
+
+def split_likers(likes_raw):
+    """拆分点赞字符串（兼容中文逗号与顿号）"""
+    if not isinstance(likes_raw, str) or not likes_raw.strip():
+        return []
+    return [x.strip() for x in likes_raw.replace('、', '，').split('，') if x.strip()]
+
+
+# 评论头部"评论者[回复被回复者]"的拆分规则，预编译一次；头部在数据中大量重复，解析结果按头部缓存
+_RE_REPLY_HEAD = re.compile(r'\s*(.*?)\s*回复\s*(.*?)\s*$', re.S)
+_COMMENT_HEAD_CACHE = {}
+_COMMENT_HEAD_CACHE_MAX = 200000
+
+
+def _split_comment_head(head):
+    m = _RE_REPLY_HEAD.match(head)
+    if m:
+        return m.group(1), (m.group(2) or None)
+    return head.strip(), None
+
+
+def _comment_colon(comment):
+    """首个冒号位置（半角/全角取靠前者），没有返回 -1"""
+    i = comment.find(':')
+    j = comment.find('：')
+    if j != -1 and (i == -1 or j < i):
+        return j
+    return i
+
+
+def parse_comment_head(comment):
+    """解析评论者与被回复者，返回 (评论者, 被回复者或 None)
+
+    "A: 内容"、"A：内容"、"A回复B: 内容" 均可识别；没有冒号时按空白切分，
+    首段视为评论者。
+    """
+    i = _comment_colon(comment)
+    if i != -1:
+        head = comment[:i]
+    else:
+        parts = comment.split(None, 1)
+        head = parts[0] if parts else ''
+    r = _COMMENT_HEAD_CACHE.get(head)
+    if r is None:
+        if len(_COMMENT_HEAD_CACHE) >= _COMMENT_HEAD_CACHE_MAX:
+            _COMMENT_HEAD_CACHE.clear()
+        r = _COMMENT_HEAD_CACHE[head] = _split_comment_head(head)
+    return r
+
+
+def parse_comment(comment):
+    """解析评论，返回 (评论者, 被回复者或 None, 内容)"""
+    author, replied = parse_comment_head(comment)
+    i = _comment_colon(comment)
+    if i != -1:
+        return author, replied, comment[i + 1:].strip()
+    parts = comment.split(None, 1)
+    return author, replied, parts[1].strip() if len(parts) > 1 else ''
+
+
+def comment_author(comment):
+    """提取评论者名称（回复评论返回回复者本人）"""
+    return parse_comment_head(comment)[0]
+
+
+def benchmark_comment_parser(n=2000000, log_sys=None):
+    """评论解析吞吐基准：对比 parse_comment_head 与旧版逐次 split 的写法"""
+    samples = ["张三: 拍得真好！", "李四：在哪里拍的？", "王五回复张三: 就在楼下", "赵六回复李四：同问",
+               "小明 哈哈哈", "Alice: nice~", "陈七回复 王五 ：好的", "周八: 时间 12:30 见"]
+    comments = [samples[i % len(samples)] + str(i % 97) for i in range(n)]
+
+    def legacy(comment):
+        if ':' in comment:
+            author = comment.split(':', 1)[0].strip()
+        elif '：' in comment:
+            author = comment.split('：', 1)[0].strip()
+        else:
+            parts = comment.split(None, 1)
+            author = parts[0].strip() if parts else comment.strip()
+        if '回复' in author:
+            a, b = author.split('回复', 1)
+            return a.strip(), b.strip()
+        return author, None
+
+    result = {'comments': n}
+    for label, fn in (('parser', parse_comment_head), ('legacy', legacy)):
+        t0 = time.perf_counter()
+        for c in comments:
+            fn(c)
+        elapsed = time.perf_counter() - t0
+        result[f'{label}_seconds'] = elapsed
+        result[f'{label}_per_sec'] = n / elapsed if elapsed else float('inf')
+        if log_sys: log_sys(f"评论解析基准 [{label}]：{n} 条，用时 {elapsed:.2f}s，{n / max(elapsed, 1e-9):,.0f} 条/秒")
+    return result
+
+
+def post_id(post, idx):
+    """取帖子编号，缺失或非法时退回序号"""
+    try:
+        return int(post.get('编号'))
+    except (TypeError, ValueError):
+        return idx + 1
+
+
+def iter_interactions(all_posts):
+    """逐条产出 (编号, 对象, 互动者, 类型)，名称保持原样（未做别名映射）
+
+    对象：点赞/评论时为发布者；"A回复B"类评论类型为回复，对象为被回复者 B。
+    """
+    for idx, post in enumerate(all_posts):
+        pid = post_id(post, idx)
+        if isinstance(post, PostRecord) and not post.extra:
+            # 紧凑记录已预先拆分点赞、解析评论，直接读取，无需重新渲染再解析
+            pub = post.publisher_name.strip()
+            for liker in post.liker_names():
+                yield pid, pub, liker, KIND_LIKE
+            for author, replied, _ in post.comment_tuples():
+                if not author:
+                    continue
+                if replied:
+                    yield pid, replied, author, KIND_REPLY
+                else:
+                    yield pid, pub, author, KIND_COMMENT
+            continue
+        pub = str(post.get('发布者', '') or '').strip()
+        for liker in split_likers(post.get('点赞', '')):
+            yield pid, pub, liker, KIND_LIKE
+        for comment in post.get('评论', []) or []:
+            if not comment:
+                continue
+            author, replied = parse_comment_head(comment)
+            if not author:
+                continue
+            if replied:
+                yield pid, replied, author, KIND_REPLY
+            else:
+                yield pid, pub, author, KIND_COMMENT
+
+
+def iter_typed_interactions(all_posts):
+    """逐条产出有向互动 (编号, 源, 目标, 类型)
+
+    点赞：点赞者→发布者；评论：评论者→发布者；回复：回复者→被回复者。
+    """
+    for pid, target, actor, kind in iter_interactions(all_posts):
+        yield pid, actor, target, kind
+
+
+# -------------------------
+# 紧凑帖子记录
+# -------------------------
+class NameTable:
+    """参与者名称驻留表：同一数据集内的名称只存一份，记录中以整数 id 引用"""
+
+    __slots__ = ('names', 'ids')
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def id(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            name = sys.intern(name)
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+
+class _Missing:
+    """缺失字段标记；按模块全局名序列化，跨进程传递记录后仍是同一对象"""
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        return '_MISSING'
+
+    def __repr__(self):
+        return '<missing>'
+
+
+_MISSING = _Missing()
+_RECORD_KEYS = ("编号", "发布者", "内容", "时间", "点赞", "评论", "时间戳")
+
+
+class PostRecord(MutableMapping):
+    """紧凑帖子记录，按 dict 接口（get / [] / keys / items）与原有代码兼容
+
+    发布者、点赞者、评论者存为 NameTable 中的 id；点赞预先拆分为 id 数组，
+    评论预先解析为 (评论者, 被回复者, 内容) 三列，没有回复时被回复者列为 None。原始点赞/评论文本只有在无法
+    由解析结果原样还原时才额外保留，to_dict() 与原 JSON 结构逐字段一致。
+    """
+
+    __slots__ = ('table', 'pid', 'publisher', 'content', 'time', 'ts', 'likers', 'likes_raw',
+                 'c_authors', 'c_replied', 'c_texts', 'comments_raw', 'extra')
+
+    def __init__(self, table):
+        self.table = table
+        self.pid = self.publisher = self.content = self.time = self.ts = _MISSING
+        self.likers = self.c_authors = self.c_replied = None
+        self.likes_raw = self.comments_raw = None
+        self.c_texts = ()
+        self.extra = None
+
+    # ---- 构造与还原 ----
+    @classmethod
+    def from_dict(cls, post, table):
+        rec = cls(table)
+        for key, val in post.items():
+            rec[key] = val
+        return rec
+
+    def to_dict(self):
+        return {k: self[k] for k in self}
+
+    # ---- 字段编解码 ----
+    def _set_likes(self, val):
+        names = split_likers(val)
+        self.likers = array('i', [self.table.id(n) for n in names]) if names else ()
+        self.likes_raw = None if "，".join(names) == val else val
+
+    def _likes_str(self):
+        if self.likes_raw is not None:
+            return self.likes_raw
+        names = self.table.names
+        return "，".join([names[i] for i in self.likers])
+
+    def _set_comments(self, comments):
+        authors, replied, texts, raw_needed = array('i'), array('i'), [], False
+        for c in comments:
+            author, rep, text = parse_comment(c)
+            authors.append(self.table.id(author))
+            replied.append(self.table.id(rep) if rep else -1)
+            texts.append(sys.intern(text) if len(text) <= 8 else text)
+            if not raw_needed and self._render_comment(author, rep, text) != c:
+                raw_needed = True
+        if not authors:
+            authors = ()
+        if not any(r >= 0 for r in replied):
+            replied = None
+        self.c_authors, self.c_replied, self.c_texts = authors, replied, tuple(texts)
+        self.comments_raw = tuple(comments) if raw_needed else None
+
+    @staticmethod
+    def _render_comment(author, replied, text):
+        return f"{author}回复{replied}: {text}" if replied else f"{author}: {text}"
+
+    def _comments_list(self):
+        if self.comments_raw is not None:
+            return list(self.comments_raw)
+        return [self._render_comment(a, r, t) for a, r, t in self.comment_tuples()]
+
+    # ---- 预解析数据的直接访问 ----
+    @property
+    def publisher_name(self):
+        return self.table.names[self.publisher] if self.publisher is not _MISSING else ''
+
+    def liker_names(self):
+        names = self.table.names
+        return [names[i] for i in self.likers] if self.likers is not None else []
+
+    def comment_tuples(self):
+        """[(评论者, 被回复者或 None, 内容)]，与 parse_comment 结果一致"""
+        if self.c_authors is None:
+            return []
+        names = self.table.names
+        if self.c_replied is None:
+            return [(names[a], None, t) for a, t in zip(self.c_authors, self.c_texts)]
+        return [(names[a], names[r] if r >= 0 else None, t)
+                for a, r, t in zip(self.c_authors, self.c_replied, self.c_texts)]
+
+    # ---- MutableMapping 接口 ----
+    def __getitem__(self, key):
+        if key == "编号":
+            val = self.pid
+        elif key == "发布者":
+            val = self.table.names[self.publisher] if self.publisher is not _MISSING else _MISSING
+        elif key == "内容":
+            val = self.content
+        elif key == "时间":
+            val = self.time
+        elif key == "点赞":
+            val = self._likes_str() if self.likers is not None else _MISSING
+        elif key == "评论":
+            val = self._comments_list() if self.c_authors is not None else _MISSING
+        elif key == "时间戳":
+            val = self.ts
+        else:
+            val = self.extra.get(key, _MISSING) if self.extra else _MISSING
+        if val is _MISSING:
+            if self.extra and key in self.extra:
+                return self.extra[key]
+            raise KeyError(key)
+        return val
+
+    def __setitem__(self, key, val):
+        self._clear(key)
+        if key == "编号":
+            self.pid = val
+        elif key == "发布者" and isinstance(val, str):
+            self.publisher = self.table.id(val)
+        elif key == "内容" and isinstance(val, str):
+            self.content = val
+        elif key == "时间" and isinstance(val, str):
+            self.time = sys.intern(val)
+        elif key == "点赞" and isinstance(val, str):
+            self._set_likes(val)
+        elif key == "评论" and isinstance(val, list) and all(isinstance(c, str) for c in val):
+            self._set_comments(val)
+        elif key == "时间戳":
+            self.ts = val
+        else:
+            # 类型不符合约定的字段原样保存，保证还原无损
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = val
+
+    def _clear(self, key):
+        if key == "编号":
+            self.pid = _MISSING
+        elif key == "发布者":
+            self.publisher = _MISSING
+        elif key == "内容":
+            self.content = _MISSING
+        elif key == "时间":
+            self.time = _MISSING
+        elif key == "点赞":
+            self.likers = self.likes_raw = None
+        elif key == "评论":
+            self.c_authors = self.c_replied = self.comments_raw = None
+            self.c_texts = ()
+        elif key == "时间戳":
+            self.ts = _MISSING
+        if self.extra and key in self.extra:
+            del self.extra[key]
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._clear(key)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        # 标量字段只以 _MISSING 表示缺失，None 是合法取值（与 __getitem__ 一致）；点赞/评论未设置时预解析数组为 None
+        present = (self.pid, self.publisher, self.content, self.time,
+                   _MISSING if self.likers is None else self.likers,
+                   _MISSING if self.c_authors is None else self.c_authors, self.ts)
+        for key, val in zip(_RECORD_KEYS, present):
+            if val is not _MISSING or (self.extra and key in self.extra):
+                yield key
+        if self.extra:
+            for key in self.extra:
+                if key not in _RECORD_KEYS:
+                    yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"PostRecord({self.to_dict()!r})"
+
+
+def to_records(posts, table=None):
+    """dict 帖子列表转换为 PostRecord 列表（已是 PostRecord 的原样保留），共享一个 NameTable"""
+    table = table or NameTable()
+    return [p if isinstance(p, PostRecord) else PostRecord.from_dict(p, table) for p in posts]
+
+
+def to_dicts(posts):
+    """PostRecord 列表还原为原 JSON 结构的 dict 列表"""
+    return [p.to_dict() if isinstance(p, PostRecord) else p for p in posts]
+
+
+# -------------------------
+# 人员互动索引
+# -------------------------
+class PersonIndex:
+    """人员倒排索引：人员 → 发布/点赞/评论/回复过的帖子编号；关系（无向边）→ 支撑该关系的帖子编号
+
+    名称规范化规则与 build_interaction_graph 一致（别名映射、过滤自环与未解析的"回复"名称），
+    因此索引中的关系与分析得到的无向互动网络一一对应，强度也按相同权重累计。
+    """
+
+    ROLES = ("发布", KIND_LIKE, KIND_COMMENT, KIND_REPLY)
+    _ROLE_INDEX = {KIND_LIKE: 1, KIND_COMMENT: 2, KIND_REPLY: 3}
+
+    def __init__(self, alias_map=None, like_weight=LIKE_WEIGHT, comment_weight=COMMENT_WEIGHT):
+        self.alias_map = dict(alias_map or {})
+        self.weights = {KIND_LIKE: like_weight, KIND_COMMENT: comment_weight, KIND_REPLY: comment_weight}
+        self.roles = {}                       # 人员 -> [发布, 点赞, 评论, 回复] 帖子编号数组
+        self.edges = {}                       # (甲, 乙) -> [点赞数, 评论数, 回复数, 帖子编号数组]
+        self.neighbors = defaultdict(set)
+        self.posts = {}                       # 帖子编号 -> 帖子（仅从帖子构建时可用）
+        self._norm_cache = {}
+
+    def __len__(self):
+        return len(self.roles)
+
+    def __contains__(self, name):
+        return self.norm(name) in self.roles
+
+    def norm(self, name):
+        cached = self._norm_cache.get(name)
+        if cached is None:
+            raw = name
+            name = str(name).strip() if name else ""
+            cached = self._norm_cache[raw] = self.alias_map.get(name, name)
+        return cached
+
+    @staticmethod
+    def _append(arr, pid):
+        # 同一帖子的互动是连续产出的，只需与末尾比较即可去重
+        if not arr or arr[-1] != pid:
+            arr.append(pid)
+
+    def _person(self, name):
+        slots = self.roles.get(name)
+        if slots is None:
+            slots = self.roles[name] = [array('q') for _ in self.ROLES]
+        return slots
+
+    def add_post(self, pid, publisher, post=None):
+        pub = self.norm(publisher)
+        if pub and '回复' not in pub:
+            self._append(self._person(pub)[0], pid)
+        if post is not None:
+            self.posts[pid] = post
+
+    def add(self, pid, target, actor, kind):
+        """登记一条 (编号, 对象, 互动者, 类型) 互动"""
+        target, actor = self.norm(target), self.norm(actor)
+        if not target or not actor or actor == target or '回复' in actor:
+            return
+        self._append(self._person(actor)[self._ROLE_INDEX.get(kind, 1)], pid)
+        self._person(target)
+        key = (actor, target) if actor < target else (target, actor)
+        edge = self.edges.get(key)
+        if edge is None:
+            edge = self.edges[key] = [0, 0, 0, array('q')]
+            self.neighbors[actor].add(target)
+            self.neighbors[target].add(actor)
+        edge[self._ROLE_INDEX.get(kind, 1) - 1] += 1
+        self._append(edge[3], pid)
+
+    # ---- 查询 ----
+    def person(self, name):
+        """{角色: [帖子编号]}，角色为 发布/点赞/评论/回复；不存在的人员返回空列表"""
+        slots = self.roles.get(self.norm(name))
+        return {role: list(slots[i]) if slots else [] for i, role in enumerate(self.ROLES)}
+
+    def _weight(self, edge):
+        w = self.weights
+        return edge[0] * w[KIND_LIKE] + edge[1] * w[KIND_COMMENT] + edge[2] * w[KIND_REPLY]
+
+    def edge(self, a, b):
+        """两人之间的关系明细：点赞/评论/回复次数、强度与支撑帖子编号；无关系返回 None"""
+        a, b = self.norm(a), self.norm(b)
+        edge = self.edges.get((a, b) if a < b else (b, a))
+        if edge is None:
+            return None
+        return {KIND_LIKE: edge[0], KIND_COMMENT: edge[1], KIND_REPLY: edge[2],
+                '强度': self._weight(edge), '帖子': list(edge[3])}
+
+    def strongest_ties(self, name, k=10):
+        """与某人互动最强的 k 个人：[(人员, 强度, 支撑帖子数)]，按强度降序"""
+        name = self.norm(name)
+        ties = []
+        for other in self.neighbors.get(name, ()):
+            edge = self.edges[(name, other) if name < other else (other, name)]
+            ties.append((other, self._weight(edge), len(edge[3])))
+        return heapq.nlargest(k, ties, key=lambda t: (t[1], t[2]))
+
+    def post(self, pid):
+        return self.posts.get(pid)
+
+
+@profiled("人员索引")
+def build_person_index(all_posts=None, interactions=None, alias_map=None, like_weight=LIKE_WEIGHT,
+                       comment_weight=COMMENT_WEIGHT):
+    """从帖子（或仅从互动序列，如数据库查询结果）构建人员倒排索引
+
+    只有互动序列时，发布关系由点赞/评论的对象推断，没有互动的帖子不会出现在索引中。
+    """
+    index = PersonIndex(alias_map, like_weight=like_weight, comment_weight=comment_weight)
+    n = 0
+    if all_posts:
+        for idx, post in enumerate(all_posts):
+            index.add_post(post_id(post, idx), post.get('发布者', ''), post)
+        interactions = iter_interactions(all_posts)
+        infer_publishers = False
+    else:
+        # 去重依赖同一帖子的互动相邻，查询结果不保证顺序，先按编号排序
+        interactions = sorted(interactions or (), key=lambda row: row[0])
+        infer_publishers = True
+    for pid, target, actor, kind in interactions:
+        n += 1
+        if not n & 0x3fff:
+            checkpoint()
+        if infer_publishers and kind != KIND_REPLY:
+            index.add_post(pid, target)
+        index.add(pid, target, actor, kind)
+    PROFILER.count("互动", n)
+    return index
+
+
+def person_main(argv=None):
+    """命令行入口：python main.py --person 张三 --input posts.json [--top 10] [--alias alias_map.json]"""
+    import argparse
+    parser = argparse.ArgumentParser(prog="main.py --person", description="查询某人的互动明细与最强关系")
+    parser.add_argument("--person", required=True, action="append", help="人员名称，可重复指定")
+    parser.add_argument("--input", required=True, help="帖子文件（JSON/Excel/CSV/Parquet）")
+    parser.add_argument("--top", type=int, default=10, help="列出互动最强的前 N 人")
+    parser.add_argument("--alias", default="", help="alias_map JSON 文件")
+    args = parser.parse_args(argv)
+
+    alias_map = {}
+    if args.alias:
+        with open(args.alias, 'r', encoding='utf-8') as f:
+            alias_map = json.load(f)
+    t0 = time.perf_counter()
+    index = build_person_index(to_records(load_posts_file(args.input)), alias_map=alias_map)
+    print(f"索引建立完成：{len(index)} 人，{len(index.edges)} 条关系，用时 {time.perf_counter() - t0:.2f}s")
+    for name in args.person:
+        if name not in index:
+            print(f"\n未找到人员：{name}")
+            continue
+        roles = index.person(name)
+        print(f"\n【{name}】" + "，".join(f"{role} {len(pids)} 条" for role, pids in roles.items()))
+        for i, (other, weight, n_posts) in enumerate(index.strongest_ties(name, k=args.top), start=1):
+            pids = index.edge(name, other)['帖子']
+            shown = ", ".join(str(pid) for pid in pids[:10]) + (" ..." if len(pids) > 10 else "")
+            print(f"  {i:2d}. {other:20s} 强度 {weight:g}，{n_posts} 条帖子：{shown}")
+    return 0
+
+
+# -------------------------
+# 全文检索
+# -------------------------
+_RE_SEARCH_RUN = re.compile(r'\w+')
+_RE_SEARCH_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def search_grams(text):
+    """中文友好的切分：文本按连续字母/数字/汉字切段，每段取相邻两字作为索引项"""
+    grams = set()
+    for run in _RE_SEARCH_RUN.findall(text.lower()):
+        grams.update(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+def parse_search_query(query):
+    """解析检索式为若干"或"分组，每组为 (必须包含的词, 必须排除的词)
+
+    空格分隔的词需同时出现；OR（或 |）分隔的部分任一满足即可；前缀 - 表示排除；
+    双引号括起的短语按原样（含空格）匹配。所有词按子串匹配，不区分大小写。
+    """
+    groups = [([], [])]
+    for m in _RE_SEARCH_TOKEN.finditer(query or ''):
+        phrase, word = m.group(1), m.group(2)
+        if word in ('OR', '|'):
+            groups.append(([], []))
+            continue
+        negate = False
+        if word is not None and word.startswith('-') and len(word) > 1:
+            negate, word = True, word[1:]
+        term = (phrase if phrase is not None else word).strip().lower()
+        if term:
+            groups[-1][1 if negate else 0].append(term)
+    return [g for g in groups if g[0] or g[1]]
+
+
+class SearchIndex:
+    """帖子内容与评论的倒排索引，按行号（帖子在列表中的位置）检索
+
+    索引项为相邻两字，候选集由各索引项的倒排表求交得到，再用子串校验保证短语精确匹配；
+    单字或无法切出索引项的词退回到逐条子串扫描。帖子可逐条追加（采集时增量建立）。
+    """
+
+    def __init__(self):
+        self.postings = {}                    # 索引项 -> 行号数组（升序）
+        self.texts = []                       # 行号 -> 小写的 内容 + 评论 文本，用于子串校验
+        self.publishers = []
+        self.by_publisher = {}                # 发布者 -> 行号数组
+        self.timestamps = array('d')
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, post):
+        """追加一条帖子，返回其行号"""
+        row = len(self.texts)
+        comments = post.get('评论', []) or []
+        if not isinstance(comments, list):
+            comments = _decode_comment_cell(comments)
+        text = "\n".join([str(post.get('内容', '') or '')] + [str(c) for c in comments]).lower()
+        self.texts.append(text)
+        postings = self.postings
+        for gram in search_grams(text):
+            arr = postings.get(gram)
+            if arr is None:
+                arr = postings[gram] = array('i')
+            arr.append(row)
+        pub = sys.intern(str(post.get('发布者', '') or '').strip())
+        self.publishers.append(pub)
+        arr = self.by_publisher.get(pub)
+        if arr is None:
+            arr = self.by_publisher[pub] = array('i')
+        arr.append(row)
+        ts = post.get('时间戳')
+        self.timestamps.append(float(ts) if isinstance(ts, (int, float)) else math.nan)
+        return row
+
+    def extend(self, posts):
+        for i, post in enumerate(posts):
+            if not i & 0xfff:
+                checkpoint()
+            self.add(post)
+
+    @classmethod
+    @profiled("全文索引")
+    def from_posts(cls, posts):
+        index = cls()
+        index.extend(posts)
+        return index
+
+    # ---- 查询 ----
+    def _term_rows(self, term, candidates):
+        """包含 term 的行号集合；candidates 非 None 时只在其中查找"""
+        grams = search_grams(term)
+        if grams:
+            lists = []
+            for gram in grams:
+                arr = self.postings.get(gram)
+                if arr is None:
+                    return set()
+                lists.append(arr)
+            lists.sort(key=len)
+            rows = set(lists[0]) if candidates is None else {r for r in lists[0] if r in candidates}
+            for arr in lists[1:]:
+                if len(rows) * 8 < len(arr):
+                    # 候选很少时在有序倒排表中二分查找，避免遍历整条长表
+                    rows = {r for r in rows if _sorted_contains(arr, r)}
+                else:
+                    rows.intersection_update(arr)
+                if not rows:
+                    return rows
+        else:
+            rows = set(range(len(self.texts))) if candidates is None else set(candidates)
+        texts = self.texts
+        return {r for r in rows if term in texts[r]}
+
+    def _filter_rows(self, publishers, start_ts, end_ts):
+        if publishers:
+            rows = set()
+            for name in publishers:
+                rows.update(self.by_publisher.get(name, ()))
+        else:
+            rows = None
+        if start_ts is None and end_ts is None:
+            return rows
+        lo = -math.inf if start_ts is None else start_ts
+        hi = math.inf if end_ts is None else end_ts
+        ts = self.timestamps
+        # NaN 与任何值比较均为 False，缺少时间戳的帖子在指定时间范围时被排除
+        if rows is None:
+            return {r for r in range(len(ts)) if lo <= ts[r] < hi}
+        return {r for r in rows if lo <= ts[r] < hi}
+
+    @profiled("全文检索")
+    def search(self, query="", publishers=None, start_ts=None, end_ts=None):
+        """返回满足检索式与发布者/时间过滤的行号（升序）；检索式为空时只按过滤条件筛选"""
+        base = self._filter_rows(publishers, start_ts, end_ts)
+        groups = parse_search_query(query)
+        if not groups:
+            return sorted(base) if base is not None else list(range(len(self.texts)))
+        result = set()
+        for include, exclude in groups:
+            rows = base
+            for term in sorted(include, key=len, reverse=True):
+                rows = self._term_rows(term, rows)
+                if not rows:
+                    break
+            if rows is None:
+                rows = set(range(len(self.texts)))
+            if rows and exclude:
+                texts = self.texts
+                rows = {r for r in rows if not any(term in texts[r] for term in exclude)}
+            result |= rows
+        return sorted(result)
+
+
+def _sorted_contains(arr, value):
+    i = bisect.bisect_left(arr, value)
+    return i < len(arr) and arr[i] == value
+
+
+# -------------------------
+# 近似重复检测（MinHash + LSH）
+# -------------------------
+def normalize_content(text):
+    """内容归一化：小写并去除空白与标点，只保留字母、数字与汉字"""
+    return "".join(_RE_SEARCH_RUN.findall(str(text or '').lower()))
+
+
+def _lsh_bands(num_perm, threshold):
+    """选择分带参数 (带数 b, 每带行数 r)：b*r=num_perm，取 (1/b)^(1/r) 不超过阈值中最大者，偏向召回"""
+    options = [(num_perm // r, r) for r in range(1, num_perm + 1) if num_perm % r == 0]
+    below = [(b, r) for b, r in options if (1.0 / b) ** (1.0 / r) <= threshold]
+    if not below:
+        return min(options, key=lambda o: (1.0 / o[0]) ** (1.0 / o[1]))
+    return max(below, key=lambda o: (1.0 / o[0]) ** (1.0 / o[1]))
+
+
+def minhash_signatures(texts, num_perm=128, shingle=3, seed=1):
+    """批量计算归一化文本的 MinHash 签名矩阵 (文档数, num_perm)，每段文本长度须不小于 shingle
+
+    全部文本按 UTF-32 拼成一个码点数组，相邻 shingle 个码点按 0x110000 进制合成一个整数
+    （3 字恰好放入 64 位），再经 multiply-shift 哈希 (a*x + b) >> 32 得到各置换的值，
+    用 minimum.reduceat 按文档取最小值。重复的 shingle 不影响最小值，因此无需逐篇去重。
+    """
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    codes = np.frombuffer("".join(texts).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    n_grams = lengths - shingle + 1
+    offsets = np.cumsum(n_grams) - n_grams
+    starts = np.cumsum(lengths) - lengths
+    positions = np.arange(int(n_grams.sum()), dtype=np.int64) + np.repeat(starts - offsets, n_grams)
+    radix = np.uint64(0x110000)
+    x = np.zeros(len(positions), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for j in range(shingle):
+            x = x * radix + codes[positions + j]
+        rng = np.random.RandomState(seed)
+        a = rng.randint(0, 1 << 32, size=(num_perm, 2)).astype(np.uint64)
+        a = (a[:, 0] << np.uint64(32)) | a[:, 1] | np.uint64(1)
+        b = rng.randint(0, 1 << 32, size=(num_perm, 2)).astype(np.uint64)
+        b = (b[:, 0] << np.uint64(32)) | b[:, 1]
+        shift = np.uint64(32)
+        sig = np.empty((num_perm, len(texts)), dtype=np.uint32)
+        buf = np.empty_like(x)
+        for k in range(num_perm):
+            if not k & 0xf:
+                checkpoint()
+            np.multiply(x, a[k], out=buf)
+            np.add(buf, b[k], out=buf)
+            np.right_shift(buf, shift, out=buf)
+            sig[k] = np.minimum.reduceat(buf, offsets)
+    return np.ascontiguousarray(sig.T)
+
+
+@profiled("近似重复")
+def find_near_duplicates(posts, threshold=0.8, num_perm=128, shingle=3, min_chars=8, seed=1):
+    """按内容查找近似重复的帖子组，返回行号列表的列表（每组按行号升序，组按大小降序）
+
+    MinHash 签名分带后同一桶内的帖子为候选，只与桶内首条比对估计的 Jaccard 相似度，
+    达到阈值即并入同一组，整体复杂度与帖子数近似线性。归一化后不足 min_chars 字的内容不参与。
+    """
+    rows, texts = [], []
+    min_chars = max(min_chars, shingle)
+    for i, post in enumerate(posts):
+        text = normalize_content(post.get('内容', ''))
+        if len(text) >= min_chars:
+            rows.append(i)
+            texts.append(text)
+    if len(rows) < 2:
+        return []
+    sig = minhash_signatures(texts, num_perm=num_perm, shingle=shingle, seed=seed)
+    del texts
+    bands, r = _lsh_bands(num_perm, threshold)
+    parent = list(range(len(rows)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        checkpoint()
+        block = np.ascontiguousarray(sig[:, band * r:(band + 1) * r])
+        keys = block.view(np.dtype((np.void, block.dtype.itemsize * r))).ravel()
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        multi = counts[inverse.ravel()] > 1
+        if not multi.any():
+            continue
+        members = np.flatnonzero(multi)
+        order = members[np.argsort(inverse.ravel()[members], kind='stable')]
+        bucket_ids = inverse.ravel()[order]
+        splits = np.flatnonzero(np.diff(bucket_ids)) + 1
+        for bucket in np.split(order, splits):
+            rep = bucket[0]
+            root = find(rep)
+            rest = np.array([j for j in bucket[1:] if find(j) != root], dtype=np.int64)
+            if not len(rest):
+                continue
+            sims = (sig[rest] == sig[rep]).mean(axis=1)
+            for j in rest[sims >= threshold]:
+                parent[find(j)] = root
+
+    groups = defaultdict(list)
+    for i in range(len(rows)):
+        groups[find(i)].append(rows[i])
+    result = [g for g in groups.values() if len(g) > 1]
+    result.sort(key=lambda g: (-len(g), g[0]))
+    PROFILER.count("近似重复组", len(result))
+    return result
+
+
+def near_duplicate_report(posts, groups):
+    """汇总近似重复组：条数、涉及发布者、示例内容与时间跨度，跨发布者传播的组排在前面"""
+    report = []
+    for rows in groups:
+        publishers = list(dict.fromkeys(str(posts[i].get('发布者', '') or '') for i in rows))
+        stamps = [posts[i].get('时间戳') for i in rows]
+        stamps = [t for t in stamps if isinstance(t, (int, float))]
+        report.append({
+            'rows': rows,
+            'size': len(rows),
+            'publishers': publishers,
+            'sample': str(posts[rows[0]].get('内容', '') or ''),
+            'first_ts': min(stamps) if stamps else None,
+            'last_ts': max(stamps) if stamps else None,
+        })
+    report.sort(key=lambda g: (-len(g['publishers']), -g['size']))
+    return report
+
+
+def collapse_near_duplicates(posts, groups):
+    """每个近似重复组只保留行号最小的一条，其余帖子（及其互动）不参与后续分析"""
+    drop = set()
+    for rows in groups:
+        drop.update(rows[1:])
+    return [p for i, p in enumerate(posts) if i not in drop]
+
+
+# -------------------------
+# 表格数据读写（Excel/CSV）
+# -------------------------
+POST_COLUMNS = ["编号", "发布者", "内容", "时间", "点赞", "评论"]
+POST_TEXT_DTYPES = {"发布者": str, "内容": str, "时间": str, "点赞": str, "评论": str}
+
+
+def _decode_comment_cell(val):
+    """还原单个评论单元格：JSON 列表、旧版 Python 列表字符串或单条文本"""
+    if isinstance(val, list):
+        return val
+    if val is None or (isinstance(val, float) and math.isnan(val)):
+        return []
+    s = str(val).strip()
+    if not s:
+        return []
+    if s.startswith('['):
+        try:
+            parsed = json.loads(s)
+        except Exception:
+            try:
+                parsed = ast.literal_eval(s)
+            except Exception:
+                parsed = None
+        if isinstance(parsed, (list, tuple)):
+            return [str(x) for x in parsed if x]
+    return [s]
+
+
+def decode_comment_column(series):
+    """批量还原评论列；全部为 JSON 时一次性解析，否则逐格回退"""
+    cells = series.fillna('').astype(str).str.strip()
+    cells = cells.where(cells != '', '[]')
+    if cells.str.startswith('[').all():
+        try:
+            decoded = json.loads('[' + ','.join(cells.tolist()) + ']')
+            if len(decoded) == len(cells):
+                return [[str(x) for x in v if x] if isinstance(v, list) else [] for v in decoded]
+        except Exception:
+            pass
+    return [_decode_comment_cell(v) for v in cells.tolist()]
+
+
+def posts_from_frame(df, start_index=0):
+    """按列批量将 DataFrame 转换为 posts 列表（与 JSON 格式一致）"""
+    n = len(df)
+    if n == 0:
+        return []
+    columns = {}
+    if "编号" in df:
+        ids = pd.to_numeric(df["编号"], errors='coerce')
+        fallback = pd.Series(range(start_index + 1, start_index + n + 1), index=df.index)
+        columns["编号"] = ids.fillna(fallback).astype('int64').tolist()
+    else:
+        columns["编号"] = list(range(start_index + 1, start_index + n + 1))
+    for col in ("发布者", "内容", "时间", "点赞"):
+        if col in df:
+            columns[col] = df[col].fillna('').astype(str).tolist()
+        else:
+            columns[col] = [""] * n
+    columns["评论"] = decode_comment_column(df["评论"]) if "评论" in df else [[] for _ in range(n)]
+    if "时间戳" in df:
+        ts = pd.to_numeric(df["时间戳"], errors='coerce').astype(object)
+        columns["时间戳"] = ts.where(ts.notna(), None).tolist()
+    # 其余列原样保留，缺失值转为 None
+    for col in df.columns:
+        if col in columns:
+            continue
+        s = df[col].astype(object)
+        columns[col] = s.where(s.notna(), None).tolist()
+    keys = list(columns.keys())
+    return [dict(zip(keys, vals)) for vals in zip(*(columns[k] for k in keys))]
+
+
+def posts_to_frame(posts):
+    """posts 转 DataFrame，评论列序列化为 JSON 以便导入时无损还原"""
+    df = pd.DataFrame(to_dicts(posts))
+    for col in POST_COLUMNS:
+        if col not in df:
+            df[col] = [[] for _ in range(len(df))] if col == "评论" else ""
+    df["评论"] = [json.dumps(c if isinstance(c, list) else _decode_comment_cell(c), ensure_ascii=False)
+                for c in df["评论"].tolist()]
+    extra = [c for c in df.columns if c not in POST_COLUMNS]
+    return df[POST_COLUMNS + extra]
+
+
+def iter_posts_table(path, chunksize=None):
+    """分块读取 Excel/CSV，逐块产出 posts 列表；Excel 不支持流式读取时整表产出"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        reader = pd.read_csv(path, dtype=POST_TEXT_DTYPES, keep_default_na=False,
+                             encoding='utf-8-sig', chunksize=chunksize)
+        frames = reader if chunksize else [reader]
+    else:
+        frames = [pd.read_excel(path, dtype=POST_TEXT_DTYPES, keep_default_na=False)]
+    offset = 0
+    for df in frames:
+        chunk = posts_from_frame(df, start_index=offset)
+        offset += len(chunk)
+        yield chunk
+
+
+def read_posts_table(path, chunksize=50000, log_sys=None):
+    """读取 Excel/CSV 表格为 posts 列表"""
+    posts = []
+    for chunk in iter_posts_table(path, chunksize=chunksize):
+        posts.extend(chunk)
+        if log_sys: log_sys(f"已读取 {len(posts)} 行...")
+    return posts
+
+
+def write_posts_table(posts, path):
+    """按扩展名写出 Excel 或 CSV"""
+    df = posts_to_frame(posts)
+    if path.lower().endswith('.csv'):
+        df.to_csv(path, index=False, encoding='utf-8-sig')
+    else:
+        df.to_excel(path, index=False)
+
+
+# -------------------------
+# 列式存储（Parquet）
+# -------------------------
+def _require_pyarrow():
+    if not HAVE_PYARROW:
+        raise RuntimeError("未安装 pyarrow，无法读写 Parquet 格式（pip install pyarrow）。")
+
+
+def interactions_path(path):
+    """帖子 Parquet 文件对应的互动表路径"""
+    base, _ = os.path.splitext(path)
+    return base + ".edges.parquet"
+
+
+def save_posts_parquet(posts, path, compression='zstd'):
+    """保存为帖子表 + 点赞/评论/回复互动表两个 Parquet 文件，名称列字典编码"""
+    _require_pyarrow()
+    columns = {
+        "编号": pa.array([post_id(p, i) for i, p in enumerate(posts)], pa.int64()),
+        "发布者": pa.array([str(p.get('发布者', '') or '') for p in posts], pa.string()).dictionary_encode(),
+        "内容": pa.array([str(p.get('内容', '') or '') for p in posts], pa.string()),
+        "时间": pa.array([str(p.get('时间', '') or '') for p in posts], pa.string()).dictionary_encode(),
+        "点赞": pa.array([p.get('点赞', '') if isinstance(p.get('点赞'), str) else '' for p in posts], pa.string()),
+        "评论": pa.array([c if isinstance(c, list) else _decode_comment_cell(c)
+                          for c in (p.get('评论', []) for p in posts)], pa.list_(pa.string())),
+    }
+    extra = []
+    for p in posts:
+        for k in p:
+            if k not in columns and k not in extra:
+                extra.append(k)
+    for k in extra:
+        columns[k] = pa.array([p.get(k) for p in posts])
+    pq.write_table(pa.table(columns), path, compression=compression)
+
+    rows = list(iter_interactions(posts))
+    pids, targets, actors, kinds = (list(c) for c in zip(*rows)) if rows else ([], [], [], [])
+    edges = pa.table({
+        "编号": pa.array(pids, pa.int64()),
+        "对象": pa.array(targets, pa.string()).dictionary_encode(),
+        "互动者": pa.array(actors, pa.string()).dictionary_encode(),
+        "类型": pa.array(kinds, pa.string()).dictionary_encode(),
+    })
+    pq.write_table(edges, interactions_path(path), compression=compression)
+
+
+def load_posts_parquet(path, columns=None, memory_map=True):
+    """读取帖子表；columns 可只投影需要的列"""
+    _require_pyarrow()
+    return pq.read_table(path, columns=columns, memory_map=memory_map).to_pylist()
+
+
+def load_interactions_parquet(path, columns=None, memory_map=True):
+    """读取互动表为 pyarrow.Table，名称列保持字典编码"""
+    _require_pyarrow()
+    return pq.read_table(interactions_path(path), columns=columns, memory_map=memory_map,
+                         read_dictionary=["对象", "互动者", "类型"])
+
+
+def load_graph_inputs_parquet(path, memory_map=True):
+    """只读取发布者/互动者/对象列，返回 build_interaction_graph 所需的 (publishers, interactions)"""
+    _require_pyarrow()
+    publishers = pq.read_table(path, columns=["发布者"], memory_map=memory_map).column("发布者").to_pylist()
+    edges = load_interactions_parquet(path, memory_map=memory_map)
+    cols = [edges.column(c).to_pylist() for c in ("编号", "对象", "互动者", "类型")]
+    return publishers, list(zip(*cols))
+
+
+def load_posts_file(path, log_sys=None):
+    """按扩展名读取导出的 JSON / Excel / CSV / Parquet 帖子文件；log_sys 接收表格分块读取进度"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        posts = data['posts'] if isinstance(data, dict) and 'posts' in data else data
+    elif ext == '.parquet':
+        posts = load_posts_parquet(path)
+    else:
+        posts = read_posts_table(path, log_sys=log_sys)
+    return posts if isinstance(posts, list) else []
+
+
+# -------------------------
+# SQLite 帖子库（多会话）
+# -------------------------
+
+
+def post_fingerprint(post):
+    """以发布者 + 内容（含"包含N张图片"后缀）+ 发布日期生成帖子指纹
+
+    相对时间文本每天变化，改用 时间戳 所在的本地日期；同一人同一天发布的相同内容视为同一帖。
+    没有 时间戳 且去掉图片说明后内容为空（纯图片帖）时，改用原始时间文本与排序后的点赞者、
+    评论头部区分，同一帖重复写入仍能去重。
+    """
+    publisher = str(post.get('发布者', '') or '').strip()
+    content = str(post.get('内容', '') or '').strip()
+    ts = post.get('时间戳')
+    if ts is not None and ts == ts:
+        extra = time.strftime('%Y-%m-%d', time.localtime(ts))
+    elif _IMAGE_NOTICE_RE.sub('', content).strip():
+        extra = ''
+    else:
+        comments = post.get('评论', []) or []
+        if not isinstance(comments, list):
+            comments = _decode_comment_cell(comments)
+        heads = sorted("回复".join(filter(None, parse_comment_head(c))) for c in comments if c)
+        likers = sorted(split_likers(post.get('点赞', '')))
+        extra = "\x1e".join([str(post.get('时间', '') or '').strip(), "，".join(likers), "，".join(heads)])
+    key = f"{publisher}\x1f{content}\x1f{extra}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class PostStore:
+    """嵌入式帖子库：帖子按指纹去重，参与者与互动关系规范化存储"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS people (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY,
+        source TEXT,
+        created_at REAL NOT NULL,
+        post_count INTEGER DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS posts (
+        id INTEGER PRIMARY KEY,
+        fp TEXT NOT NULL UNIQUE,
+        publisher_id INTEGER NOT NULL REFERENCES people(id),
+        content TEXT,
+        time_raw TEXT,
+        ts REAL,
+        likes TEXT,
+        comments TEXT,
+        first_session INTEGER,
+        last_session INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS interactions (
+        post_id INTEGER NOT NULL REFERENCES posts(id),
+        actor_id INTEGER NOT NULL REFERENCES people(id),
+        target_id INTEGER NOT NULL REFERENCES people(id),
+        kind TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_posts_publisher ON posts(publisher_id);
+    CREATE INDEX IF NOT EXISTS idx_posts_ts ON posts(ts);
+    CREATE INDEX IF NOT EXISTS idx_inter_post ON interactions(post_id);
+    CREATE INDEX IF NOT EXISTS idx_inter_actor ON interactions(actor_id);
+    CREATE INDEX IF NOT EXISTS idx_inter_target ON interactions(target_id);
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self._people = None
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _person_ids(self, names):
+        """批量登记参与者并返回 name -> id 映射"""
+        if self._people is None:
+            self._people = dict(self.conn.execute("SELECT name, id FROM people"))
+        missing = [(n,) for n in set(names) if n not in self._people]
+        if missing:
+            self.conn.executemany("INSERT OR IGNORE INTO people(name) VALUES (?)", missing)
+            self._people = dict(self.conn.execute("SELECT name, id FROM people"))
+        return self._people
+
+    def upsert_posts(self, posts, source="", batch_size=500, log_sys=None):
+        """按指纹插入或更新帖子，每批一个事务；返回 (新增, 更新) 条数"""
+        with self.conn:
+            cur = self.conn.execute("INSERT INTO sessions(source, created_at) VALUES (?, ?)", (source, time.time()))
+            session_id = cur.lastrowid
+        inserted = updated = 0
+        for start in range(0, len(posts), batch_size):
+            checkpoint()
+            batch = posts[start:start + batch_size]
+            by_fp = {}
+            names = []
+            for post in batch:
+                fp = post_fingerprint(post)
+                pub = str(post.get('发布者', '') or '').strip()
+                comments = post.get('评论', []) or []
+                if not isinstance(comments, list):
+                    comments = _decode_comment_cell(comments)
+                likes = post.get('点赞', '') if isinstance(post.get('点赞', ''), str) else ''
+                row = (fp, pub, str(post.get('内容', '') or ''), str(post.get('时间', '') or ''),
+                       post.get('时间戳'), likes, json.dumps(comments, ensure_ascii=False))
+                post_edges = [(fp, actor, target, kind) for _pid, target, actor, kind in
+                              iter_interactions([{'发布者': pub, '点赞': likes, '评论': comments}])]
+                # 同批次内重复的帖子以最后一次为准
+                by_fp[fp] = (row, post_edges)
+                names.append(pub)
+                names.extend(name for e in post_edges for name in e[1:3])
+            rows = [row for row, _ in by_fp.values()]
+            edges = [e for _, post_edges in by_fp.values() for e in post_edges]
+            with self.conn:
+                ids = self._person_ids(names)
+                known = {fp for fp, in self.conn.execute(
+                    f"SELECT fp FROM posts WHERE fp IN ({','.join('?' * len(rows))})", [r[0] for r in rows])}
+                self.conn.executemany(
+                    "INSERT INTO posts(fp, publisher_id, content, time_raw, ts, likes, comments, first_session, "
+                    "last_session) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(fp, ids[pub], content, time_raw, ts, likes, comments, session_id, session_id)
+                     for fp, pub, content, time_raw, ts, likes, comments in rows if fp not in known])
+                self.conn.executemany(
+                    "UPDATE posts SET time_raw = ?, ts = COALESCE(?, ts), likes = ?, comments = ?, last_session = ? "
+                    "WHERE fp = ?",
+                    [(time_raw, ts, likes, comments, session_id, fp)
+                     for fp, pub, content, time_raw, ts, likes, comments in rows if fp in known])
+                post_ids = dict(self.conn.execute(
+                    f"SELECT fp, id FROM posts WHERE fp IN ({','.join('?' * len(rows))})", [r[0] for r in rows]))
+                # 互动数可能随采集增长，整体替换该帖子的互动行
+                self.conn.executemany("DELETE FROM interactions WHERE post_id = ?",
+                                      [(post_ids[fp],) for fp in known])
+                self.conn.executemany(
+                    "INSERT INTO interactions(post_id, actor_id, target_id, kind) VALUES (?, ?, ?, ?)",
+                    [(post_ids[fp], ids[actor], ids[target], kind) for fp, actor, target, kind in edges])
+            inserted += len(rows) - len(known)
+            updated += len(known)
+            if log_sys: log_sys(f"已写入数据库 {start + len(batch)}/{len(posts)} 条...")
+        with self.conn:
+            self.conn.execute("UPDATE sessions SET post_count = ? WHERE id = ?", (len(posts), session_id))
+        return inserted, updated
+
+    @staticmethod
+    def _filters(start_ts=None, end_ts=None, people=None, publisher_col="pub.name"):
+        clauses, params = [], []
+        if start_ts is not None:
+            clauses.append("p.ts >= ?")
+            params.append(start_ts)
+        if end_ts is not None:
+            clauses.append("p.ts < ?")
+            params.append(end_ts)
+        if people:
+            people = list(people)
+            clauses.append(f"{publisher_col} IN ({','.join('?' * len(people))})")
+            params.extend(people)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def query_posts(self, start_ts=None, end_ts=None, people=None, limit=None):
+        """按时间窗口 / 发布者子集查询帖子，返回与 JSON 相同结构的 posts 列表"""
+        where, params = self._filters(start_ts, end_ts, people)
+        sql = ("SELECT p.id, pub.name, p.content, p.time_raw, p.ts, p.likes, p.comments "
+               "FROM posts p JOIN people pub ON pub.id = p.publisher_id" + where + " ORDER BY p.id")
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        posts = []
+        for pid, pub, content, time_raw, ts, likes, comments in self.conn.execute(sql, params):
+            post = {"编号": pid, "发布者": pub, "内容": content, "时间": time_raw, "点赞": likes or "",
+                    "评论": json.loads(comments) if comments else []}
+            if ts is not None:
+                post["时间戳"] = ts
+            posts.append(post)
+        return posts
+
+    def query_publishers(self, start_ts=None, end_ts=None, people=None):
+        """查询窗口内每条帖子的发布者（用于发布者节点与计数）"""
+        where, params = self._filters(start_ts, end_ts, people)
+        sql = "SELECT pub.name FROM posts p JOIN people pub ON pub.id = p.publisher_id" + where
+        return [name for name, in self.conn.execute(sql, params)]
+
+    def query_interactions(self, start_ts=None, end_ts=None, people=None):
+        """查询互动行 (编号, 对象, 互动者, 类型)；people 同时匹配对象与互动者"""
+        where, params = self._filters(start_ts, end_ts, None)
+        if people:
+            people = list(people)
+            marks = ','.join('?' * len(people))
+            where += (" AND " if where else " WHERE ") + f"(tgt.name IN ({marks}) OR act.name IN ({marks}))"
+            params.extend(people + people)
+        sql = ("SELECT i.post_id, tgt.name, act.name, i.kind FROM interactions i "
+               "JOIN posts p ON p.id = i.post_id "
+               "JOIN people tgt ON tgt.id = i.target_id "
+               "JOIN people act ON act.id = i.actor_id" + where)
+        return self.conn.execute(sql, params).fetchall()
 
 
 # -------------------------
 # 网络构建与分析
 # -------------------------
+@profiled("构图")
 def build_interaction_graph(publishers, all_posts=None, like_weight=LIKE_WEIGHT, comment_weight=COMMENT_WEIGHT,
-                            alias_map=None, log_sys=None):
-    """从所有数据列构建互动网络（发布者、点赞者、评论者）"""
+                            alias_map=None, log_sys=None, interactions=None):
+    """从所有数据列构建互动网络（发布者、点赞者、评论者）
+
+    interactions 可直接传入 (编号, 对象, 互动者, 类型) 序列（如 Parquet 互动表），
+    此时无需加载帖子正文。"A回复B"类评论记为 A 与 B 之间的回复关系。
+    """
     if log_sys: log_sys("构建互动网络（基于所有互动数据）...")
     G = nx.Graph()
 
@@ -270,76 +2161,35 @@ def build_interaction_graph(publishers, all_posts=None, like_weight=LIKE_WEIGHT,
 
     # 如果提供了完整的posts数据，构建完整互动网络
     if all_posts:
-        for post in all_posts:
-            pub = norm(post.get('发布者', ''))
-            if not pub:
+        interactions = iter_interactions(all_posts)
+    if interactions is not None:
+        weights = {KIND_LIKE: like_weight, KIND_COMMENT: comment_weight, KIND_REPLY: comment_weight}
+        counters = {KIND_LIKE: 'likes', KIND_COMMENT: 'comments', KIND_REPLY: 'replies'}
+        n_interactions = 0
+        for _pid, target, actor, kind in interactions:
+            n_interactions += 1
+            if not n_interactions & 0x3fff:
+                checkpoint()
+            target = norm(target)
+            if not target:
                 continue
-            if pub not in G:
-                G.add_node(pub)
-
-            # 点赞关系
-            likes_raw = post.get('点赞', '')
-            if isinstance(likes_raw, str) and likes_raw.strip():
-                likers = [x.strip() for x in likes_raw.replace('、', '，').split('，') if x.strip()]
-                for liker in likers:
-                    liker = norm(liker)
-                    # 过滤掉包含'回复'的名称
-                    if not liker or liker == pub or '回复' in liker:
-                        continue
-                    if liker not in G:
-                        G.add_node(liker)
-                    if G.has_edge(liker, pub):
-                        G[liker][pub]['weight'] += like_weight
-                        G[liker][pub]['likes'] = G[liker][pub].get('likes', 0) + 1
-                    else:
-                        G.add_edge(liker, pub, weight=like_weight, likes=1, comments=0)
-
-            # 评论关系
-            comments = post.get('评论', []) or []
-            for comment in comments:
-                if not comment:
-                    continue
-                commenter = None
-                if ':' in comment:
-                    commenter = comment.split(':', 1)[0].strip()
-                elif '：' in comment:
-                    commenter = comment.split('：', 1)[0].strip()
-                else:
-                    parts = comment.split(None, 1)
-                    commenter = parts[0].strip() if parts else comment.strip()
-
-                commenter = norm(commenter)
-                # 过滤掉包含'回复'的名称
-                if not commenter or commenter == pub or '回复' in commenter:
-                    continue
-                if commenter not in G:
-                    G.add_node(commenter)
-                if G.has_edge(commenter, pub):
-                    G[commenter][pub]['weight'] += comment_weight
-                    G[commenter][pub]['comments'] = G[commenter][pub].get('comments', 0) + 1
-                else:
-                    G.add_edge(commenter, pub, weight=comment_weight, likes=0, comments=1)
-
-    # 收集所有参与者用于计数
-    all_participants = set(publishers)
-    if all_posts:
-        for post in all_posts:
-            likes_raw = post.get('点赞', '')
-            if isinstance(likes_raw, str) and likes_raw.strip():
-                likers = [x.strip() for x in likes_raw.replace('、', '，').split('，') if x.strip()]
-                all_participants.update(likers)
-
-            comments = post.get('评论', []) or []
-            for comment in comments:
-                if ':' in comment:
-                    commenter = comment.split(':', 1)[0].strip()
-                elif '：' in comment:
-                    commenter = comment.split('：', 1)[0].strip()
-                else:
-                    parts = comment.split(None, 1)
-                    commenter = parts[0].strip() if parts else comment.strip()
-                if commenter:
-                    all_participants.add(commenter)
+            if target not in G:
+                G.add_node(target)
+            actor = norm(actor)
+            # 过滤掉包含'回复'的名称（未能解析的回复格式）
+            if not actor or actor == target or '回复' in actor:
+                continue
+            if actor not in G:
+                G.add_node(actor)
+            w = weights.get(kind, like_weight)
+            key = counters.get(kind, 'likes')
+            if G.has_edge(actor, target):
+                G[actor][target]['weight'] += w
+                G[actor][target][key] = G[actor][target].get(key, 0) + 1
+            else:
+                G.add_edge(actor, target, weight=w, likes=int(key == 'likes'), comments=int(key == 'comments'),
+                           replies=int(key == 'replies'))
+        PROFILER.count("互动", n_interactions)
 
     pub_counts = defaultdict(int)
     for pub in publishers:
@@ -347,88 +2197,758 @@ def build_interaction_graph(publishers, all_posts=None, like_weight=LIKE_WEIGHT,
         if pub:
             pub_counts[pub] += 1
 
+    PROFILER.count("节点", G.number_of_nodes())
+    PROFILER.count("边", G.number_of_edges())
     if log_sys: log_sys(f"网络构建完成：节点 {G.number_of_nodes()}，边 {G.number_of_edges()}")
     return G, pub_counts
 
 
-def analyze_graph(G, pub_counts, all_posts, use_louvain=True, log_sys=None):
-    """分析网络图"""
-    if log_sys: log_sys("开始网络分析...")
-    res = {}
-    res['num_nodes'] = G.number_of_nodes()
-    res['num_edges'] = G.number_of_edges()
+def has_graph_inputs_parquet(path):
+    """path 是否为带互动表的 Parquet 帖子文件（可只读发布者/互动列构图）"""
+    return (HAVE_PYARROW and os.path.splitext(path)[1].lower() == '.parquet'
+            and os.path.exists(interactions_path(path)))
+
+
+def build_graph_from_file(path, like_weight=LIKE_WEIGHT, comment_weight=COMMENT_WEIGHT, alias_map=None, log_sys=None):
+    """从帖子文件构建互动网络；Parquet 只投影发布者列与互动表，不加载正文"""
+    if has_graph_inputs_parquet(path):
+        publishers, interactions = load_graph_inputs_parquet(path)
+        return build_interaction_graph(publishers, interactions=interactions, like_weight=like_weight,
+                                       comment_weight=comment_weight, alias_map=alias_map, log_sys=log_sys)
+    posts = to_records(load_posts_file(path))
+    return build_interaction_graph([p.get('发布者', '') for p in posts], all_posts=posts, like_weight=like_weight,
+                                   comment_weight=comment_weight, alias_map=alias_map, log_sys=log_sys)
+
+
+class InteractionCSR:
+    """有向、带类型的互动图，以整数编号 + CSR 数组紧凑存储
+
+    边按源节点排列：indptr[i]:indptr[i+1] 为节点 i 的出边，indices 为目标节点，
+    weight/likes/comments/replies 为与 indices 平行的数组。同一对 (源, 目标)
+    的多次互动合并为一条边，按类型分别计数（即压缩存储的有向多重图）。
+    """
+
+    __slots__ = ('names', 'index', 'indptr', 'indices', 'weight', 'likes', 'comments', 'replies', 'kind_weights')
+
+    def __init__(self, names, indptr, indices, weight, likes, comments, replies,
+                 kind_weights=(LIKE_WEIGHT, COMMENT_WEIGHT, COMMENT_WEIGHT)):
+        self.names = names
+        self.kind_weights = kind_weights
+        self.index = {n: i for i, n in enumerate(names)}
+        self.indptr = indptr
+        self.indices = indices
+        self.weight = weight
+        self.likes = likes
+        self.comments = comments
+        self.replies = replies
+
+    @classmethod
+    def from_interactions(cls, interactions, publishers=(), alias_map=None, like_weight=LIKE_WEIGHT,
+                          comment_weight=COMMENT_WEIGHT, reply_weight=COMMENT_WEIGHT):
+        """由 (编号, 源, 目标, 类型) 序列构建；publishers 中的发布者即使无互动也作为节点"""
+        ids = {}
+        names = []
+
+        def nid(name):
+            i = ids.get(name)
+            if i is None:
+                i = ids[name] = len(names)
+                names.append(name)
+            return i
+
+        def norm(name):
+            name = str(name or '').strip()
+            if alias_map and name in alias_map:
+                return alias_map[name]
+            return name
+
+        for pub in publishers:
+            pub = norm(pub)
+            if pub and '回复' not in pub:
+                nid(pub)
+        kind_code = {KIND_LIKE: 0, KIND_COMMENT: 1, KIND_REPLY: 2}
+        src, dst, kinds = [], [], []
+        for _pid, a, b, kind in interactions:
+            if not len(src) & 0x3fff:
+                checkpoint()
+            a, b = norm(a), norm(b)
+            if not a or not b or a == b or '回复' in a or '回复' in b:
+                continue
+            src.append(nid(a))
+            dst.append(nid(b))
+            kinds.append(kind_code.get(kind, 0))
+        n = len(names)
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        kinds = np.asarray(kinds, dtype=np.int8)
+        keys, inverse = np.unique(src * max(n, 1) + dst, return_inverse=True)
+        m = len(keys)
+        counts = [np.bincount(inverse, weights=(kinds == k), minlength=m).astype(np.int32) for k in range(3)]
+        weight = (counts[0] * like_weight + counts[1] * comment_weight + counts[2] * reply_weight).astype(np.float32)
+        edge_src = keys // max(n, 1)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edge_src, minlength=n), out=indptr[1:])
+        indices = (keys % max(n, 1)).astype(np.int32)
+        return cls(names, indptr, indices, weight, counts[0], counts[1], counts[2],
+                   kind_weights=(like_weight, comment_weight, reply_weight))
+
+    @classmethod
+    def from_posts(cls, all_posts, alias_map=None, **kwargs):
+        publishers = [p.get('发布者', '') for p in all_posts]
+        return cls.from_interactions(iter_typed_interactions(all_posts), publishers=publishers,
+                                     alias_map=alias_map, **kwargs)
+
+    @classmethod
+    def from_graph(cls, G):
+        """由 networkx 图构建；无向图的每条边存为两个方向"""
+        names = list(G.nodes())
+        index = {n: i for i, n in enumerate(names)}
+        n = len(names)
+        rows = []
+        for u, v, d in G.edges(data=True):
+            rec = (d.get('weight', 1), d.get('likes', 0), d.get('comments', 0), d.get('replies', 0))
+            rows.append((index[u], index[v]) + rec)
+            if not G.is_directed() and u != v:
+                rows.append((index[v], index[u]) + rec)
+        rows.sort(key=lambda r: (r[0], r[1]))
+        cols = list(zip(*rows)) if rows else [()] * 6
+        src = np.asarray(cols[0], dtype=np.int64)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        return cls(names, indptr, np.asarray(cols[1], dtype=np.int32), np.asarray(cols[2], dtype=np.float32),
+                   np.asarray(cols[3], dtype=np.int32), np.asarray(cols[4], dtype=np.int32),
+                   np.asarray(cols[5], dtype=np.int32))
+
+    @property
+    def num_nodes(self):
+        return len(self.names)
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    @property
+    def nbytes(self):
+        """边与索引数组占用的字节数"""
+        return sum(a.nbytes for a in (self.indptr, self.indices, self.weight, self.likes, self.comments,
+                                      self.replies))
+
+    def sources(self):
+        """每条边的源节点编号（与 indices 平行）"""
+        return np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.indptr))
+
+    def out_degree(self):
+        return np.diff(self.indptr).astype(np.int32)
+
+    def in_degree(self):
+        return np.bincount(self.indices, minlength=self.num_nodes).astype(np.int32)
+
+    def successors(self, name):
+        i = self.index[name]
+        return [self.names[j] for j in self.indices[self.indptr[i]:self.indptr[i + 1]]]
+
+    def to_networkx(self, directed=True, kinds=(KIND_LIKE, KIND_COMMENT, KIND_REPLY)):
+        """转换为 networkx 图（analyze_graph 可直接接收 CSR，只在介数/社区等指标需要时才转换）
+
+        directed=False 时双向边合并为一条无向边（权重与计数相加），边与 build_interaction_graph
+        相同；回复边连接回复者与被回复者，被回复者即使不是发布者也成为节点。节点只来自发布者和
+        有效互动，build_interaction_graph 还会把被跳过的互动（如自己回复自己）的对象加为孤立节点，
+        因此两者节点数可能不同。kinds 可排除某些类型（如回复边）。
+        """
+        wl, wc, wr = self.kind_weights
+        likes = self.likes if KIND_LIKE in kinds else np.zeros_like(self.likes)
+        comments = self.comments if KIND_COMMENT in kinds else np.zeros_like(self.comments)
+        replies = self.replies if KIND_REPLY in kinds else np.zeros_like(self.replies)
+        weight = likes * wl + comments * wc + replies * wr
+        src = self.sources()
+        G = nx.DiGraph() if directed else nx.Graph()
+        G.add_nodes_from(self.names)
+        for e in np.flatnonzero(likes + comments + replies):
+            u, v = self.names[src[e]], self.names[self.indices[e]]
+            attrs = (float(weight[e]), int(likes[e]), int(comments[e]), int(replies[e]))
+            if not directed and G.has_edge(u, v):
+                d = G[u][v]
+                d['weight'] += attrs[0]
+                d['likes'] += attrs[1]
+                d['comments'] += attrs[2]
+                d['replies'] += attrs[3]
+            else:
+                G.add_edge(u, v, weight=attrs[0], likes=attrs[1], comments=attrs[2], replies=attrs[3])
+        return G
+
+
+def undirected_weighted(G):
+    """有向图转无向图，双向边的权重与计数相加（Louvain 只支持无向图）"""
+    if not G.is_directed():
+        return G
+    UG = nx.Graph()
+    UG.add_nodes_from(G.nodes())
+    for u, v, d in G.edges(data=True):
+        if UG.has_edge(u, v):
+            e = UG[u][v]
+            for k, val in d.items():
+                e[k] = e.get(k, 0) + val
+        else:
+            UG.add_edge(u, v, **d)
+    return UG
 
-    # 基于图的度计算活跃度
-    degree_dict = dict(G.degree())
-    res['degree'] = degree_dict
 
-    # 度中心性（活跃度排序）
-    try:
-        res['degree_centrality'] = nx.degree_centrality(G)
-    except Exception as e:
-        res['degree_centrality'] = {}
-        if log_sys: log_sys(f"度中心性计算失败: {e}")
+@profiled("构图")
+def build_interaction_csr(all_posts, alias_map=None, like_weight=LIKE_WEIGHT, comment_weight=COMMENT_WEIGHT,
+                          log_sys=None):
+    """构建有向互动图（点赞者→发布者、评论者→发布者、回复者→被回复者）"""
+    if log_sys: log_sys("构建有向互动网络（含回复链）...")
+    csr = InteractionCSR.from_posts(all_posts, alias_map=alias_map, like_weight=like_weight,
+                                    comment_weight=comment_weight, reply_weight=comment_weight)
+    PROFILER.count("节点", csr.num_nodes)
+    PROFILER.count("边", csr.num_edges)
+    if log_sys: log_sys(f"有向网络构建完成：节点 {csr.num_nodes}，边 {csr.num_edges}，"
+                        f"边数组占用 {csr.nbytes / 1024:.1f} KB")
+    return csr
 
-    # 介数中心性
-    res['betweenness'] = {}
-    n = G.number_of_nodes()
-    if n > 2:
-        try:
-            if n <= 400:
-                if log_sys: log_sys("计算介数中心性（精确）...")
-                res['betweenness'] = nx.betweenness_centrality(G, normalized=True)
-            else:
-                k = min(200, max(80, n // 10))
-                if log_sys: log_sys(f"计算介数中心性（近似，采样 k={k}）...")
-                res['betweenness'] = nx.betweenness_centrality(G, k=k, normalized=True, seed=42)
-        except Exception as e:
-            res['betweenness'] = {}
-            if log_sys: log_sys(f"介数计算失败: {e}")
 
-    # 社区检测：基于完整互动网络
-    res['communities'] = {}
-    res['community_groups'] = {}
+# -------------------------
+# 稀疏矩阵计算（PageRank / HITS / k-core）
+# -------------------------
+def _spmv(csr, src, x, transpose=False):
+    """邻接矩阵乘向量：A·x（transpose 时为 Aᵀ·x），A[i, j] 为 i→j 的边权"""
+    w = csr.weight.astype(np.float64)
+    if transpose:
+        return np.bincount(csr.indices, weights=w * x[src], minlength=csr.num_nodes)
+    return np.bincount(src, weights=w * x[csr.indices], minlength=csr.num_nodes)
+
+
+def pagerank_csr(csr, alpha=0.85, tol=1e-6, max_iter=100):
+    """加权 PageRank 幂迭代，返回 (scores 数组, 迭代次数)；未收敛时迭代次数为 -1"""
+    n = csr.num_nodes
+    if n == 0:
+        return np.zeros(0), 0
+    src = csr.sources()
+    out_w = np.bincount(src, weights=csr.weight.astype(np.float64), minlength=n)
+    dangling = out_w == 0
+    inv_out = np.divide(1.0, out_w, out=np.zeros(n), where=~dangling)
+    x = np.full(n, 1.0 / n)
+    for it in range(1, max_iter + 1):
+        x_last = x
+        x = alpha * _spmv(csr, src, x_last * inv_out, transpose=True)
+        x += (alpha * x_last[dangling].sum() + 1.0 - alpha) / n
+        if np.abs(x - x_last).sum() < n * tol:
+            return x, it
+    return x, -1
+
+
+def hits_csr(csr, tol=1e-8, max_iter=100):
+    """加权 HITS 幂迭代，返回 (hubs, authorities, 迭代次数)；未收敛时迭代次数为 -1"""
+    n = csr.num_nodes
+    if n == 0 or csr.num_edges == 0:
+        return np.zeros(n), np.zeros(n), 0
+    src = csr.sources()
+    h = np.full(n, 1.0 / n)
+    it_done = -1
+    for it in range(1, max_iter + 1):
+        h_last = h
+        a = _spmv(csr, src, h, transpose=True)
+        h = _spmv(csr, src, a)
+        h /= h.max() or 1.0
+        if np.abs(h - h_last).sum() < tol:
+            it_done = it
+            break
+    a = _spmv(csr, src, h, transpose=True)
+    return h / (h.sum() or 1.0), a / (a.sum() or 1.0), it_done
+
+
+def core_number_csr(csr):
+    """k-core 分解（Batagelj-Zaversnik，忽略方向与权重），返回每个节点的核数"""
+    n = csr.num_nodes
+    if n == 0:
+        return np.zeros(0, dtype=np.int32)
+    src = csr.sources().astype(np.int64)
+    dst = csr.indices.astype(np.int64)
+    keep = src != dst
+    a = np.concatenate([src[keep], dst[keep]])
+    b = np.concatenate([dst[keep], src[keep]])
+    keys = np.unique(a * n + b)
+    nb_src, nb = keys // n, (keys % n).astype(np.int64)
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(nb_src, minlength=n), out=ptr[1:])
+    deg = np.diff(ptr).tolist()
+    # 按度数桶排序
+    max_deg = max(deg) if deg else 0
+    bins = [0] * (max_deg + 1)
+    for d in deg:
+        bins[d] += 1
+    start = 0
+    for d in range(max_deg + 1):
+        bins[d], start = start, start + bins[d]
+    pos = [0] * n
+    order = [0] * n
+    for v in range(n):
+        pos[v] = bins[deg[v]]
+        order[pos[v]] = v
+        bins[deg[v]] += 1
+    for d in range(max_deg, 0, -1):
+        bins[d] = bins[d - 1]
+    bins[0] = 0
+    ptr_l = ptr.tolist()
+    nb_l = nb.tolist()
+    for i in range(n):
+        v = order[i]
+        dv = deg[v]
+        for k in range(ptr_l[v], ptr_l[v + 1]):
+            u = nb_l[k]
+            du = deg[u]
+            if du > dv:
+                pu = pos[u]
+                pw = bins[du]
+                w = order[pw]
+                if u != w:
+                    pos[u], pos[w] = pw, pu
+                    order[pu], order[pw] = w, u
+                bins[du] += 1
+                deg[u] = du - 1
+    return np.asarray(deg, dtype=np.int32)
 
-    if use_louvain and community_louvain:
-        try:
-            if log_sys: log_sys("开始社区检测（基于完整互动网络）...")
-            if G.number_of_nodes() > 0:
-                partition = community_louvain.best_partition(G)
-                res['communities'] = partition
-                cg = {}
-                for node, cid in partition.items():
-                    cg.setdefault(cid, []).append(node)
-                res['community_groups'] = cg
-                if log_sys: log_sys(f"社区检测完成：{len(cg)} 个社区")
-        except Exception as e:
-            if log_sys: log_sys(f"社区检测失败: {e}")
-    else:
-        if use_louvain:
-            if log_sys: log_sys("未安装 python-louvain，跳过社区检测。")
 
-    def topk(dct, k=10):
-        if not dct:
-            return []
-        try:
-            k = int(k)
-        except:
-            k = 10
-        if k <= 0:
-            k = 10
-        items = sorted(dct.items(), key=lambda x: x[1], reverse=True)
-        return items[:k]
+# -------------------------
+# 分析指标注册与调度
+# -------------------------
+METRIC_REGISTRY = {}
+PARALLEL_COST_THRESHOLD = 5     # cost 不低于该值的指标放入进程池
+PARALLEL_MIN_NODES = 500        # 节点数较少时进程启动开销大于收益，全部在当前线程计算
 
-    res['top_degree'] = topk(res.get('degree_centrality', {}), k=10)
-    res['top_betweenness'] = topk(res.get('betweenness', {}), k=10)
 
-    res['network_density'] = nx.density(G) if G.number_of_nodes() > 0 else 0
+class MetricSpec:
+    """分析指标描述：requires 为依赖的指标名，cost 为相对耗时，defaults 为失败/跳过时写入 res 的默认值"""
+    __slots__ = ('name', 'func', 'requires', 'cost', 'defaults', 'default', 'label')
 
-    # 计算网络统计
-    weights = [G[u][v].get('weight', 1) for u, v in G.edges()]
-    res['avg_weight'] = sum(weights) / len(weights) if weights else 0
-    res['max_weight'] = max(weights) if weights else 0
+    def __init__(self, name, func, requires=(), cost=1, defaults=None, default=True, label=None):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.cost = cost
+        self.defaults = defaults or {}
+        self.default = default
+        self.label = label or name
 
-    if log_sys: log_sys("网络分析完成。")
+
+def register_metric(name, requires=(), cost=1, defaults=None, default=True, label=None):
+    """注册分析指标的装饰器
+
+    被装饰函数接收 ctx 字典（G、params、log 以及所依赖指标的结果），返回要合并进
+    res 的字典；以下划线开头的键只在指标之间传递，不出现在最终结果中。
+    default=False 的指标只有被显式请求时才计算。
+    """
+    def deco(func):
+        METRIC_REGISTRY[name] = MetricSpec(name, func, requires, cost, defaults, default, label)
+        return func
+
+    return deco
+
+
+def resolve_metrics(requested=None):
+    """展开依赖并按拓扑顺序返回需要计算的指标名"""
+    if requested is None:
+        requested = [n for n, spec in METRIC_REGISTRY.items() if spec.default]
+    order, visiting = [], set()
+
+    def visit(name):
+        if name in order:
+            return
+        if name not in METRIC_REGISTRY:
+            raise KeyError(f"未知指标：{name}")
+        if name in visiting:
+            raise ValueError(f"指标依赖存在循环：{name}")
+        visiting.add(name)
+        for dep in METRIC_REGISTRY[name].requires:
+            visit(dep)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in requested:
+        visit(name)
+    return order
+
+
+def _run_metric_task(name, G, deps, params, log_sys=None, graph_cache=None):
+    """执行单个指标（可在子进程中运行），返回 (结果, 耗时)"""
+    ctx = dict(deps)
+    ctx.update(G=G, params=params, log=log_sys, graph_cache={} if graph_cache is None else graph_cache)
+    t0 = time.perf_counter()
+    out = METRIC_REGISTRY[name].func(ctx) or {}
+    return out, time.perf_counter() - t0
+
+
+def run_metrics(G, requested=None, params=None, log_sys=None, parallel=True, max_workers=None,
+                progress_callback=None, graph_cache=None):
+    """按依赖调度指标：互不依赖的高耗时指标并发放入进程池，其余在当前线程计算
+
+    G 可以是 networkx 图或 InteractionCSR（见 metric_graph）。返回 (res, timings)，timings 为
+    每个指标的耗时（秒）。每完成一个指标调用 progress_callback(已完成数, 总数, 指标名称)。
+    graph_cache 为当前线程中由 CSR 转换出的 networkx 图的缓存（键 'G'），可传入以便复用。
+    """
+    import concurrent.futures as cf
+    params = params or {}
+    graph_cache = {} if graph_cache is None else graph_cache
+    names = resolve_metrics(requested)
+    res, timings, outputs = {}, {}, {}
+    done, failed = set(), set()
+    pending = list(names)
+    n_nodes = G.num_nodes if isinstance(G, InteractionCSR) else G.number_of_nodes()
+    use_pool = parallel and (os.cpu_count() or 1) > 1 and n_nodes >= PARALLEL_MIN_NODES and \
+        sum(1 for n in names if METRIC_REGISTRY[n].cost >= PARALLEL_COST_THRESHOLD) > 1
+    pool = cf.ProcessPoolExecutor(max_workers=max_workers) if use_pool else None
+    running = {}
+
+    def finish(name, out, elapsed, error=None):
+        spec = METRIC_REGISTRY[name]
+        if error is not None:
+            failed.add(name)
+            res.update(spec.defaults)
+            if log_sys: log_sys(f"{spec.label}计算失败: {error}")
+        else:
+            res.update(out)
+            outputs[name] = out
+            if log_sys: log_sys(f"{spec.label}完成，用时 {elapsed:.2f}s")
+        timings[name] = elapsed
+        done.add(name)
+        if progress_callback:
+            progress_callback(len(done), len(names), spec.label)
+
+    cancelled = False
+    try:
+        while pending or running:
+            ready = [n for n in pending if all(d in done for d in METRIC_REGISTRY[n].requires)]
+            for name in ready:
+                checkpoint()
+                pending.remove(name)
+                spec = METRIC_REGISTRY[name]
+                if any(d in failed for d in spec.requires):
+                    finish(name, None, 0.0, error="依赖指标失败")
+                    continue
+                deps = {}
+                for d in spec.requires:
+                    deps.update(outputs.get(d, {}))
+                if pool and spec.cost >= PARALLEL_COST_THRESHOLD:
+                    if log_sys: log_sys(f"{spec.label}：已提交到进程池...")
+                    running[pool.submit(_run_metric_task, name, G, deps, params)] = (name, time.perf_counter())
+                    continue
+                try:
+                    with PROFILER.span(f"分析.{spec.label}"):
+                        out, elapsed = _run_metric_task(name, G, deps, params, log_sys, graph_cache)
+                    finish(name, out, elapsed)
+                except Exception as e:
+                    finish(name, None, 0.0, error=e)
+            if running and not [n for n in pending if all(d in done for d in METRIC_REGISTRY[n].requires)]:
+                finished = ()
+                while not finished:
+                    checkpoint()
+                    finished, _ = cf.wait(list(running), timeout=0.2, return_when=cf.FIRST_COMPLETED)
+                for fut in finished:
+                    name, t_submit = running.pop(fut)
+                    PROFILER.record(f"分析.{METRIC_REGISTRY[name].label}", t_submit, time.perf_counter(),
+                                    进程池=True)
+                    try:
+                        out, elapsed = fut.result()
+                        finish(name, out, elapsed)
+                    except Exception as e:
+                        finish(name, None, time.perf_counter() - t_submit, error=e)
+            elif not ready and not running and pending:
+                raise RuntimeError(f"无法调度的指标：{pending}")
+    except TaskCancelled:
+        cancelled = True
+        raise
+    finally:
+        if pool:
+            _shutdown_pool(pool, cancelled, running, log_sys=log_sys)
+    for k in [k for k in res if k.startswith('_')]:
+        del res[k]
+    return res, timings
+
+
+def metric_graph(ctx):
+    """指标所需的 networkx 图：输入为 InteractionCSR 时才转换为有向图，同一线程内只转换一次"""
+    G = ctx['G']
+    if not isinstance(G, InteractionCSR):
+        return G
+    cache = ctx['graph_cache']
+    if 'G' not in cache:
+        cache['G'] = G.to_networkx(directed=True)
+    return cache['G']
+
+
+def graph_degree(G):
+    """节点度数数组（与 G.nodes() 顺序一致）；CSR 为出度 + 入度，与 DiGraph.degree 相同"""
+    if isinstance(G, InteractionCSR):
+        return G.out_degree() + G.in_degree()
+    return np.fromiter((d for _, d in G.degree()), dtype=np.int64, count=G.number_of_nodes())
+
+
+@register_metric('basic', cost=0, label="基本统计")
+def _metric_basic(ctx):
+    G = ctx['G']
+    if isinstance(G, InteractionCSR):
+        return {'num_nodes': G.num_nodes, 'num_edges': G.num_edges,
+                'degree': dict(zip(G.names, graph_degree(G).tolist()))}
+    return {'num_nodes': G.number_of_nodes(), 'num_edges': G.number_of_edges(), 'degree': dict(G.degree())}
+
+
+@register_metric('degree_centrality', cost=1, defaults={'degree_centrality': {}}, label="度中心性")
+def _metric_degree_centrality(ctx):
+    G = ctx['G']
+    if isinstance(G, InteractionCSR):
+        n = G.num_nodes
+        if n <= 1:
+            return {'degree_centrality': dict.fromkeys(G.names, 1.0)}
+        return {'degree_centrality': dict(zip(G.names, (graph_degree(G) / (n - 1)).tolist()))}
+    return {'degree_centrality': nx.degree_centrality(G)}
+
+
+@register_metric('betweenness', cost=10, defaults={'betweenness': {}}, label="介数中心性")
+def _metric_betweenness(ctx):
+    G, log = metric_graph(ctx), ctx['log']
+    n = G.number_of_nodes()
+    if n <= 2:
+        return {'betweenness': {}}
+    if n <= 400:
+        if log: log("计算介数中心性（精确）...")
+        return {'betweenness': nx.betweenness_centrality(G, normalized=True)}
+    k = min(200, max(80, n // 10))
+    if log: log(f"计算介数中心性（近似，采样 k={k}）...")
+    # 一次抽取 k 个源点（与 nx.betweenness_centrality(k=k, seed=42) 相同），分批累加，批次之间可响应取消
+    pivots = random.Random(42).sample(list(G), k)
+    targets = list(G)
+    correction = 1 if G.is_directed() else 2    # betweenness_centrality_subset 对无向图已除以 2
+    acc = dict.fromkeys(G, 0.0)
+    for start in range(0, k, 25):
+        checkpoint()
+        part = nx.betweenness_centrality_subset(G, pivots[start:start + 25], targets, normalized=False)
+        for node, val in part.items():
+            acc[node] += val * correction
+    # 归一化：源点自身不能作为经过点，按 k-1 个源点折算
+    pivot_set = set(pivots)
+    scale_source = 1 / ((k - 1) * (n - 2))
+    scale_other = 1 / (k * (n - 2))
+    return {'betweenness': {node: val * (scale_source if node in pivot_set else scale_other)
+                            for node, val in acc.items()}}
+
+
+@register_metric('communities', cost=8, defaults={'communities': {}, 'community_groups': {}}, label="社区检测")
+def _metric_communities(ctx):
+    G, log = metric_graph(ctx), ctx['log']
+    if not community_louvain:
+        if log: log("未安装 python-louvain，跳过社区检测。")
+        return {'communities': {}, 'community_groups': {}}
+    if G.number_of_nodes() == 0:
+        return {'communities': {}, 'community_groups': {}}
+    if log: log("开始社区检测（基于完整互动网络）...")
+    partition = community_louvain.best_partition(undirected_weighted(G))
+    cg = {}
+    for node, cid in partition.items():
+        cg.setdefault(cid, []).append(node)
+    if log: log(f"社区检测完成：{len(cg)} 个社区")
+    return {'communities': partition, 'community_groups': cg}
+
+
+@register_metric('adjacency', cost=1, label="稀疏邻接矩阵")
+def _metric_adjacency(ctx):
+    G = ctx['G']
+    return {'_csr': G if isinstance(G, InteractionCSR) else InteractionCSR.from_graph(G)}
+
+
+@register_metric('pagerank', requires=('adjacency',), cost=2, defaults={'pagerank': {}}, label="PageRank")
+def _metric_pagerank(ctx):
+    csr, params, log = ctx['_csr'], ctx['params'], ctx['log']
+    max_iter = params.get('max_iter', 100)
+    pr, it = pagerank_csr(csr, alpha=params.get('pagerank_alpha', 0.85), tol=params.get('tol', 1e-6),
+                          max_iter=max_iter)
+    if it < 0 and log: log(f"PageRank 在 {max_iter} 次迭代内未收敛，结果为近似值")
+    return {'pagerank': dict(zip(csr.names, pr.tolist()))}
+
+
+@register_metric('hits', requires=('adjacency',), cost=2, defaults={'hubs': {}, 'authorities': {}}, label="HITS")
+def _metric_hits(ctx):
+    csr, params, log = ctx['_csr'], ctx['params'], ctx['log']
+    max_iter = params.get('max_iter', 100)
+    hubs, auths, it = hits_csr(csr, tol=params.get('tol', 1e-6), max_iter=max_iter)
+    if it < 0 and log: log(f"HITS 在 {max_iter} 次迭代内未收敛，结果为近似值")
+    return {'hubs': dict(zip(csr.names, hubs.tolist())), 'authorities': dict(zip(csr.names, auths.tolist()))}
+
+
+@register_metric('core_number', requires=('adjacency',), cost=3, defaults={'core_number': {}, 'max_core': 0},
+                 label="k-core 分解")
+def _metric_core_number(ctx):
+    csr = ctx['_csr']
+    core = core_number_csr(csr)
+    return {'core_number': dict(zip(csr.names, core.tolist())), 'max_core': int(core.max()) if len(core) else 0}
+
+
+@register_metric('density', cost=0, defaults={'network_density': 0}, label="网络密度")
+def _metric_density(ctx):
+    G = ctx['G']
+    if isinstance(G, InteractionCSR):
+        n = G.num_nodes
+        return {'network_density': G.num_edges / (n * (n - 1)) if n > 1 else 0}
+    return {'network_density': nx.density(G) if G.number_of_nodes() > 0 else 0}
+
+
+@register_metric('weights', cost=0, defaults={'avg_weight': 0, 'max_weight': 0}, label="互动强度")
+def _metric_weights(ctx):
+    G = ctx['G']
+    if isinstance(G, InteractionCSR):
+        weights = G.weight.astype(np.float64).tolist()
+    else:
+        weights = [d.get('weight', 1) for _u, _v, d in G.edges(data=True)]
+    return {'avg_weight': sum(weights) / len(weights) if weights else 0, 'max_weight': max(weights) if weights else 0}
+
+
+@register_metric('clustering', cost=5, defaults={'clustering': {}, 'avg_clustering': 0}, default=False,
+                 label="聚类系数")
+def _metric_clustering(ctx):
+    UG = undirected_weighted(metric_graph(ctx))
+    clustering = nx.clustering(UG)
+    return {'clustering': clustering,
+            'avg_clustering': sum(clustering.values()) / len(clustering) if clustering else 0}
+
+
+# -------------------------
+# 指标排名
+# -------------------------
+# 参与排名的节点指标；degree 为节点的邻居数（"互动数"），其余取自分析结果
+RANK_METRICS = ('degree', 'degree_centrality', 'betweenness', 'pagerank', 'hubs', 'authorities', 'core_number',
+                'clustering')
+
+
+class MetricRanking:
+    """分析结果的共享排名：报告、节点表分页与导出共用，同一排序只做一次
+
+    各指标的值按节点顺序存为数组（缺失为 NaN，排在最后）。完整的降序下标按
+    (指标, 并列比较指标) 缓存；只取前 k 名时用 argpartition 选出第 k 名及与其并列的
+    候选，只对这一小部分排序。并列时依次比较 ties 中的指标，仍相同则保持节点原有顺序。
+    """
+
+    def __init__(self, G, analysis):
+        self.nodes = list(G.names if isinstance(G, InteractionCSR) else G.nodes())
+        n = len(self.nodes)
+        self._values = {'degree': graph_degree(G).astype(np.float64)}
+        for key in RANK_METRICS[1:]:
+            values = analysis.get(key)
+            if values:
+                self._values[key] = np.fromiter((values.get(v, math.nan) for v in self.nodes),
+                                                dtype=np.float64, count=n)
+        self._orders = {}
+        self._ranks = {}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def values(self, key):
+        """指标值数组（与 nodes 对齐）；没有该指标时全为 NaN"""
+        vals = self._values.get(key)
+        return vals if vals is not None else np.full(len(self.nodes), math.nan)
+
+    def _sort_keys(self, key, ties, idx=None):
+        # np.lexsort 以最后一个键为主键；取负实现降序，NaN 换成 +inf 排到最后
+        keys = []
+        for k in (*reversed(ties), key):
+            vals = self.values(k) if idx is None else self.values(k)[idx]
+            keys.append(np.where(np.isnan(vals), np.inf, -vals))
+        return keys
+
+    def order(self, key, ties=()):
+        """按指标降序排列的全部节点下标（缓存）"""
+        cache_key = (key, tuple(ties))
+        order = self._orders.get(cache_key)
+        if order is None:
+            order = self._orders[cache_key] = np.lexsort(self._sort_keys(key, ties)) if self.nodes \
+                else np.zeros(0, dtype=np.int64)
+        return order
+
+    def topk(self, key, k=10, ties=()):
+        """前 k 名的节点下标；已有完整排序时直接切片，否则只对候选做部分排序。不含缺失值"""
+        if key not in self._values:
+            return np.zeros(0, dtype=np.int64)
+        cached = self._orders.get((key, tuple(ties)))
+        n = len(self.nodes)
+        if cached is not None or k >= n:
+            idx = self.order(key, ties)[:k]
+        else:
+            primary = self._sort_keys(key, ())[0]
+            kth = np.partition(primary, k - 1)[k - 1]
+            cand = np.flatnonzero(primary <= kth)
+            idx = cand[np.lexsort(self._sort_keys(key, ties, cand))][:k]
+        return idx[~np.isnan(self._values[key][idx])]
+
+    def top_items(self, key, k=10, ties=()):
+        """前 k 名的 [(节点, 值)]"""
+        vals = self.values(key)
+        return [(self.nodes[i], float(vals[i])) for i in self.topk(key, k, ties).tolist()]
+
+    def page(self, key, start, count, ties=()):
+        """排名第 start+1 起的 count 个节点下标，用于分页显示"""
+        return self.order(key, ties)[start:start + count]
+
+    def ranks(self, key, ties=()):
+        """{节点: 名次}，名次从 1 开始；缺失该指标的节点不在其中"""
+        cache_key = (key, tuple(ties))
+        ranks = self._ranks.get(cache_key)
+        if ranks is None:
+            order = self.order(key, ties)
+            vals = self.values(key)
+            ranks = self._ranks[cache_key] = {self.nodes[i]: r for r, i in enumerate(order.tolist(), start=1)
+                                              if not math.isnan(vals[i])}
+        return ranks
+
+
+# 节点表与节点数据导出的默认顺序：度中心性降序，并列按 PageRank
+DEFAULT_NODE_ORDER = ('degree_centrality', ('pagerank',))
+
+
+def analysis_ranking(G, analysis):
+    """分析结果附带的排名对象；旧结果或手工构造的 analysis 没有时现场建立并缓存"""
+    ranking = analysis.get('ranking')
+    if ranking is None or len(ranking) != G.number_of_nodes():
+        ranking = analysis['ranking'] = MetricRanking(G, analysis)
+    return ranking
+
+
+@profiled("分析")
+def analyze_graph(G, pub_counts, all_posts, use_louvain=True, log_sys=None, pagerank_alpha=0.85, tol=1e-6,
+                  max_iter=100, metrics=None, parallel=True, progress_callback=None, graph_cache=None):
+    """分析网络图
+
+    G 可以是 networkx 图，也可以是 InteractionCSR：此时 PageRank/HITS/k-core 等直接在 CSR 数组上
+    计算，只有介数、社区等需要 networkx 的指标才转换（转换结果存入 graph_cache['G']）。
+    metrics 为要计算的指标名列表（见 METRIC_REGISTRY，依赖自动补齐），None 表示全部默认指标；
+    tol / max_iter 为 PageRank 与 HITS 幂迭代的收敛阈值与迭代上限。
+    progress_callback(已完成数, 总数, 指标名称) 在每个指标完成后调用。
+    """
+    if log_sys: log_sys("开始网络分析...")
+    requested = list(metrics) if metrics is not None else \
+        [n for n, spec in METRIC_REGISTRY.items() if spec.default]
+    if not use_louvain and 'communities' in requested:
+        requested.remove('communities')
+    if 'basic' not in requested:
+        requested.insert(0, 'basic')
+    params = {'pagerank_alpha': pagerank_alpha, 'tol': tol, 'max_iter': max_iter}
+    res, timings = run_metrics(G, requested, params=params, log_sys=log_sys, parallel=parallel,
+                               progress_callback=progress_callback, graph_cache=graph_cache)
+    res['metric_timings'] = timings
+
+    ranking = res['ranking'] = MetricRanking(G, res)
+    res['top_degree'] = ranking.top_items('degree_centrality', 10)
+    res['top_betweenness'] = ranking.top_items('betweenness', 10)
+    res['top_pagerank'] = ranking.top_items('pagerank', 10)
+    res['top_authorities'] = ranking.top_items('authorities', 10)
+    res['top_hubs'] = ranking.top_items('hubs', 10)
+
+    if log_sys:
+        total = sum(timings.values())
+        log_sys("各指标耗时：" + "，".join(f"{METRIC_REGISTRY[n].label} {t:.2f}s" for n, t in timings.items())
+                + f"（累计 {total:.2f}s）")
+        log_sys("网络分析完成。")
     return res
 
 
@@ -458,124 +2978,1571 @@ def analyze_publisher_activity(all_posts):
     return dict(activity)
 
 
+def analyze_time_windows(all_posts, window_days=7, step_days=1, alias_map=None, like_weight=LIKE_WEIGHT,
+                         comment_weight=COMMENT_WEIGHT, with_communities=True, log_sys=None):
+    """滑动时间窗口分析互动网络，返回每个窗口的指标时间序列（DataFrame）
+
+    事件按时间排序后用双指针滑动：窗口前移时只增减进入/离开窗口的边权，
+    度数与节点计数同步增量维护，不重建整张图。社区指标需要 Louvain，
+    仅在 with_communities 时按窗口构图计算。
+    """
+    def norm(name):
+        name = str(name or '').strip()
+        if alias_map and name in alias_map:
+            return alias_map[name]
+        return name
+
+    ids = {}
+    names = []
+
+    def nid(name):
+        i = ids.get(name)
+        if i is None:
+            i = ids[name] = len(names)
+            names.append(name)
+        return i
+
+    # 事件：(时间戳, 对象 id, 互动者 id 或 -1, 权重)；-1 表示发帖事件
+    events = []
+    skipped = 0
+    for idx, post in enumerate(all_posts):
+        ts = post.get('时间戳')
+        if ts is None:
+            skipped += 1
+            continue
+        pub = norm(post.get('发布者', ''))
+        if not pub:
+            continue
+        events.append((ts, nid(pub), -1, 0))
+        for _pid, target, actor, kind in iter_interactions([post]):
+            target, actor = norm(target), norm(actor)
+            if not target or not actor or actor == target or '回复' in actor:
+                continue
+            events.append((ts, nid(target), nid(actor), like_weight if kind == KIND_LIKE else comment_weight))
+    if skipped and log_sys: log_sys(f"{skipped} 条帖子缺少时间戳，未参与时间窗口分析。")
+    if not events:
+        return pd.DataFrame()
+    events.sort(key=lambda e: e[0])
+
+    day = 86400
+    first = datetime.datetime.fromtimestamp(events[0][0]).replace(hour=0, minute=0, second=0, microsecond=0)
+    t0 = first.timestamp()
+    window, step = window_days * day, step_days * day
+    n_windows = int((events[-1][0] - t0) // step) + 1
+    if log_sys: log_sys(f"时间窗口分析：{len(events)} 个事件，{n_windows} 个窗口（窗口 {window_days} 天，步长 {step_days} 天）")
+
+    edge_w = defaultdict(float)
+    edge_n = defaultdict(int)
+    node_ref = [0] * len(names)
+    degree = [0] * len(names)
+    deg_hist = defaultdict(int)
+    state = {'nodes': 0, 'posts': 0, 'weight': 0.0, 'max_deg': 0}
+
+    def touch(n, delta):
+        before = node_ref[n]
+        node_ref[n] = before + delta
+        if before == 0 and delta > 0:
+            state['nodes'] += 1
+        elif node_ref[n] == 0:
+            state['nodes'] -= 1
+
+    def bump_degree(n, delta):
+        d = degree[n]
+        if d:
+            deg_hist[d] -= 1
+        d += delta
+        degree[n] = d
+        if d:
+            deg_hist[d] += 1
+            if d > state['max_deg']:
+                state['max_deg'] = d
+        while state['max_deg'] and deg_hist.get(state['max_deg'], 0) <= 0:
+            state['max_deg'] -= 1
+
+    def apply(event, sign):
+        _ts, p, a, w = event
+        touch(p, sign)
+        if a < 0:
+            state['posts'] += sign
+            return
+        touch(a, sign)
+        key = (p, a) if p < a else (a, p)
+        before = edge_n[key]
+        edge_n[key] = before + sign
+        edge_w[key] += sign * w
+        state['weight'] += sign * w
+        if before == 0:
+            bump_degree(p, 1)
+            bump_degree(a, 1)
+        elif edge_n[key] == 0:
+            del edge_n[key]
+            del edge_w[key]
+            bump_degree(p, -1)
+            bump_degree(a, -1)
+
+    rows = []
+    head = tail = 0
+    for k in range(n_windows):
+        checkpoint()
+        start = t0 + k * step
+        end = start + window
+        while head < len(events) and events[head][0] < end:
+            apply(events[head], 1)
+            head += 1
+        while tail < head and events[tail][0] < start:
+            apply(events[tail], -1)
+            tail += 1
+        n_nodes = state['nodes']
+        n_edges = len(edge_n)
+        row = {
+            '窗口开始': datetime.date.fromtimestamp(start).isoformat(),
+            '窗口结束': datetime.date.fromtimestamp(end - 1).isoformat(),
+            '帖子数': state['posts'],
+            '节点数': n_nodes,
+            '边数': n_edges,
+            '密度': 2.0 * n_edges / (n_nodes * (n_nodes - 1)) if n_nodes > 1 else 0.0,
+            '平均度': 2.0 * n_edges / n_nodes if n_nodes else 0.0,
+            '最大度': state['max_deg'],
+            '总互动强度': round(state['weight'], 3),
+        }
+        if with_communities and community_louvain:
+            row.update({'社区数': 0, '模块度': 0.0, '最大社区规模': 0})
+            if n_edges:
+                Gw = nx.Graph()
+                Gw.add_weighted_edges_from((u, v, w) for (u, v), w in edge_w.items())
+                partition = community_louvain.best_partition(Gw, random_state=42)
+                sizes = defaultdict(int)
+                for cid in partition.values():
+                    sizes[cid] += 1
+                row.update({'社区数': len(sizes),
+                            '模块度': community_louvain.modularity(partition, Gw),
+                            '最大社区规模': max(sizes.values())})
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    int_cols = [c for c in ('帖子数', '节点数', '边数', '最大度', '社区数', '最大社区规模') if c in df]
+    df[int_cols] = df[int_cols].astype('int32')
+    for c in ('密度', '平均度', '模块度'):
+        if c in df:
+            df[c] = df[c].astype('float32')
+    if log_sys: log_sys("时间窗口分析完成。")
+    return df
+
+
+# -------------------------
+# 快照对比
+# -------------------------
+SNAPSHOT_RANK_METRICS = (('pagerank', 'PageRank'), ('degree_centrality', '度中心性'))
+
+
+def match_communities(old_part, new_part, min_jaccard=0.1):
+    """按 Jaccard 相似度一对一匹配前后两次的社区
+
+    只统计实际有共同成员的社区对（一次遍历共同节点），按相似度从高到低贪心配对，
+    低于 min_jaccard 的不配对。返回 (new→old 映射, [(旧, 新, 共同人数, Jaccard)], 旧社区人数, 新社区人数)。
+    """
+    old_size, new_size, overlap = defaultdict(int), defaultdict(int), defaultdict(int)
+    for c in old_part.values():
+        old_size[c] += 1
+    for c in new_part.values():
+        new_size[c] += 1
+    for node, c_old in old_part.items():
+        c_new = new_part.get(node)
+        if c_new is not None:
+            overlap[(c_old, c_new)] += 1
+    pairs = sorted(((inter / (old_size[a] + new_size[b] - inter), inter, a, b) for (a, b), inter in overlap.items()),
+                   reverse=True)
+    mapping, used_old, matched = {}, set(), []
+    for jac, inter, a, b in pairs:
+        if jac < min_jaccard:
+            break
+        if a in used_old or b in mapping:
+            continue
+        mapping[b] = a
+        used_old.add(a)
+        matched.append((a, b, inter, jac))
+    return mapping, matched, dict(old_size), dict(new_size)
+
+
+@profiled("快照对比")
+def diff_snapshots(old_posts, new_posts, alias_map=None, like_weight=LIKE_WEIGHT, comment_weight=COMMENT_WEIGHT,
+                   min_jaccard=0.1, log_sys=None, progress_callback=None):
+    """对比两次采集的互动网络：关系强弱变化、中心性名次变化与社区迁移
+
+    两份数据使用同一 alias_map 规范化人名后分别构图分析；也可直接传入已构建的互动网络
+    （如 build_graph_from_file 的结果），此时不再构图。返回 {'概要': dict, '关系变化',
+    '排名变化', '社区对应', '社区迁移': DataFrame}；社区编号从 1 开始，未安装 python-louvain
+    时社区两张表为空。progress_callback(已完成数, 总数, 说明) 在每个阶段后调用。
+    """
+    steps = 5
+
+    def step(done, text):
+        if log_sys: log_sys(f"快照对比：{text}")
+        if progress_callback:
+            progress_callback(done, steps, text)
+
+    metrics = ['basic', 'degree_centrality', 'pagerank', 'communities']
+    snapshots = []
+    for i, posts in enumerate((old_posts, new_posts)):
+        if isinstance(posts, nx.Graph):
+            G = posts
+        else:
+            G, _ = build_interaction_graph([p.get('发布者', '') for p in posts], all_posts=posts,
+                                           like_weight=like_weight, comment_weight=comment_weight, alias_map=alias_map)
+        snapshots.append((G, analyze_graph(G, None, None, metrics=metrics, parallel=False)))
+        step(i + 1, f"{'旧' if i == 0 else '新'}快照分析完成（{G.number_of_nodes()} 人，{G.number_of_edges()} 条关系）")
+    (G_old, a_old), (G_new, a_new) = snapshots
+
+    # 关系变化：旧边先入表，遍历新边时逐条取出，剩余即为消失的关系
+    old_edges = {}
+    for u, v, d in G_old.edges(data=True):
+        old_edges[(u, v) if G_old.is_directed() else tuple(sorted((u, v), key=str))] = d
+    edge_rows = []
+
+    def edge_row(a, b, before, after):
+        w0, w1 = before.get('weight', 0), after.get('weight', 0)
+        if not before:
+            change = '新增'
+        elif not after:
+            change = '消失'
+        else:
+            change = '增强' if w1 > w0 else '减弱'
+        edge_rows.append({'人员A': a, '人员B': b, '变化': change, '旧强度': w0, '新强度': w1, '强度变化': w1 - w0,
+                          '点赞变化': after.get('likes', 0) - before.get('likes', 0),
+                          '评论变化': after.get('comments', 0) - before.get('comments', 0),
+                          '回复变化': after.get('replies', 0) - before.get('replies', 0)})
+
+    for u, v, d in G_new.edges(data=True):
+        key = (u, v) if G_new.is_directed() else tuple(sorted((u, v), key=str))
+        before = old_edges.pop(key, {})
+        if before.get('weight', 0) != d.get('weight', 0):
+            edge_row(key[0], key[1], before, d)
+    for (u, v), before in old_edges.items():
+        edge_row(u, v, before, {})
+    edges_df = pd.DataFrame(edge_rows, columns=['人员A', '人员B', '变化', '旧强度', '新强度', '强度变化',
+                                                '点赞变化', '评论变化', '回复变化'])
+    if len(edges_df):
+        edges_df = edges_df.reindex(edges_df['强度变化'].abs().sort_values(ascending=False, kind='stable').index)
+        edges_df = edges_df.reset_index(drop=True)
+    step(3, f"关系变化 {len(edges_df)} 条")
+
+    # 名次变化
+    r_old, r_new = analysis_ranking(G_old, a_old), analysis_ranking(G_new, a_new)
+    ranks = [(key, label, r_old.ranks(key), r_new.ranks(key)) for key, label in SNAPSHOT_RANK_METRICS]
+    rank_rows = []
+    people = list(G_old.nodes()) + [v for v in G_new.nodes() if v not in G_old]
+    for v in people:
+        in_old, in_new = v in G_old, v in G_new
+        row = {'人员': v, '状态': '保留' if in_old and in_new else ('消失' if in_old else '新出现')}
+        for key, label, r_old, r_new in ranks:
+            row[f'旧{label}名次'] = r_old.get(v)
+            row[f'新{label}名次'] = r_new.get(v)
+            row[f'{label}名次变化'] = r_old[v] - r_new[v] if v in r_old and v in r_new else None
+            row[f'旧{label}'] = a_old.get(key, {}).get(v)
+            row[f'新{label}'] = a_new.get(key, {}).get(v)
+        rank_rows.append(row)
+    ranks_df = pd.DataFrame(rank_rows)
+    if len(ranks_df):
+        rank_cols = [c for c in ranks_df if c.endswith('名次') or c.endswith('名次变化')]
+        ranks_df[rank_cols] = ranks_df[rank_cols].astype('Int64')
+        first = f'新{SNAPSHOT_RANK_METRICS[0][1]}名次'
+        ranks_df = ranks_df.sort_values(first, na_position='last', kind='stable').reset_index(drop=True)
+    step(4, f"名次变化 {len(ranks_df)} 人")
+
+    # 社区迁移
+    part_old, part_new = a_old.get('communities') or {}, a_new.get('communities') or {}
+    comm_rows, move_rows = [], []
+    if part_old and part_new:
+        mapping, matched, old_size, new_size = match_communities(part_old, part_new, min_jaccard=min_jaccard)
+        for a, b, inter, jac in matched:
+            comm_rows.append({'旧社区': a + 1, '新社区': b + 1, '旧人数': old_size[a], '新人数': new_size[b],
+                              '共同人数': inter, 'Jaccard': round(jac, 4), '状态': '延续'})
+        matched_old = set(mapping.values())
+        for a in sorted(set(old_size) - matched_old):
+            comm_rows.append({'旧社区': a + 1, '新社区': None, '旧人数': old_size[a], '新人数': 0,
+                              '共同人数': 0, 'Jaccard': 0.0, '状态': '解散'})
+        for b in sorted(set(new_size) - set(mapping)):
+            comm_rows.append({'旧社区': None, '新社区': b + 1, '旧人数': 0, '新人数': new_size[b],
+                              '共同人数': 0, 'Jaccard': 0.0, '状态': '新形成'})
+        for v, c_old in part_old.items():
+            c_new = part_new.get(v)
+            if c_new is None or mapping.get(c_new) == c_old:
+                continue
+            target = mapping.get(c_new)
+            move_rows.append({'人员': v, '旧社区': c_old + 1, '新社区': c_new + 1,
+                              '新社区对应旧社区': target + 1 if target is not None else None})
+    elif log_sys:
+        log_sys("快照对比：缺少社区检测结果（未安装 python-louvain？），跳过社区迁移。")
+    comm_df = pd.DataFrame(comm_rows, columns=['旧社区', '新社区', '旧人数', '新人数', '共同人数', 'Jaccard', '状态'])
+    moves_df = pd.DataFrame(move_rows, columns=['人员', '旧社区', '新社区', '新社区对应旧社区'])
+    comm_df[['旧社区', '新社区']] = comm_df[['旧社区', '新社区']].astype('Int64')
+    moves_df['新社区对应旧社区'] = moves_df['新社区对应旧社区'].astype('Int64')
+    step(5, f"社区对应 {len(comm_df)} 组，迁移 {len(moves_df)} 人")
+
+    changes = edges_df['变化'].value_counts() if len(edges_df) else {}
+    common = sum(1 for v in G_old if v in G_new)
+    summary = {
+        '旧人数': G_old.number_of_nodes(), '新人数': G_new.number_of_nodes(), '共同人数': common,
+        '新出现人员': G_new.number_of_nodes() - common, '消失人员': G_old.number_of_nodes() - common,
+        '旧关系数': G_old.number_of_edges(), '新关系数': G_new.number_of_edges(),
+        '新增关系': int(changes.get('新增', 0)), '消失关系': int(changes.get('消失', 0)),
+        '增强关系': int(changes.get('增强', 0)), '减弱关系': int(changes.get('减弱', 0)),
+        '社区迁移人数': len(moves_df),
+    }
+    return {'概要': summary, '关系变化': edges_df, '排名变化': ranks_df, '社区对应': comm_df, '社区迁移': moves_df}
+
+
+def export_tables(tables, path):
+    """导出多张表 [(表名, DataFrame)]：.xlsx 每张表一个工作表；.csv 每张表一个文件（文件名加表名后缀）
+
+    返回写出的文件列表。
+    """
+    if path.lower().endswith('.xlsx'):
+        with pd.ExcelWriter(path) as writer:
+            for name, df in tables:
+                df.to_excel(writer, sheet_name=name, index=False)
+        return [path]
+    stem = path[:-4] if path.lower().endswith('.csv') else path
+    files = []
+    for name, df in tables:
+        out = f"{stem}_{name}.csv"
+        df.to_csv(out, index=False, encoding='utf-8-sig')
+        files.append(out)
+    return files
+
+
+def export_snapshot_diff(diff, path):
+    """导出快照对比结果（概要 + 四张明细表），格式同 export_tables"""
+    tables = [('概要', pd.DataFrame([{'项目': k, '数值': v} for k, v in diff['概要'].items()]))]
+    tables += [(name, diff[name]) for name in ('关系变化', '排名变化', '社区对应', '社区迁移')]
+    return export_tables(tables, path)
+
+
+def diff_main(argv=None):
+    """命令行入口：python main.py --diff 旧.json 新.json --out diff.xlsx [--alias alias_map.json]"""
+    import argparse
+    parser = argparse.ArgumentParser(prog="main.py --diff", description="对比两次采集的互动网络")
+    parser.add_argument("--diff", required=True, nargs=2, metavar=("OLD", "NEW"), help="旧、新两份帖子文件")
+    parser.add_argument("--out", default="", help="结果文件（.xlsx 或 .csv），不指定则只打印概要")
+    parser.add_argument("--alias", default="", help="alias_map JSON 文件")
+    parser.add_argument("--min-jaccard", type=float, default=0.1, help="社区匹配的最低 Jaccard 相似度")
+    parser.add_argument("--top", type=int, default=10, help="打印变化最大的前 N 条关系")
+    args = parser.parse_args(argv)
+
+    alias_map = {}
+    if args.alias:
+        with open(args.alias, 'r', encoding='utf-8') as f:
+            alias_map = json.load(f)
+    t0 = time.perf_counter()
+    G_old, G_new = (build_graph_from_file(p, alias_map=alias_map)[0] for p in args.diff)
+    diff = diff_snapshots(G_old, G_new, alias_map=alias_map, min_jaccard=args.min_jaccard)
+    print(f"对比完成，用时 {time.perf_counter() - t0:.2f}s")
+    for k, v in diff['概要'].items():
+        print(f"  {k}：{v}")
+    for _, r in diff['关系变化'].head(args.top).iterrows():
+        print(f"  {r['人员A']} - {r['人员B']}  {r['变化']}  {r['旧强度']:g} -> {r['新强度']:g}")
+    if args.out:
+        for f in export_snapshot_diff(diff, args.out):
+            print(f"已导出：{f}")
+    return 0
+
+
+# -------------------------
+# 潜在关系预测与关系强度
+# -------------------------
+LINK_SCORES = (('adamic_adar', 'Adamic-Adar'), ('resource_allocation', '资源分配'), ('jaccard', 'Jaccard'))
+LINK_PATH_BUDGET = 2_000_000    # 每个分块展开的两步路径数上限，控制单块内存
+_LINK_STATE = {}
+
+
+def undirected_csr(G):
+    """无向简单邻接（CSR）：(节点列表, indptr, indices, weight)；有向图两个方向的边权相加，忽略自环"""
+    nodes = list(G.nodes())
+    index = {v: i for i, v in enumerate(nodes)}
+    n = len(nodes)
+    m = G.number_of_edges()
+    u = np.empty(m, dtype=np.int64)
+    v = np.empty(m, dtype=np.int64)
+    w = np.empty(m, dtype=np.float64)
+    for i, (a, b, wt) in enumerate(G.edges(data='weight', default=1)):
+        u[i], v[i], w[i] = index[a], index[b], wt
+    keep = u != v
+    src = np.concatenate([u[keep], v[keep]])
+    dst = np.concatenate([v[keep], u[keep]])
+    keys, inverse = np.unique(src * max(n, 1) + dst, return_inverse=True)
+    weight = np.bincount(inverse, weights=np.concatenate([w[keep], w[keep]]), minlength=len(keys))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // max(n, 1), minlength=n), out=indptr[1:])
+    return nodes, indptr, (keys % max(n, 1)).astype(np.int64), weight
+
+
+def _gather_rows(indptr, indices, rows):
+    """CSR 按行取邻居：返回 (每个邻居所属的 rows 下标, 邻居)，不逐行循环"""
+    starts, ends = indptr[rows], indptr[rows + 1]
+    counts = ends - starts
+    owner = np.repeat(np.arange(len(rows)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, indices[np.repeat(starts, counts) + offsets]
+
+
+def _link_init(indptr, indices):
+    _LINK_STATE['indptr'], _LINK_STATE['indices'] = indptr, indices
+
+
+def _link_block(lo, hi, k, score):
+    """计算节点 lo..hi-1 的两步候选得分（相当于邻接矩阵 A·D⁻¹·A 的若干行）
+
+    返回 (每行 top-k 候选的平行数组 (行, 排名, 候选, aa, ra, jac, 共同好友), 已有边的共同好友数 {(u, v): cn})。
+    """
+    indptr, indices = _LINK_STATE['indptr'], _LINK_STATE['indices']
+    n = len(indptr) - 1
+    deg = np.diff(indptr)
+    rows = np.arange(lo, hi)
+    owner, mid = _gather_rows(indptr, indices, rows)
+    hop, end = _gather_rows(indptr, indices, mid)
+    src = rows[owner[hop]]
+    keep = end != src
+    src, end, via = src[keep], end[keep], mid[hop][keep]
+    keys, inverse = np.unique(src * n + end, return_inverse=True)
+    via_deg = deg[via].astype(np.float64)
+    cn = np.bincount(inverse, minlength=len(keys)).astype(np.int64)
+    ra = np.bincount(inverse, weights=1.0 / via_deg, minlength=len(keys))
+    # 中间节点度数至少为 2（连着两端），log 不为 0
+    aa = np.bincount(inverse, weights=1.0 / np.log(via_deg), minlength=len(keys))
+    u, v = keys // n, keys % n
+    jac = cn / (deg[u] + deg[v] - cn)
+    # 已有边：只记录共同好友数（供关系强度使用），不作为候选
+    adjacent = np.zeros(len(keys), dtype=bool)
+    own_u, own_v = _gather_rows(indptr, indices, rows)
+    edge_keys = rows[own_u] * n + own_v
+    pos = np.searchsorted(keys, edge_keys)
+    pos_ok = pos < len(keys)
+    hit = pos_ok.copy()
+    hit[pos_ok] = keys[pos[pos_ok]] == edge_keys[pos_ok]
+    adjacent[pos[hit]] = True
+    existing = {(int(a), int(b)): int(c) for a, b, c in zip(u[adjacent], v[adjacent], cn[adjacent]) if a < b}
+    cand = ~adjacent
+    u, v, aa, ra, jac, cn = u[cand], v[cand], aa[cand], ra[cand], jac[cand], cn[cand]
+    primary = {'adamic_adar': aa, 'resource_allocation': ra, 'jaccard': jac}[score]
+    bounds = np.searchsorted(u, np.arange(lo, hi + 1)).tolist()
+    chosen, ranks = [], []
+    for r in range(hi - lo):
+        a, b = bounds[r], bounds[r + 1]
+        if a == b:
+            continue
+        idx = np.arange(a, b)
+        if b - a > k:
+            # 先用 argpartition 求第 k 大的分数，只保留不低于它的候选（含并列），再交给堆
+            seg = primary[a:b]
+            idx = idx[seg >= np.partition(seg, b - a - k)[b - a - k]]
+        # 堆选取前 k 个，同分时按共同好友数、再按编号
+        best = heapq.nlargest(k, zip(primary[idx].tolist(), cn[idx].tolist(), (-v[idx]).tolist(), idx.tolist()))
+        chosen.extend(t[3] for t in best)
+        ranks.extend(range(1, len(best) + 1))
+    chosen = np.asarray(chosen, dtype=np.int64)
+    return (u[chosen], np.asarray(ranks, dtype=np.int32), v[chosen], aa[chosen], ra[chosen], jac[chosen],
+            cn[chosen]), existing
+
+
+def _link_blocks(indptr, indices):
+    """按两步路径数切分节点区间，保证每块展开的路径数不超过 LINK_PATH_BUDGET"""
+    deg = np.diff(indptr)
+    paths = np.bincount(np.repeat(np.arange(len(deg)), deg), weights=deg[indices], minlength=len(deg))
+    cum = np.cumsum(paths.astype(np.int64))
+    blocks, lo = [], 0
+    while lo < len(deg):
+        base = cum[lo - 1] if lo else 0
+        hi = int(np.searchsorted(cum, base + LINK_PATH_BUDGET, side='right'))
+        hi = max(hi, lo + 1)
+        blocks.append((lo, min(hi, len(deg))))
+        lo = hi
+    return blocks
+
+
+@profiled("关系预测")
+def predict_links(G, k=10, score='adamic_adar', parallel=True, max_workers=None, progress_callback=None,
+                  log_sys=None):
+    """为每个人推荐最可能存在但尚未观察到的关系，并计算已有关系的归一化强度
+
+    候选只取两步可达（有共同好友）的人，按节点分块做稀疏的 A·D⁻¹·A 行展开，
+    得到 Adamic-Adar、资源分配与 Jaccard 分数；score 决定排序依据。节点较多且多核时
+    各块在进程池中并行。progress_callback(已完成块数, 总块数) 在每块完成后调用，log_sys 接收日志。
+    返回 (候选表, 关系强度表) 两个 DataFrame：
+      候选表：人员、排名、候选、各项分数、共同好友数，每人至多 k 行；
+      关系强度表：每条已有关系的互动强度、归一化强度 w/√(s_u·s_v) 与邻域重叠度
+      （共同好友 / 两人其余好友总数）。
+    """
+    import concurrent.futures as cf
+    if score not in dict(LINK_SCORES):
+        raise ValueError(f"未知的关系预测分数：{score}")
+    nodes, indptr, indices, weight = undirected_csr(G)
+    blocks = _link_blocks(indptr, indices)
+    results, existing = [], {}
+
+    def collect(out, done):
+        columns, cn = out
+        results.append(columns)
+        existing.update(cn)
+        if progress_callback:
+            progress_callback(done, len(blocks))
+
+    use_pool = parallel and len(blocks) > 1 and (max_workers or os.cpu_count() or 1) > 1 and \
+        len(nodes) >= PARALLEL_MIN_NODES
+    if not use_pool:
+        _link_init(indptr, indices)
+        for i, (lo, hi) in enumerate(blocks, start=1):
+            checkpoint()
+            collect(_link_block(lo, hi, k, score), i)
+    else:
+        pool = cf.ProcessPoolExecutor(max_workers=max_workers, initializer=_link_init, initargs=(indptr, indices))
+        cancelled = False
+        try:
+            pending = {pool.submit(_link_block, lo, hi, k, score) for lo, hi in blocks}
+            done = 0
+            while pending:
+                checkpoint()
+                finished, pending = cf.wait(pending, timeout=0.2, return_when=cf.FIRST_COMPLETED)
+                for fut in finished:
+                    done += 1
+                    collect(fut.result(), done)
+        except TaskCancelled:
+            cancelled = True
+            raise
+        finally:
+            _shutdown_pool(pool, cancelled, log_sys=log_sys)
+
+    results.sort(key=lambda r: r[0][0] if len(r[0]) else -1)
+    if results:
+        row, rank, v, aa, ra, jac, cn = (np.concatenate(col) for col in zip(*results))
+    else:
+        row = rank = v = cn = np.zeros(0, dtype=np.int64)
+        aa = ra = jac = np.zeros(0)
+    names = np.array(nodes + [None], dtype=object)
+    candidates = pd.DataFrame({'人员': names[row], '排名': rank, '候选': names[v], 'Adamic-Adar': aa,
+                               '资源分配': ra, 'Jaccard': jac, '共同好友数': cn})
+
+    deg = np.diff(indptr)
+    strength = np.bincount(np.repeat(np.arange(len(nodes)), deg), weights=weight, minlength=len(nodes))
+    src = np.repeat(np.arange(len(nodes)), deg)
+    upper = src < indices
+    eu, ev, ew = src[upper], indices[upper], weight[upper]
+    cn = np.fromiter((existing.get((a, b), 0) for a, b in zip(eu.tolist(), ev.tolist())), dtype=np.int64,
+                     count=len(eu))
+    others = deg[eu] + deg[ev] - 2 - cn
+    ties = pd.DataFrame({
+        '人员A': [nodes[i] for i in eu.tolist()], '人员B': [nodes[i] for i in ev.tolist()],
+        '互动强度': ew, '归一化强度': ew / np.sqrt(strength[eu] * strength[ev]),
+        '共同好友数': cn, '邻域重叠度': np.divide(cn, others, out=np.zeros(len(cn)), where=others > 0),
+    })
+    return candidates, ties
+
+
+# -------------------------
+# 时间解析
+# -------------------------
+_RE_HM = re.compile(r'(\d{1,2}):(\d{2})')
+_RE_MINUTES_AGO = re.compile(r'(\d+)\s*分钟前')
+_RE_HOURS_AGO = re.compile(r'(\d+)\s*小时前')
+_RE_DAYS_AGO = re.compile(r'(\d+)\s*天前')
+_RE_YMD = re.compile(r'(\d{4})年(\d{1,2})月(\d{1,2})日')
+_RE_MD = re.compile(r'(\d{1,2})月(\d{1,2})日')
+_WEEKDAYS = {'一': 0, '二': 1, '三': 2, '四': 3, '五': 4, '六': 5, '日': 6, '天': 6}
+_RE_WEEKDAY = re.compile(r'(?:星期|周)([一二三四五六日天])')
+
+
+def parse_wechat_time(time_str, ref_ts=None):
+    """将微信时间文本解析为绝对时间戳（秒）
+
+    ref_ts 为采集时刻（默认当前时间），相对时间（"3小时前"、"昨天"等）以它为基准；
+    无法解析时返回 None。
+    """
+    s = str(time_str or '').strip()
+    if not s:
+        return None
+    ref = datetime.datetime.fromtimestamp(ref_ts) if ref_ts is not None else datetime.datetime.now()
+    hm = _RE_HM.search(s)
+    hour, minute = (int(hm.group(1)), int(hm.group(2))) if hm else (0, 0)
+    try:
+        if '刚刚' in s:
+            return ref.timestamp()
+        m = _RE_MINUTES_AGO.search(s)
+        if m:
+            return (ref - datetime.timedelta(minutes=int(m.group(1)))).timestamp()
+        m = _RE_HOURS_AGO.search(s)
+        if m:
+            return (ref - datetime.timedelta(hours=int(m.group(1)))).timestamp()
+
+        days_back = None
+        if '前天' in s:
+            days_back = 2
+        elif '昨天' in s:
+            days_back = 1
+        else:
+            m = _RE_DAYS_AGO.search(s)
+            if m:
+                days_back = int(m.group(1))
+            else:
+                m = _RE_WEEKDAY.search(s)
+                if m:
+                    days_back = (ref.weekday() - _WEEKDAYS[m.group(1)]) % 7 or 7
+        if days_back is not None:
+            day = ref - datetime.timedelta(days=days_back)
+            return day.replace(hour=hour, minute=minute, second=0, microsecond=0).timestamp()
+
+        m = _RE_YMD.search(s)
+        if m:
+            return datetime.datetime(int(m.group(1)), int(m.group(2)), int(m.group(3)), hour, minute).timestamp()
+        m = _RE_MD.search(s)
+        if m:
+            dt = datetime.datetime(ref.year, int(m.group(1)), int(m.group(2)), hour, minute)
+            if dt > ref:
+                dt = dt.replace(year=ref.year - 1)
+            return dt.timestamp()
+        if hm:
+            # 仅有时分：当天发布
+            dt = ref.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if dt > ref:
+                dt -= datetime.timedelta(days=1)
+            return dt.timestamp()
+    except ValueError:
+        return None
+    return None
+
+
+def annotate_timestamps(all_posts, ref_ts=None, overwrite=False):
+    """为缺少"时间戳"的帖子一次性解析绝对时间；返回成功解析的条数"""
+    cache = {}
+    resolved = 0
+    for post in all_posts:
+        if not overwrite and post.get('时间戳') is not None:
+            continue
+        raw = str(post.get('时间', '') or '').strip()
+        if raw not in cache:
+            cache[raw] = parse_wechat_time(raw, ref_ts)
+        post['时间戳'] = cache[raw]
+        if cache[raw] is not None:
+            resolved += 1
+    return resolved
+
+
+def posts_in_window(all_posts, start_ts=None, end_ts=None):
+    """按 [start_ts, end_ts) 时间窗口筛选帖子（基于已解析的时间戳）"""
+    ts = np.array([p.get('时间戳') if p.get('时间戳') is not None else np.nan for p in all_posts], dtype=float)
+    mask = ~np.isnan(ts)
+    if start_ts is not None:
+        mask &= ts >= start_ts
+    if end_ts is not None:
+        mask &= ts < end_ts
+    return [all_posts[i] for i in np.flatnonzero(mask)]
+
+
 # -------------------------
 # 导出功能
 # -------------------------
-def format_time_display(time_str):
-    """处理时间显示：将时间转换为相对时间显示"""
+@functools.lru_cache(maxsize=4096)
+def _day_bucket_label(day, today, capped):
+    """按天缓存相对日期文本；capped 时 30 天以上返回 None（显示原文）"""
+    delta = today - day
+    if delta == 0:
+        return "今天"
+    if delta == 1:
+        return "昨天"
+    if capped and delta >= 30:
+        return None
+    return f"{delta}天前"
+
+
+def format_time_display(time_str, ts=None):
+    """处理时间显示：将时间转换为相对时间显示
+
+    ts 为已解析的时间戳（见 parse_wechat_time），提供时不再重复解析原文。
+    """
     try:
-        from datetime import datetime, date, timedelta
         time_str = str(time_str).strip()
-        now = datetime.now()
-        today = now.date()
 
         if any(k in time_str for k in ['前', '昨天', '刚刚']):
             return time_str
 
         if ':' in time_str and '月' not in time_str and '年' not in time_str:
-            try:
-                return f"今天 {time_str}"
-            except Exception:
-                pass
+            return f"今天 {time_str}"
 
-        if '月' in time_str and '日' in time_str and '年' not in time_str:
-            try:
-                parsed_dt = datetime.strptime(f"{now.year}-{time_str}", "%Y-%m月%d日")
-                if parsed_dt.date() > today:
-                    parsed_dt = datetime.strptime(f"{now.year - 1}-{time_str}", "%Y-%m月%d日")
-
-                parsed_date = parsed_dt.date()
-                delta = today - parsed_date
-                if delta.days == 0:
-                    return "今天"
-                if delta.days == 1:
-                    return "昨天"
-                if delta.days < 30:
-                    return f"{delta.days}天前"
-                else:
-                    return time_str
-            except Exception:
-                return time_str
-
-        if '年' in time_str and '月' in time_str and '日' in time_str:
-            try:
-                parsed_date = datetime.strptime(time_str, "%Y年%m月%d日").date()
-                delta = today - parsed_date
-                if delta.days == 0:
-                    return "今天"
-                if delta.days == 1:
-                    return "昨天"
-                return f"{delta.days}天前"
-            except Exception:
-                return time_str
+        if '月' not in time_str or '日' not in time_str:
+            return time_str
 
-        return time_str
+        if ts is None:
+            ts = parse_wechat_time(time_str)
+        if ts is None:
+            return time_str
+        day = datetime.date.fromtimestamp(ts).toordinal()
+        label = _day_bucket_label(day, datetime.date.today().toordinal(), '年' not in time_str)
+        return label if label is not None else time_str
     except Exception:
         return str(time_str)
 
 
+# 网络导出携带的节点指标：(analysis 键, 显示名, 类型)；社区编号导出时从 1 开始
+GRAPH_NODE_METRICS = (
+    ('degree', '度', 'int'),
+    ('degree_centrality', '度中心性', 'double'),
+    ('betweenness', '介数中心性', 'double'),
+    ('pagerank', 'PageRank', 'double'),
+    ('hubs', '枢纽值', 'double'),
+    ('authorities', '权威值', 'double'),
+    ('core_number', 'k-核', 'int'),
+    ('clustering', '聚类系数', 'double'),
+    ('communities', '所属社区', 'int'),
+)
+GRAPH_EDGE_ATTRS = (('weight', '互动强度', 'double'), ('likes', '点赞', 'int'), ('comments', '评论', 'int'),
+                    ('replies', '回复', 'int'))
+_GRAPH_WRITE_BATCH = 8192
+_RE_XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def _xml_attr(val):
+    """XML 属性值（含引号），去除 XML 1.0 不允许的控制字符"""
+    return quoteattr(_RE_XML_INVALID.sub('', str(val)))
+
+
+def _open_text_out(path):
+    """按扩展名打开文本输出流，.gz 结尾时 gzip 压缩"""
+    if path.lower().endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=6)
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def _graph_metrics(G, analysis):
+    """导出所用的节点指标列表 [(键, 显示名, 类型, {节点: 值})]，只保留实际计算过的指标"""
+    analysis = analysis or {}
+    metrics = []
+    for key, label, kind in GRAPH_NODE_METRICS:
+        values = analysis.get(key)
+        if key == 'degree' and not values:
+            values = G.degree
+        if not values:
+            continue
+        if key == 'communities':
+            values = {node: cid + 1 for node, cid in values.items()}
+        metrics.append((key, label, kind, values))
+    return metrics
+
+
+def _fmt_value(val, kind):
+    return str(int(val)) if kind == 'int' else f"{float(val):.10g}"
+
+
+def _node_values(node, metrics):
+    for key, _label, kind, values in metrics:
+        try:
+            val = values[node]
+        except (KeyError, TypeError):
+            continue
+        yield key, _fmt_value(val, kind)
+
+
+def _edge_values(data):
+    return [(key, _fmt_value(data[key], kind)) for key, _label, kind in GRAPH_EDGE_ATTRS
+            if data.get(key) is not None]
+
+
+def _write_batched(f, lines_iter):
+    """逐批写出生成的文本行，内存占用与图规模无关"""
+    buf = []
+    for line in lines_iter:
+        buf.append(line)
+        if len(buf) >= _GRAPH_WRITE_BATCH:
+            f.write("".join(buf))
+            buf.clear()
+            checkpoint()
+    if buf:
+        f.write("".join(buf))
+
+
+@profiled("导出网络.GraphML")
+def write_graphml_stream(G, analysis, path):
+    """流式写出 GraphML：节点指标与边的强度/点赞/评论/回复作为属性"""
+    metrics = _graph_metrics(G, analysis)
+    types = {'int': 'int', 'double': 'double'}
+    with _open_text_out(path) as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+                'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+                'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n')
+        for key, label, kind, _values in metrics:
+            f.write(f'  <key id="{key}" for="node" attr.name={quoteattr(label)} attr.type="{types[kind]}"/>\n')
+        for key, label, kind in GRAPH_EDGE_ATTRS:
+            f.write(f'  <key id="{key}" for="edge" attr.name={quoteattr(label)} attr.type="{types[kind]}"/>\n')
+        f.write(f'  <graph id="G" edgedefault="{"directed" if G.is_directed() else "undirected"}">\n')
+
+        # 节点 id 的转义结果在写节点时缓存，写边时直接复用（占用与节点数成正比，与边数无关）
+        ids = {}
+
+        def node_lines():
+            for node in G.nodes():
+                ids[node] = quoted = _xml_attr(node)
+                attrs = "".join(f'<data key="{k}">{v}</data>' for k, v in _node_values(node, metrics))
+                yield f'    <node id={quoted}>{attrs}</node>\n'
+
+        def edge_lines():
+            for u, v, data in G.edges(data=True):
+                attrs = "".join([f'<data key="{k}">{val}</data>' for k, val in _edge_values(data)])
+                yield f'    <edge source={ids[u]} target={ids[v]}>{attrs}</edge>\n'
+
+        _write_batched(f, node_lines())
+        _write_batched(f, edge_lines())
+        f.write('  </graph>\n</graphml>\n')
+    return {'nodes': G.number_of_nodes(), 'edges': G.number_of_edges(), 'files': [path]}
+
+
+@profiled("导出网络.GEXF")
+def write_gexf_stream(G, analysis, path):
+    """流式写出 GEXF 1.2：边强度写入原生 weight，其余指标为节点/边属性"""
+    metrics = _graph_metrics(G, analysis)
+    types = {'int': 'integer', 'double': 'double'}
+    with _open_text_out(path) as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<gexf xmlns="http://www.gexf.net/1.2draft" version="1.2">\n'
+                f'  <meta><creator>{xml_escape(APP_TITLE)}</creator></meta>\n'
+                f'  <graph mode="static" defaultedgetype="{"directed" if G.is_directed() else "undirected"}">\n'
+                '    <attributes class="node">\n')
+        for key, label, kind, _values in metrics:
+            f.write(f'      <attribute id="{key}" title={quoteattr(label)} type="{types[kind]}"/>\n')
+        f.write('    </attributes>\n    <attributes class="edge">\n')
+        for key, label, kind in GRAPH_EDGE_ATTRS[1:]:
+            f.write(f'      <attribute id="{key}" title={quoteattr(label)} type="{types[kind]}"/>\n')
+        f.write('    </attributes>\n    <nodes>\n')
+
+        ids = {}
+
+        def node_lines():
+            for node in G.nodes():
+                ids[node] = name = _xml_attr(node)
+                attrs = "".join(f'<attvalue for="{k}" value="{v}"/>' for k, v in _node_values(node, metrics))
+                yield f'      <node id={name} label={name}><attvalues>{attrs}</attvalues></node>\n'
+
+        def edge_lines():
+            for i, (u, v, data) in enumerate(G.edges(data=True)):
+                weight = '1'
+                attrs = []
+                for k, val in _edge_values(data):
+                    if k == 'weight':
+                        weight = val
+                    else:
+                        attrs.append(f'<attvalue for="{k}" value="{val}"/>')
+                yield (f'      <edge id="{i}" source={ids[u]} target={ids[v]} '
+                       f'weight="{weight}"><attvalues>{"".join(attrs)}</attvalues></edge>\n')
+
+        _write_batched(f, node_lines())
+        f.write('    </nodes>\n    <edges>\n')
+        _write_batched(f, edge_lines())
+        f.write('    </edges>\n  </graph>\n</gexf>\n')
+    return {'nodes': G.number_of_nodes(), 'edges': G.number_of_edges(), 'files': [path]}
+
+
+def graph_nodes_path(path):
+    """边表 CSV 对应的节点表路径：a.csv.gz -> a.nodes.csv.gz"""
+    for ext in ('.csv.gz', '.csv'):
+        if path.lower().endswith(ext):
+            return path[:-len(ext)] + ".nodes" + ext
+    return path + ".nodes.csv"
+
+
+@profiled("导出网络.CSV")
+def write_edge_list_csv(G, analysis, path):
+    """流式写出边表 CSV（source,target,weight,likes,comments,replies）及同名节点指标表，.gz 结尾时压缩"""
+    metrics = _graph_metrics(G, analysis)
+    nodes_path = graph_nodes_path(path)
+    with _open_text_out(path) as f:
+        writer = csv.writer(f)
+        writer.writerow(['source', 'target'] + [key for key, _label, _kind in GRAPH_EDGE_ATTRS])
+        for i, (u, v, data) in enumerate(G.edges(data=True), 1):
+            writer.writerow([u, v] + [data.get(key, '') for key, _label, _kind in GRAPH_EDGE_ATTRS])
+            if not i % _GRAPH_WRITE_BATCH:
+                checkpoint()
+    with _open_text_out(nodes_path) as f:
+        writer = csv.writer(f)
+        writer.writerow(['id'] + [key for key, _label, _kind, _values in metrics])
+        for i, node in enumerate(G.nodes(), 1):
+            row = [node]
+            for _key, _label, kind, values in metrics:
+                try:
+                    row.append(_fmt_value(values[node], kind))
+                except (KeyError, TypeError):
+                    row.append('')
+            writer.writerow(row)
+            if not i % _GRAPH_WRITE_BATCH:
+                checkpoint()
+    return {'nodes': G.number_of_nodes(), 'edges': G.number_of_edges(), 'files': [path, nodes_path]}
+
+
+def export_graph_file(G, analysis, path):
+    """按扩展名选择导出格式：.graphml / .gexf（可加 .gz）或 .csv / .csv.gz 边表"""
+    lower = path.lower()
+    if lower.endswith('.gz'):
+        lower = lower[:-3]
+    if lower.endswith('.graphml'):
+        return write_graphml_stream(G, analysis, path)
+    if lower.endswith('.gexf'):
+        return write_gexf_stream(G, analysis, path)
+    if lower.endswith('.csv'):
+        return write_edge_list_csv(G, analysis, path)
+    raise ValueError(f"不支持的网络导出格式：{os.path.basename(path)}")
+
+
+# -------------------------
+# 网络布局与交互式网页导出
+# -------------------------
+_LAYOUT_CACHE = weakref.WeakKeyDictionary()
+_GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+
+def _unit_layout(sub, seed, limit=100):
+    """社区内部布局，归一化到单位圆内：小社区用弹簧布局，大社区按度从中心向外排成葵花籽状"""
+    n = sub.number_of_nodes()
+    nodes = list(sub.nodes())
+    if n == 1:
+        return {nodes[0]: (0.0, 0.0)}
+    if n <= limit:
+        pos = nx.spring_layout(sub, seed=seed, iterations=30, weight='weight')
+        xy = np.array([pos[v] for v in nodes], dtype=float)
+    else:
+        nodes.sort(key=lambda v: -sub.degree(v, weight='weight'))
+        k = np.arange(n)
+        r = np.sqrt((k + 0.5) / n)
+        xy = np.column_stack([r * np.cos(k * _GOLDEN_ANGLE), r * np.sin(k * _GOLDEN_ANGLE)])
+    xy -= xy.mean(axis=0)
+    extent = np.sqrt((xy ** 2).sum(axis=1)).max()
+    if extent > 0:
+        xy /= extent
+    return {v: (float(x), float(y)) for v, (x, y) in zip(nodes, xy)}
+
+
+def _separate_discs(centers, radii, gap=0.5, iterations=80):
+    """迭代推开互相重叠的圆（社区占位），保持整体相对位置"""
+    P = centers.copy()
+    for _ in range(iterations):
+        diff = P[:, None, :] - P[None, :, :]
+        dist = np.sqrt((diff ** 2).sum(axis=2)) + np.eye(len(P))
+        overlap = radii[:, None] + radii[None, :] + gap - dist
+        np.fill_diagonal(overlap, 0)
+        overlap = np.clip(overlap, 0, None)
+        if not overlap.any():
+            break
+        push = (diff / dist[:, :, None]) * (overlap / 2)[:, :, None]
+        P += push.sum(axis=1)
+    return P
+
+
+@profiled("网络布局")
+def graph_layout(G, communities=None, seed=42, small=200):
+    """大图布局，返回 {节点: (x, y)}；同一图与参数的结果缓存复用（批量出图、网页导出共用同一坐标）
+
+    先按社区分组（无社区时按连通分量），社区间关系图用弹簧布局定位后推开重叠，社区内部
+    再各自布局并按 sqrt(人数) 缩放；最大的 small 个社区之外的零散小组排在外圈。
+    单次弹簧布局规模有上限，整体耗时与节点数近似线性。
+    """
+    cache = _LAYOUT_CACHE.setdefault(G, {})
+    key = (seed, small, G.number_of_nodes(), G.number_of_edges(), bool(communities))
+    if key in cache:
+        return cache[key]
+    UG = G.to_undirected(as_view=True) if G.is_directed() else G
+    group_of = {}
+    if communities:
+        group_of.update((v, c) for v, c in communities.items() if v in G)
+    missing = [v for v in G.nodes() if v not in group_of]
+    if missing:
+        base = max(group_of.values(), default=-1) + 1
+        for i, comp in enumerate(nx.connected_components(UG.subgraph(missing))):
+            for v in comp:
+                group_of[v] = base + i
+    groups = defaultdict(list)
+    for v, g in group_of.items():
+        groups[g].append(v)
+    order = sorted(groups, key=lambda g: -len(groups[g]))
+    main_groups, rest = order[:small], order[small:]
+
+    # 社区间关系图（只含主要社区）
+    meta = nx.Graph()
+    meta.add_nodes_from(main_groups)
+    main_set = set(main_groups)
+    for i, (u, v, data) in enumerate(UG.edges(data=True)):
+        if not i & 0xffff:
+            checkpoint()
+        gu, gv = group_of[u], group_of[v]
+        if gu != gv and gu in main_set and gv in main_set:
+            w = data.get('weight', 1)
+            if meta.has_edge(gu, gv):
+                meta[gu][gv]['weight'] += w
+            else:
+                meta.add_edge(gu, gv, weight=w)
+    radii = np.array([math.sqrt(len(groups[g])) for g in main_groups], dtype=float)
+    if len(main_groups) > 1:
+        mpos = nx.spring_layout(meta, seed=seed, iterations=100, weight='weight')
+        centers = np.array([mpos[g] for g in main_groups], dtype=float) * radii.sum() / 2
+        centers = _separate_discs(centers, radii)
+    else:
+        centers = np.zeros((len(main_groups), 2))
+
+    placed = {g: (centers[i], radii[i]) for i, g in enumerate(main_groups)}
+    if rest:
+        # 零散小组沿外圈依次排列
+        extent = float(np.sqrt((centers ** 2).sum(axis=1)).max() + radii.max()) if len(centers) else 0.0
+        ring, angle = extent + 3.0, 0.0
+        for g in rest:
+            r = math.sqrt(len(groups[g]))
+            step = (2 * r + 0.5) / ring
+            if angle + step > 2 * math.pi:
+                ring, angle = ring + 3.0, 0.0
+                step = (2 * r + 0.5) / ring
+            angle += step / 2
+            placed[g] = (np.array([ring * math.cos(angle), ring * math.sin(angle)]), r)
+            angle += step / 2
+
+    pos = {}
+    for g, members in groups.items():
+        checkpoint()
+        (cx, cy), r = placed[g]
+        for v, (x, y) in _unit_layout(UG.subgraph(members), seed).items():
+            pos[v] = (cx + x * r, cy + y * r)
+    cache[key] = pos
+    return pos
+
+
+def _b64_array(values, dtype):
+    return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode('ascii')
+
+
+def _html_viewer_data(G, analysis, pos):
+    """网页查看器所需数据：名称列表 + base64 编码的定长数组（坐标、社区、指标、边与邻接表）"""
+    analysis = analysis or {}
+    nodes = list(G.nodes())
+    index = {v: i for i, v in enumerate(nodes)}
+    n = len(nodes)
+    communities = analysis.get('communities') or {}
+    comm = np.fromiter((communities.get(v, -1) for v in nodes), dtype=np.int32, count=n)
+    xy = np.array([pos[v] for v in nodes], dtype=np.float64).reshape(n, 2)
+    m = G.number_of_edges()
+    eu = np.empty(m, dtype=np.uint32)
+    ev = np.empty(m, dtype=np.uint32)
+    ew = np.empty(m, dtype=np.float32)
+    for i, (u, v, w) in enumerate(G.edges(data='weight', default=1)):
+        eu[i], ev[i], ew[i] = index[u], index[v], w
+    # 无向邻接表（CSR）：用于点击某人时高亮其关系
+    src = np.concatenate([eu, ev])
+    dst = np.concatenate([ev, eu])
+    wts = np.concatenate([ew, ew])
+    order = np.argsort(src, kind='stable')
+    offsets = np.zeros(n + 1, dtype=np.uint32)
+    np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+    metrics = []
+    for key, label, kind, values in _graph_metrics(G, analysis):
+        if key == 'communities':
+            continue
+        data = np.fromiter((float(values[v]) if v in values else math.nan for v in nodes)
+                           if isinstance(values, dict) else (float(values[v]) for v in nodes),
+                           dtype=np.float32, count=n)
+        metrics.append({'key': key, 'label': label, 'int': kind == 'int', 'data': _b64_array(data, '<f4')})
+    return {
+        'names': [str(v) for v in nodes],
+        'x': _b64_array(xy[:, 0], '<f4'), 'y': _b64_array(xy[:, 1], '<f4'),
+        'comm': _b64_array(comm, '<i4'), 'ncomm': len(set(communities.values())),
+        'eu': _b64_array(eu, '<u4'), 'ev': _b64_array(ev, '<u4'), 'ew': _b64_array(ew, '<f4'),
+        'off': _b64_array(offsets, '<u4'), 'nb': _b64_array(dst[order], '<u4'),
+        'nw': _b64_array(wts[order], '<f4'),
+        'metrics': metrics,
+        'directed': G.is_directed(),
+    }
+
+
+_HTML_VIEWER_TEMPLATE = r"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+html,body{margin:0;height:100%;overflow:hidden;background:#f5f5f5;font-family:"Microsoft YaHei","PingFang SC",sans-serif}
+#c{position:absolute;left:0;top:0;width:100%;height:100%;cursor:grab}
+.panel{position:absolute;background:rgba(255,255,255,.94);border-radius:4px;box-shadow:0 1px 4px rgba(0,0,0,.25);font-size:13px}
+#bar{left:8px;top:8px;padding:6px 8px}
+#bar input,#bar select,#bar button{font-size:12px;margin:2px}
+#info{right:8px;top:8px;width:280px;max-height:calc(100% - 32px);overflow:auto;padding:8px;display:none}
+#info table{border-collapse:collapse;width:100%}
+#info td{padding:1px 4px;border-bottom:1px solid #eee}
+#info a{color:#0066cc;cursor:pointer;text-decoration:none}
+#tip{position:absolute;pointer-events:none;background:#333;color:#fff;padding:2px 6px;border-radius:3px;font-size:12px;display:none}
+</style>
+</head>
+<body>
+<canvas id="c"></canvas>
+<div id="bar" class="panel"><b>__TITLE__</b> <span id="stats"></span><br>
+<input id="q" size="18" placeholder="搜索人员，回车定位">
+颜色 <select id="mode"></select> 大小 <select id="sizeBy"></select>
+<button id="reset">重置视图</button><button id="clear">清除选择</button></div>
+<div id="info" class="panel"></div>
+<div id="tip"></div>
+<script>
+const D = __DATA__;
+(function () {
+"use strict";
+function dec(s, T) { const b = atob(s), u = new Uint8Array(b.length); for (let i = 0; i < b.length; i++) u[i] = b.charCodeAt(i); return new T(u.buffer); }
+function esc(s) { return String(s).replace(/[&<>"]/g, c => ({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"}[c])); }
+const N = D.names.length, X = dec(D.x, Float32Array), Y = dec(D.y, Float32Array), C = dec(D.comm, Int32Array);
+const EU = dec(D.eu, Uint32Array), EV = dec(D.ev, Uint32Array), E = EU.length;
+const OFF = dec(D.off, Uint32Array), NB = dec(D.nb, Uint32Array), NW = dec(D.nw, Float32Array);
+const M = {}, LABEL = {}, ISINT = {};
+D.metrics.forEach(m => { M[m.key] = dec(m.data, Float32Array); LABEL[m.key] = m.label; ISINT[m.key] = m.int; });
+const PALETTE = ["#1f77b4","#ff7f0e","#2ca02c","#d62728","#9467bd","#8c564b","#e377c2","#17becf","#bcbd22","#393b79",
+                 "#637939","#8c6d31","#843c39","#7b4173","#3182bd","#e6550d","#31a354","#756bb1","#d6616b","#636363"];
+const cv = document.getElementById("c"), ctx = cv.getContext("2d");
+const tip = document.getElementById("tip"), info = document.getElementById("info");
+const mode = document.getElementById("mode"), sizeBy = document.getElementById("sizeBy"), q = document.getElementById("q");
+let W = 0, H = 0, scale = 1, tx = 0, ty = 0, fitScale = 1, ego = -1, hover = -1, lastMove = 0, queued = false;
+const inEgo = new Uint8Array(N);
+let sizeN = new Float32Array(N), colors = [], buckets = [], labelOrder = [];
+
+document.getElementById("stats").textContent = N + " 个节点 · " + E + " 条边 · " + D.ncomm + " 个社区";
+mode.add(new Option("社区", "comm"));
+sizeBy.add(new Option("统一", "none"));
+D.metrics.forEach(m => { mode.add(new Option(m.label, m.key)); sizeBy.add(new Option(m.label, m.key)); });
+sizeBy.value = M.pagerank ? "pagerank" : (M.degree_centrality ? "degree_centrality" : "none");
+
+function normalize(a) {
+  let lo = Infinity, hi = -Infinity;
+  for (let i = 0; i < a.length; i++) { const v = a[i]; if (v === v) { if (v < lo) lo = v; if (v > hi) hi = v; } }
+  const out = new Float32Array(a.length), d = hi > lo ? hi - lo : 1;
+  for (let i = 0; i < a.length; i++) { const v = a[i]; out[i] = v === v ? (v - lo) / d : 0; }
+  return out;
+}
+function recolor() {
+  const idx = new Uint16Array(N);
+  if (mode.value === "comm") {
+    colors = PALETTE.concat(["#bbbbbb"]);
+    for (let i = 0; i < N; i++) idx[i] = C[i] < 0 ? PALETTE.length : C[i] % PALETTE.length;
+  } else {
+    const v = normalize(M[mode.value]);
+    colors = [];
+    for (let b = 0; b < 16; b++) colors.push("hsl(" + Math.round(220 - 220 * b / 15) + ",75%,48%)");
+    for (let i = 0; i < N; i++) idx[i] = Math.min(15, Math.floor(v[i] * 16));
+  }
+  // 同色节点合并为一条路径批量填充
+  const lists = colors.map(() => []);
+  for (let i = 0; i < N; i++) lists[idx[i]].push(i);
+  buckets = lists.map(l => Uint32Array.from(l));
+}
+function resize() {
+  sizeN = sizeBy.value === "none" ? new Float32Array(N).fill(0.2) : normalize(M[sizeBy.value]);
+  labelOrder = Array.from({length: N}, (_, i) => i).sort((a, b) => sizeN[b] - sizeN[a]).slice(0, 300);
+}
+function radius(i) { return (1.5 + 7 * Math.sqrt(sizeN[i])) * Math.min(4, Math.max(0.5, Math.sqrt(scale / fitScale))); }
+
+// 均匀网格空间索引，用于鼠标拾取
+let x0 = Infinity, x1 = -Infinity, y0 = Infinity, y1 = -Infinity;
+for (let i = 0; i < N; i++) { if (X[i] < x0) x0 = X[i]; if (X[i] > x1) x1 = X[i]; if (Y[i] < y0) y0 = Y[i]; if (Y[i] > y1) y1 = Y[i]; }
+const G = Math.max(1, Math.ceil(Math.sqrt(N / 4))), cw = (x1 - x0) / G || 1, ch = (y1 - y0) / G || 1;
+const cells = new Map();
+for (let i = 0; i < N; i++) {
+  const k = Math.min(G - 1, Math.floor((X[i] - x0) / cw)) * 65536 + Math.min(G - 1, Math.floor((Y[i] - y0) / ch));
+  let a = cells.get(k); if (!a) { a = []; cells.set(k, a); } a.push(i);
+}
+function pick(sx, sy) {
+  const wx = (sx - tx) / scale, wy = (sy - ty) / scale, r = 10 / scale;
+  const ci0 = Math.max(0, Math.floor((wx - r - x0) / cw)), ci1 = Math.min(G - 1, Math.floor((wx + r - x0) / cw));
+  const cj0 = Math.max(0, Math.floor((wy - r - y0) / ch)), cj1 = Math.min(G - 1, Math.floor((wy + r - y0) / ch));
+  let best = -1, bd = Infinity;
+  for (let ci = ci0; ci <= ci1; ci++) for (let cj = cj0; cj <= cj1; cj++) {
+    const a = cells.get(ci * 65536 + cj); if (!a) continue;
+    for (const i of a) {
+      const dx = X[i] * scale + tx - sx, dy = Y[i] * scale + ty - sy, d = dx * dx + dy * dy, rr = Math.max(radius(i), 4);
+      if (d < rr * rr && d < bd) { bd = d; best = i; }
+    }
+  }
+  return best;
+}
+function fit() {
+  W = window.innerWidth; H = window.innerHeight;
+  const dpr = window.devicePixelRatio || 1;
+  cv.width = W * dpr; cv.height = H * dpr; ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+  fitScale = scale = 0.9 * Math.min(W / ((x1 - x0) || 1), H / ((y1 - y0) || 1));
+  tx = W / 2 - (x0 + x1) / 2 * scale; ty = H / 2 - (y0 + y1) / 2 * scale;
+}
+function draw() {
+  ctx.clearRect(0, 0, W, H);
+  // 交互进行中只绘制抽样的边，停止后补全
+  const moving = performance.now() - lastMove < 200, step = Math.max(1, Math.ceil(E / (moving ? 20000 : 400000)));
+  ctx.lineWidth = 0.6;
+  ctx.strokeStyle = ego >= 0 ? "rgba(150,150,150,0.06)" : "rgba(110,110,110," + Math.min(0.35, 0.03 + 3000 / (E + 1)) + ")";
+  ctx.beginPath();
+  for (let e = 0; e < E; e += step) {
+    const a = EU[e], b = EV[e], ax = X[a] * scale + tx, ay = Y[a] * scale + ty, bx = X[b] * scale + tx, by = Y[b] * scale + ty;
+    if ((ax < 0 && bx < 0) || (ax > W && bx > W) || (ay < 0 && by < 0) || (ay > H && by > H)) continue;
+    ctx.moveTo(ax, ay); ctx.lineTo(bx, by);
+  }
+  ctx.stroke();
+  if (ego >= 0) {
+    ctx.strokeStyle = "rgba(230,85,13,0.75)"; ctx.lineWidth = 1.2; ctx.beginPath();
+    const ex = X[ego] * scale + tx, ey = Y[ego] * scale + ty;
+    for (let k = OFF[ego]; k < OFF[ego + 1]; k++) { const b = NB[k]; ctx.moveTo(ex, ey); ctx.lineTo(X[b] * scale + tx, Y[b] * scale + ty); }
+    ctx.stroke();
+  }
+  for (let c = 0; c < buckets.length; c++) {
+    const list = buckets[c];
+    ctx.fillStyle = colors[c];
+    for (const pass of ego >= 0 ? [0, 1] : [1]) {
+      ctx.globalAlpha = ego >= 0 && pass === 0 ? 0.15 : 0.9;
+      ctx.beginPath();
+      for (let k = 0; k < list.length; k++) {
+        const i = list[k];
+        if (ego >= 0 && (pass === 1) !== (inEgo[i] === 1)) continue;
+        const sx = X[i] * scale + tx, sy = Y[i] * scale + ty, r = radius(i);
+        if (sx < -r || sx > W + r || sy < -r || sy > H + r) continue;
+        if (r < 2.5) ctx.rect(sx - r, sy - r, 2 * r, 2 * r); else { ctx.moveTo(sx + r, sy); ctx.arc(sx, sy, r, 0, 6.2832); }
+      }
+      ctx.fill();
+    }
+  }
+  ctx.globalAlpha = 1;
+  ctx.font = "12px sans-serif"; ctx.fillStyle = "#222"; ctx.textBaseline = "middle";
+  let labels;
+  if (ego >= 0) {
+    labels = [ego];
+    for (let k = OFF[ego]; k < OFF[ego + 1] && labels.length < 60; k++) labels.push(NB[k]);
+  } else {
+    labels = labelOrder.slice(0, Math.min(labelOrder.length, Math.round(15 * scale / fitScale)));
+  }
+  for (const i of labels) {
+    const sx = X[i] * scale + tx, sy = Y[i] * scale + ty;
+    if (sx < 0 || sx > W || sy < 0 || sy > H) continue;
+    ctx.fillText(D.names[i], sx + radius(i) + 2, sy);
+  }
+  for (const i of [ego, hover]) {
+    if (i < 0) continue;
+    ctx.strokeStyle = "#000"; ctx.lineWidth = 2; ctx.beginPath();
+    ctx.arc(X[i] * scale + tx, Y[i] * scale + ty, radius(i) + 3, 0, 6.2832); ctx.stroke();
+  }
+}
+function redraw() { if (!queued) { queued = true; requestAnimationFrame(() => { queued = false; draw(); }); } }
+function moved() { lastMove = performance.now(); redraw(); setTimeout(redraw, 220); }
+
+function select(i, center) {
+  ego = i; inEgo.fill(0);
+  if (i < 0) { info.style.display = "none"; redraw(); return; }
+  inEgo[i] = 1;
+  const nbrs = [];
+  for (let k = OFF[i]; k < OFF[i + 1]; k++) { inEgo[NB[k]] = 1; nbrs.push([NB[k], NW[k]]); }
+  nbrs.sort((a, b) => b[1] - a[1]);
+  let h = "<b>" + esc(D.names[i]) + "</b><table>";
+  if (C[i] >= 0) h += "<tr><td>社区</td><td>" + (C[i] + 1) + "</td></tr>";
+  for (const key in M) { const v = M[key][i]; if (v === v) h += "<tr><td>" + esc(LABEL[key]) + "</td><td>" + (ISINT[key] ? v : v.toFixed(4)) + "</td></tr>"; }
+  h += "</table><p>关系 " + nbrs.length + " 人（按互动强度）：</p>";
+  h += nbrs.slice(0, 50).map(([j, w]) => "<a data-i='" + j + "'>" + esc(D.names[j]) + "</a> " + w).join("<br>");
+  info.innerHTML = h; info.style.display = "block";
+  if (center) { scale = Math.max(scale, fitScale * 4); tx = W / 2 - X[i] * scale; ty = H / 2 - Y[i] * scale; moved(); }
+  redraw();
+}
+info.addEventListener("click", e => { const j = e.target.getAttribute("data-i"); if (j !== null) select(+j, true); });
+
+let drag = null;
+cv.addEventListener("mousedown", e => { drag = {x: e.clientX, y: e.clientY, moved: false}; cv.style.cursor = "grabbing"; });
+window.addEventListener("mouseup", e => {
+  if (drag && !drag.moved && e.target === cv) select(pick(e.clientX, e.clientY), false);
+  drag = null; cv.style.cursor = "grab";
+});
+cv.addEventListener("mousemove", e => {
+  if (drag) {
+    const dx = e.clientX - drag.x, dy = e.clientY - drag.y;
+    if (Math.abs(dx) + Math.abs(dy) > 2) drag.moved = true;
+    tx += dx; ty += dy; drag.x = e.clientX; drag.y = e.clientY; moved(); return;
+  }
+  const i = pick(e.clientX, e.clientY);
+  if (i !== hover) { hover = i; redraw(); }
+  if (i >= 0) { tip.textContent = D.names[i]; tip.style.left = (e.clientX + 12) + "px"; tip.style.top = (e.clientY + 12) + "px"; tip.style.display = "block"; }
+  else tip.style.display = "none";
+});
+cv.addEventListener("wheel", e => {
+  e.preventDefault();
+  const f = Math.exp(-e.deltaY * 0.0015);
+  tx = e.clientX - (e.clientX - tx) * f; ty = e.clientY - (e.clientY - ty) * f; scale *= f; moved();
+}, {passive: false});
+q.addEventListener("keydown", e => {
+  if (e.key !== "Enter") return;
+  const s = q.value.trim().toLowerCase(); if (!s) return;
+  let found = D.names.findIndex(n => n.toLowerCase() === s);
+  if (found < 0) found = D.names.findIndex(n => n.toLowerCase().includes(s));
+  q.style.background = found < 0 ? "#fdd" : "";
+  if (found >= 0) select(found, true);
+});
+mode.addEventListener("change", () => { recolor(); redraw(); });
+sizeBy.addEventListener("change", () => { resize(); redraw(); });
+document.getElementById("reset").addEventListener("click", () => { fit(); redraw(); });
+document.getElementById("clear").addEventListener("click", () => select(-1, false));
+window.addEventListener("resize", () => { fit(); redraw(); });
+recolor(); resize(); fit(); draw();
+})();
+</script>
+</body>
+</html>
+"""
+
+
+@profiled("导出网页")
+def export_html_viewer(G, analysis, path, layout=None, title="朋友圈互动关系网络"):
+    """导出单个离线 HTML 文件：预先计算的坐标与指标以定长数组嵌入，在浏览器中用 canvas 绘制
+
+    支持缩放/拖动、搜索定位、按社区或指标着色、点击某人高亮其关系；不引用任何外部资源。
+    """
+    if layout is None:
+        layout = graph_layout(G, (analysis or {}).get('communities'))
+    data = json.dumps(_html_viewer_data(G, analysis, layout), ensure_ascii=False, separators=(',', ':'))
+    # 防止名称中的 </script> 或行分隔符提前结束脚本
+    data = data.replace('</', '<\\/').replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+    page = _HTML_VIEWER_TEMPLATE.replace('__TITLE__', html_lib.escape(title)).replace('__DATA__', data)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(page)
+    return {'nodes': G.number_of_nodes(), 'edges': G.number_of_edges(), 'bytes': len(page.encode('utf-8'))}
+
+
+# -------------------------
+# 批量出图（离屏渲染）
+# -------------------------
+_RE_UNSAFE_FILENAME = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+
+def _image_filename(prefix, name, fmt):
+    stem = _RE_UNSAFE_FILENAME.sub('_', str(name)).strip(' .')[:60] or '_'
+    return f"{prefix}_{stem}.{fmt}"
+
+
+def ego_nodes(G, center, depth=1):
+    """与 center 相距不超过 depth 步的全部节点（有向图忽略方向）"""
+    seen, frontier = {center}, [center]
+    for _ in range(depth):
+        nxt = []
+        for v in frontier:
+            for u in nx.all_neighbors(G, v):
+                if u not in seen:
+                    seen.add(u)
+                    nxt.append(u)
+        frontier = nxt
+    return seen
+
+
+def _render_job(G, analysis, pos, nodes, path, title, center=None, node_size=300, dpi=150, label_limit=60):
+    """把一张图所需的数据整理成可序列化的数组，子进程只做绘制，不需要传递整张网络"""
+    nodes = list(nodes)
+    index = {v: i for i, v in enumerate(nodes)}
+    degree_cent = analysis.get('degree_centrality', {})
+    color = np.array([degree_cent.get(v, 0) for v in nodes], dtype=np.float32)
+    # 与界面图表一致：只画有点赞的边，评论仍计入权重与中心性
+    edges = [(index[u], index[v]) for u, v, d in G.subgraph(nodes).edges(data=True) if d.get('likes', 0) > 0]
+    labels = heapq.nlargest(label_limit, range(len(nodes)), key=lambda i: color[i])
+    if center is not None and index[center] not in labels:
+        labels.append(index[center])
+    return {
+        'path': path, 'title': title, 'dpi': dpi,
+        'xy': np.array([pos[v] for v in nodes], dtype=np.float64).reshape(len(nodes), 2),
+        'edges': np.array(edges, dtype=np.int32).reshape(len(edges), 2),
+        'color': color, 'size': node_size * (1 + color),
+        'labels': [(i, str(nodes[i])) for i in labels],
+        'center': index[center] if center is not None else -1,
+    }
+
+
+def render_graph_image(job):
+    """在 Agg 画布上绘制并保存一张关系图（不依赖 Tk 与 pyplot 当前图，可在子进程中运行）
+
+    返回 (文件路径, 渲染用时秒数)。
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import LineCollection
+    t0 = time.perf_counter()
+    fig = Figure(figsize=(12, 8), dpi=100)
+    FigureCanvasAgg(fig)
+    fig.patch.set_facecolor('#f5f5f5')
+    ax = fig.add_subplot(111)
+    xy, edges = job['xy'], job['edges']
+    if len(edges):
+        ax.add_collection(LineCollection(xy[edges], colors='#999999', linewidths=1.5, alpha=0.3, zorder=1))
+    nodes = ax.scatter(xy[:, 0], xy[:, 1], s=job['size'], c=job['color'], cmap='RdYlGn', vmin=0, vmax=1,
+                       alpha=0.8, zorder=2)
+    if job['center'] >= 0:
+        c = job['center']
+        ax.scatter(xy[c:c + 1, 0], xy[c:c + 1, 1], s=job['size'][c:c + 1] * 1.6, facecolors='none',
+                   edgecolors='black', linewidths=2, zorder=3)
+    for i, name in job['labels']:
+        ax.text(xy[i, 0], xy[i, 1], name, fontsize=8, family=FONT_NAME, ha='center', va='center', zorder=4)
+    ax.text(0.02, 0.98, f"节点数（人）：{len(xy)}\n边数（关系）：{len(edges)}", transform=ax.transAxes,
+            verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8),
+            fontproperties={'family': FONT_NAME, 'size': 9})
+    cbar = fig.colorbar(nodes, ax=ax, fraction=0.046, pad=0.04)
+    cbar.set_label('度中心性', fontproperties={'family': FONT_NAME, 'size': 9})
+    ax.set_title(job['title'], fontproperties={'family': FONT_NAME, 'size': 12, 'weight': 'bold'})
+    ax.set_aspect('equal', adjustable='datalim')
+    ax.axis('off')
+    fig.savefig(job['path'], dpi=job['dpi'], bbox_inches='tight', facecolor=fig.get_facecolor())
+    return job['path'], time.perf_counter() - t0
+
+
+@profiled("批量出图")
+def batch_render_images(G, analysis, out_dir, people=(), communities=(), depth=1, fmt='png', dpi=150,
+                        node_size=300, parallel=True, max_workers=None, progress_callback=None, log_sys=None):
+    """批量离屏出图：每人一张 depth 步以内的关系网，每个社区一张子图
+
+    所有图共用缓存的全局布局（graph_layout），同一人在不同图中位置一致。communities 为社区
+    编号（从 1 开始，与界面一致）列表，'all' 表示全部社区。多张图时在进程池中渲染；
+    progress_callback(已完成数, 总数, 文件名) 在每张图完成后调用。
+    返回 [{'类型', '目标', '文件', '节点数', '边数', '用时'}]，用时为单张图的渲染秒数。
+    """
+    import concurrent.futures as cf
+    analysis = analysis or {}
+    os.makedirs(out_dir, exist_ok=True)
+    pos = graph_layout(G, analysis.get('communities'))
+    depth_text = {1: "直接关系", 2: "朋友的朋友", 3: "三级关系"}.get(depth, "关系")
+    jobs = []
+    for person in people:
+        if person not in G:
+            if log_sys: log_sys(f"批量出图：网络中没有 {person}，已跳过")
+            continue
+        path = os.path.join(out_dir, _image_filename("人员", person, fmt))
+        jobs.append((('人员', person), _render_job(G, analysis, pos, ego_nodes(G, person, depth), path,
+                                                   f"{person}的朋友圈{depth_text}网络", center=person,
+                                                   node_size=node_size, dpi=dpi)))
+    groups = analysis.get('community_groups') or {}
+    wanted = sorted(groups) if communities == 'all' else [c - 1 for c in communities]
+    for cid in wanted:
+        if cid not in groups:
+            if log_sys: log_sys(f"批量出图：没有社区 {cid + 1}，已跳过")
+            continue
+        path = os.path.join(out_dir, _image_filename("社区", cid + 1, fmt))
+        jobs.append((('社区', cid + 1), _render_job(G, analysis, pos, groups[cid], path,
+                                                    f"社区 {cid + 1}（{len(groups[cid])} 人）互动网络",
+                                                    node_size=node_size, dpi=dpi)))
+
+    results = []
+
+    def finish(target, job, path, elapsed):
+        results.append({'类型': target[0], '目标': target[1], '文件': path, '节点数': len(job['xy']),
+                        '边数': len(job['edges']), '用时': round(elapsed, 3)})
+        if log_sys: log_sys(f"已出图 {os.path.basename(path)}（{len(job['xy'])} 人），用时 {elapsed:.2f}s")
+        if progress_callback:
+            progress_callback(len(results), len(jobs), os.path.basename(path))
+
+    workers = max_workers or os.cpu_count() or 1
+    if not parallel or workers < 2 or len(jobs) < 2:
+        for target, job in jobs:
+            checkpoint()
+            finish(target, job, *render_graph_image(job))
+        return results
+
+    pool = cf.ProcessPoolExecutor(max_workers=min(workers, len(jobs)))
+    cancelled = False
+    try:
+        pending = {pool.submit(render_graph_image, job): (target, job) for target, job in jobs}
+        while pending:
+            checkpoint()
+            finished, _ = cf.wait(list(pending), timeout=0.2, return_when=cf.FIRST_COMPLETED)
+            for fut in finished:
+                target, job = pending.pop(fut)
+                finish(target, job, *fut.result())
+    except TaskCancelled:
+        cancelled = True
+        raise
+    finally:
+        _shutdown_pool(pool, cancelled, log_sys=log_sys)
+    order = {job['path']: i for i, (_, job) in enumerate(jobs)}
+    results.sort(key=lambda r: order[r['文件']])
+    return results
+
+
+def render_main(argv=None):
+    """命令行入口：python main.py --render 输出目录 --input posts.json [--person 张三] [--community 1]"""
+    import argparse
+    parser = argparse.ArgumentParser(prog="main.py --render", description="批量生成人员/社区关系图（无需界面）")
+    parser.add_argument("--render", required=True, metavar="DIR", help="图片输出目录")
+    parser.add_argument("--input", required=True, help="帖子文件（JSON/Excel/CSV/Parquet）")
+    parser.add_argument("--person", action="append", default=[], help="为该人员生成关系网图，可重复指定")
+    parser.add_argument("--community", type=int, action="append", default=[], help="社区编号（从 1 开始），可重复指定")
+    parser.add_argument("--depth", type=int, default=1, choices=[1, 2, 3], help="人员关系网深度")
+    parser.add_argument("--format", default="png", choices=["png", "pdf", "svg"], help="图片格式")
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--workers", type=int, default=None, help="渲染进程数，默认 CPU 核数")
+    parser.add_argument("--alias", default="", help="alias_map JSON 文件")
+    args = parser.parse_args(argv)
+
+    alias_map = {}
+    if args.alias:
+        with open(args.alias, 'r', encoding='utf-8') as f:
+            alias_map = json.load(f)
+    G, _ = build_graph_from_file(args.input, alias_map=alias_map)
+    analysis = analyze_graph(G, None, None, metrics=['basic', 'degree_centrality', 'communities'], parallel=False)
+    # 未指定人员和社区时为每个社区各出一张图
+    communities = args.community or ('all' if not args.person else ())
+    t0 = time.perf_counter()
+    results = batch_render_images(G, analysis, args.render, people=args.person, communities=communities,
+                                  depth=args.depth, fmt=args.format, dpi=args.dpi, max_workers=args.workers)
+    for r in results:
+        print(f"{r['类型']} {str(r['目标']):20s} {r['节点数']:6d} 人 {r['边数']:7d} 边  {r['用时']:.2f}s  {r['文件']}")
+    print(f"共 {len(results)} 张图，总用时 {time.perf_counter() - t0:.2f}s")
+    return 0
+
+
 # -------------------------
 # 别名处理
 # -------------------------
+@profiled("别名建议")
 def suggest_aliases_from_publishers(all_posts, threshold=0.86, max_pairs=1000):
     """从所有数据列进行别名建议（发布者、点赞者、评论者）"""
     names = set()
 
-    # 收集发布者
-    for post in all_posts:
-        pub = post.get('发布者', '')
-        if pub and pub.strip():
-            names.add(pub.strip())
-
-    # 收集点赞者
-    for post in all_posts:
-        likes_raw = post.get('点赞', '')
-        if isinstance(likes_raw, str) and likes_raw.strip():
-            likers = [x.strip() for x in likes_raw.replace('、', '，').split('，') if x.strip()]
-            for liker in likers:
-                names.add(liker)
-
-    # 收集评论者
-    for post in all_posts:
-        comments = post.get('评论', []) or []
-        for comment in comments:
-            if ':' in comment:
-                commenter = comment.split(':', 1)[0].strip()
-            elif '：' in comment:
-                commenter = comment.split('：', 1)[0].strip()
-            else:
-                parts = comment.split(None, 1)
-                commenter = parts[0].strip() if parts else comment.strip()
-            if commenter:
-                names.add(commenter)
+    with PROFILER.span("别名建议.收集名称"):
+        # 收集发布者
+        for post in all_posts:
+            pub = post.get('发布者', '')
+            if pub and pub.strip():
+                names.add(pub.strip())
+
+        # 收集点赞者、评论者及被回复者（"A回复B"按 parse_comment_head 拆分，不把整段当作名称）
+        for _pid, target, actor, _kind in iter_interactions(all_posts):
+            if actor:
+                names.add(actor.strip())
+            if target:
+                names.add(target.strip())
+        names.discard('')
 
     names = list(names)
+    PROFILER.count("名称", len(names))
     suggestions = []
 
-    if HAVE_RAPIDFUZZ:
-        for i, name in enumerate(names):
-            matches = rf_process.extract(name, names, scorer=fuzz.ratio, limit=10)
-            for m_name, score, _ in matches:
-                if m_name == name: continue
-                ratio = score / 100.0
-                if ratio >= threshold:
-                    suggestions.append((name, m_name, ratio))
-            if len(suggestions) > max_pairs:
-                break
-    else:
-        import difflib
-        n = len(names)
-        for i in range(n):
-            for j in range(i + 1, n):
-                a = names[i];
-                b = names[j]
-                ratio = difflib.SequenceMatcher(None, a, b).ratio()
-                if ratio >= threshold:
-                    suggestions.append((a, b, ratio))
+    with PROFILER.span("别名建议.相似度匹配"):
+        if HAVE_RAPIDFUZZ:
+            for i, name in enumerate(names):
+                if not i & 0x3f:
+                    checkpoint()
+                matches = rf_process.extract(name, names, scorer=fuzz.ratio, limit=10)
+                PROFILER.count("查询")
+                for m_name, score, _ in matches:
+                    if m_name == name: continue
+                    ratio = score / 100.0
+                    if ratio >= threshold:
+                        suggestions.append((name, m_name, ratio))
                 if len(suggestions) > max_pairs:
                     break
-            if len(suggestions) > max_pairs:
-                break
+        else:
+            import difflib
+            n = len(names)
+            for i in range(n):
+                checkpoint()
+                for j in range(i + 1, n):
+                    a = names[i];
+                    b = names[j]
+                    ratio = difflib.SequenceMatcher(None, a, b).ratio()
+                    if ratio >= threshold:
+                        suggestions.append((a, b, ratio))
+                    if len(suggestions) > max_pairs:
+                        break
+                PROFILER.count("比较", n - i - 1)
+                if len(suggestions) > max_pairs:
+                    break
+    PROFILER.count("建议", len(suggestions))
     suggestions.sort(key=lambda x: x[2], reverse=True)
     return suggestions
 
@@ -596,6 +4563,554 @@ def build_alias_map_from_suggestions(suggestions, prefer_shorter=True):
     return amap
 
 
+# -------------------------
+# 合成数据与基准测试
+# -------------------------
+BENCH_BASELINE_PATH = os.path.join(APP_DIR, "bench_baseline.json")
+BENCH_SIZES = (1000, 10000, 100000)
+
+_SYN_SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘蒋蔡余杜叶程"
+_SYN_GIVEN = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍红鹏飞晨宇浩然思雨欣怡子涵梓轩佳琪雅婷俊杰博文天宇"
+_SYN_NICK_PREFIX = ["小", "阿", "老", "大"]
+_SYN_LATIN = ["Lily", "Amy", "Jack", "Kevin", "Coco", "Echo", "Tony", "Vivian", "Leo", "Sunny", "Momo", "Ada"]
+_SYN_SUFFIX = ["🌸", "~", "🍀", "_", "·", "（北京）", "（上海）", "-设计", "-销售", "2023", "同学"]
+_SYN_TEXTS = ["今天天气真好", "分享一首歌", "周末去爬山了", "新店打卡", "加班到深夜", "终于放假了", "晒晒晚饭",
+              "孩子的第一幅画", "读完一本好书", "健身第 30 天", "出差路上", "生日快乐！"]
+_SYN_COMMENTS = ["好看", "羡慕", "在哪里？", "哈哈哈", "赞", "下次带我", "太棒了", "同问", "收到", "好的👌"]
+
+
+def _synthetic_names(rng, n):
+    """生成 n 个互不相同的中文昵称（含少量叠字、前缀与英文名）"""
+    names, seen = [], set()
+    while len(names) < n:
+        r = rng.random()
+        if r < 0.6:
+            name = rng.choice(_SYN_SURNAMES) + "".join(rng.choice(_SYN_GIVEN) for _ in range(rng.randint(1, 2)))
+        elif r < 0.75:
+            name = rng.choice(_SYN_NICK_PREFIX) + rng.choice(_SYN_GIVEN)
+        elif r < 0.85:
+            c = rng.choice(_SYN_GIVEN)
+            name = c + c
+        else:
+            name = rng.choice(_SYN_LATIN) + rng.choice(_SYN_GIVEN)
+        while name in seen:
+            name += rng.choice(_SYN_GIVEN)
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def _synthetic_time_text(rng, age_seconds, ref):
+    """按距采集时刻的秒数生成微信风格的时间文本"""
+    dt = ref - datetime.timedelta(seconds=age_seconds)
+    if age_seconds < 60:
+        return "刚刚"
+    if age_seconds < 3600:
+        return f"{int(age_seconds // 60)}分钟前"
+    if age_seconds < 86400:
+        return f"{int(age_seconds // 3600)}小时前"
+    days = (ref.date() - dt.date()).days
+    hm = dt.strftime("%H:%M")
+    if days == 1:
+        return f"昨天 {hm}"
+    if days <= 6:
+        return f"{days}天前"
+    if dt.year == ref.year:
+        return f"{dt.month}月{dt.day}日 {hm}"
+    return f"{dt.year}年{dt.month}月{dt.day}日 {hm}"
+
+
+def generate_synthetic_posts(n_posts, n_people=None, seed=0, ref_ts=None, days=365, alias_rate=0.08,
+                             community_size=40, with_timestamps=False):
+    """生成与采集结果同结构的合成朋友圈数据
+
+    - 昵称为中文名/叠字/英文名混合，alias_rate 比例的人带有别名变体（加后缀、备注地区等），
+      互动时有一定概率以别名出现，用于测试别名建议；
+    - 发布频率、点赞数、评论数均服从幂律（少数人贡献大部分互动）；
+    - 人群按 community_size 分成若干圈子，互动大多发生在圈内；
+    - 约三成评论是"A回复B"形式，B 为发布者或此前的评论者，形成回复链；
+    - 时间为"刚刚 / N分钟前 / 昨天 HH:MM / N天前 / M月D日 HH:MM"等微信文本，
+      with_timestamps=True 时同时写入时间戳。
+    """
+    rng = random.Random(seed)
+    ref = datetime.datetime.fromtimestamp(ref_ts) if ref_ts is not None else datetime.datetime.now()
+    ref_ts = ref.timestamp()
+    if n_people is None:
+        n_people = max(20, int(n_posts ** 0.75) + 10)
+    names = _synthetic_names(rng, n_people)
+    aliases = {}
+    for name in rng.sample(names, int(n_people * alias_rate)):
+        aliases[name] = name + rng.choice(_SYN_SUFFIX)
+    n_comm = max(1, n_people // community_size)
+    members = defaultdict(list)
+    community = []
+    for i in range(n_people):
+        c = rng.randrange(n_comm)
+        community.append(c)
+        members[c].append(i)
+    # 发布频率按排名的幂律分布
+    order = list(range(n_people))
+    rng.shuffle(order)
+    cum, total = [], 0.0
+    for rank in range(n_people):
+        total += 1.0 / (rank + 1) ** 0.9
+        cum.append(total)
+
+    def display(i):
+        name = names[i]
+        if name in aliases and rng.random() < 0.3:
+            return aliases[name]
+        return name
+
+    def pick_actor(pub):
+        pool = members[community[pub]]
+        if len(pool) > 1 and rng.random() < 0.8:
+            return rng.choice(pool)
+        return rng.randrange(n_people)
+
+    posts = []
+    for k in range(n_posts):
+        pub = order[rng.choices(range(n_people), cum_weights=cum)[0]]
+        n_likes = min(n_people - 1, int(3 * (rng.paretovariate(1.5) - 1)), 200)
+        likers = []
+        seen = {pub}
+        for _ in range(n_likes):
+            a = pick_actor(pub)
+            if a not in seen:
+                seen.add(a)
+                likers.append(display(a))
+        n_comments = min(int(2 * (rng.paretovariate(1.8) - 1)), 60)
+        comments, thread = [], []
+        for _ in range(n_comments):
+            if thread and rng.random() < 0.3:
+                author = pub if rng.random() < 0.5 else pick_actor(pub)
+                target = rng.choice(thread)
+                if target == author:
+                    target = pub
+                if target != author:
+                    comments.append(f"{display(author)}回复{display(target)}: {rng.choice(_SYN_COMMENTS)}")
+                    thread.append(author)
+                    continue
+            author = pick_actor(pub)
+            if author == pub:
+                continue
+            sep = ':' if rng.random() < 0.7 else '：'
+            comments.append(f"{display(author)}{sep} {rng.choice(_SYN_COMMENTS)}")
+            thread.append(author)
+        age = min(rng.expovariate(3.0 / days), days) * 86400
+        time_str = _synthetic_time_text(rng, age, ref)
+        content = rng.choice(_SYN_TEXTS)
+        if rng.random() < 0.3:
+            content += f" (包含{rng.randint(1, 9)}张图片)"
+        post = {"编号": k + 1, "发布者": names[pub], "内容": f"{content} #{k + 1}", "时间": time_str,
+                "点赞": "，".join(likers), "评论": comments}
+        if with_timestamps:
+            post["时间戳"] = parse_wechat_time(time_str, ref_ts)
+        posts.append(post)
+    return posts
+
+
+def _bench_stages(posts, workdir):
+    """基准测试的各阶段：(名称, 可调用对象)，按执行顺序排列"""
+    publishers = [p['发布者'] for p in posts]
+    json_path = os.path.join(workdir, "bench.json")
+    csv_path = os.path.join(workdir, "bench.csv")
+    pq_path = os.path.join(workdir, "bench.parquet")
+    db_path = os.path.join(workdir, "bench.db")
+    state = {}
+
+    def json_write():
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(posts, f, ensure_ascii=False)
+
+    def json_read():
+        with open(json_path, 'r', encoding='utf-8') as f:
+            json.load(f)
+
+    def store():
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        with PostStore(db_path) as st:
+            st.upsert_posts(posts, source="bench")
+
+    def graph():
+        state['G'] = build_interaction_graph(publishers, all_posts=posts)[0]
+
+    def records():
+        state['records'] = to_records(posts)
+
+    stages = [
+        ("时间解析", lambda: annotate_timestamps(posts, overwrite=True)),
+        ("JSON写入", json_write),
+        ("JSON读取", json_read),
+        ("CSV写入", lambda: write_posts_table(posts, csv_path)),
+        ("CSV读取", lambda: read_posts_table(csv_path)),
+    ]
+    if HAVE_PYARROW:
+        stages += [
+            ("Parquet写入", lambda: save_posts_parquet(posts, pq_path)),
+            ("Parquet读取", lambda: load_posts_parquet(pq_path)),
+        ]
+    stages += [
+        ("数据库写入", store),
+        ("构图", graph),
+        ("有向构图", lambda: build_interaction_csr(posts)),
+        ("记录转换", records),
+        ("记录构图", lambda: build_interaction_graph(publishers, all_posts=state['records'])),
+        ("人员索引", lambda: build_person_index(state['records'])),
+        ("近似重复", lambda: find_near_duplicates(posts)),
+        ("网络分析", lambda: analyze_graph(state['G'], None, None, parallel=False)),
+        ("关系预测", lambda: predict_links(state['G'], parallel=False)),
+        ("别名建议", lambda: suggest_aliases_from_publishers(posts)),
+        ("时间窗口", lambda: analyze_time_windows(posts, with_communities=False)),
+    ]
+    return stages
+
+
+def run_benchmark(sizes=BENCH_SIZES, stages=None, repeat=1, seed=0, log_sys=None):
+    """在不同规模的合成数据上逐阶段计时，返回 {规模: {阶段: 秒}}（repeat>1 时取最小值）"""
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="bench_", dir=TEMP_DIR)
+    try:
+        for size in sizes:
+            t0 = time.perf_counter()
+            with PROFILER.span("基准.生成数据"):
+                posts = generate_synthetic_posts(size, seed=seed)
+            timings = {"生成数据": time.perf_counter() - t0}
+            if log_sys: log_sys(f"[{size}] 生成数据 {timings['生成数据']:.3f}s")
+            for name, fn in _bench_stages(posts, workdir):
+                if stages and name not in stages:
+                    continue
+                best = None
+                for _ in range(max(1, repeat)):
+                    t0 = time.perf_counter()
+                    with PROFILER.span(f"基准.{name}", 规模=size):
+                        fn()
+                    elapsed = time.perf_counter() - t0
+                    best = elapsed if best is None else min(best, elapsed)
+                timings[name] = best
+                if log_sys: log_sys(f"[{size}] {name} {best:.3f}s")
+            results[size] = timings
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def save_benchmark_baseline(results, path=BENCH_BASELINE_PATH):
+    import platform
+    data = {"meta": {"created": datetime.datetime.now().isoformat(timespec='seconds'),
+                     "python": platform.python_version(), "platform": platform.platform()},
+            "results": {str(size): timings for size, timings in results.items()}}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def load_benchmark_baseline(path=BENCH_BASELINE_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {int(size): timings for size, timings in data.get("results", {}).items()}
+
+
+def compare_benchmark(results, baseline, tolerance=0.25, min_seconds=0.05):
+    """对比基线，返回回归列表 [(规模, 阶段, 基线秒, 本次秒, 比值)]
+
+    本次耗时超过基线 (1 + tolerance) 倍视为回归；两者都低于 min_seconds 的阶段波动大，不参与比较。
+    """
+    regressions = []
+    for size, timings in results.items():
+        base = baseline.get(size, {})
+        for stage, now in timings.items():
+            old = base.get(stage)
+            if old is None or max(old, now) < min_seconds:
+                continue
+            ratio = now / old if old > 0 else float('inf')
+            if ratio > 1 + tolerance:
+                regressions.append((size, stage, old, now, ratio))
+    return regressions
+
+
+def bench_main(argv=None):
+    """命令行入口：python main.py --bench [--sizes 1000,10000] [--save-baseline]"""
+    import argparse
+    parser = argparse.ArgumentParser(prog="main.py --bench", description="合成数据端到端基准测试")
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in BENCH_SIZES), help="逗号分隔的帖子数")
+    parser.add_argument("--stages", default="", help="只运行指定阶段（逗号分隔）")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BENCH_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的相对变慢比例")
+    parser.add_argument("--trace", default="", help="同时导出 Chrome Trace 到该路径")
+    args = parser.parse_args(argv)
+
+    sizes = [int(x) for x in args.sizes.split(',') if x.strip()]
+    stages = [x.strip() for x in args.stages.split(',') if x.strip()] or None
+    results = run_benchmark(sizes, stages=stages, repeat=args.repeat, seed=args.seed, log_sys=print)
+    if args.trace:
+        PROFILER.export_chrome_trace(args.trace)
+    if args.save_baseline:
+        save_benchmark_baseline(results, args.baseline)
+        print(f"基线已保存：{args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"未找到基线 {args.baseline}，可加 --save-baseline 生成。")
+        return 0
+    regressions = compare_benchmark(results, load_benchmark_baseline(args.baseline), tolerance=args.tolerance)
+    if not regressions:
+        print("未发现性能回归。")
+        return 0
+    print("发现性能回归：")
+    for size, stage, old, now, ratio in regressions:
+        print(f"  [{size}] {stage}: {old:.3f}s -> {now:.3f}s（{ratio:.2f}x）")
+    return 1
+
+
+# -------------------------
+# 后台任务
+# -------------------------
+class TaskCancelled(BaseException):
+    """任务被取消
+
+    继承 BaseException，使其能穿过采集/分析代码中大量的 except Exception 直达任务边界。
+    """
+
+
+_TASK_LOCAL = threading.local()
+
+
+def current_task():
+    """当前线程正在执行的后台任务（非任务线程返回 None）"""
+    return getattr(_TASK_LOCAL, 'task', None)
+
+
+def checkpoint():
+    """取消检查点：在后台任务中且该任务已被取消时抛出 TaskCancelled，否则立即返回
+
+    供采集、构图、指标计算等长循环调用，无需层层传递任务对象。
+    """
+    task = getattr(_TASK_LOCAL, 'task', None)
+    if task is not None and task._cancel.is_set():
+        raise TaskCancelled()
+
+
+class CancelShield:
+    """在 with 块内屏蔽当前线程的取消检查点（enabled 为 False 时不起作用）
+
+    用于任务取消后仍需完成的收尾工作，如合并、保存已经采集到的数据。
+    """
+
+    __slots__ = ('enabled', 'task')
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.task = None
+
+    def __enter__(self):
+        if self.enabled:
+            self.task = getattr(_TASK_LOCAL, 'task', None)
+            _TASK_LOCAL.task = None
+        return self
+
+    def __exit__(self, *exc):
+        if self.enabled:
+            _TASK_LOCAL.task = self.task
+
+
+def _terminate_pool_workers(pool):
+    """强制结束进程池的全部工作进程，返回是否做到
+
+    Python 3.14 起有公开的 terminate_workers()。更早的版本没有公开接口，只能遍历 CPython
+    ProcessPoolExecutor 的私有属性 _processes（{pid: Process}）；其他实现或该属性不存在时返回 False。
+    """
+    if sys.version_info >= (3, 14):
+        pool.terminate_workers()
+        return True
+    processes = getattr(pool, '_processes', None) if sys.implementation.name == 'cpython' else None
+    if not isinstance(processes, dict):
+        return False
+    for proc in list(processes.values()):
+        proc.terminate()
+    return True
+
+
+def _shutdown_pool(pool, cancelled, futures=(), log_sys=None):
+    """关闭进程池：先取消尚未开始的 futures；任务被取消时直接结束子进程（子进程中的计算无法协作取消）"""
+    for fut in futures:
+        fut.cancel()
+    if cancelled and not _terminate_pool_workers(pool):
+        msg = "当前 Python 无法强制结束进程池子进程，已取消的计算会在后台运行到结束。"
+        if log_sys:
+            log_sys(msg)
+        else:
+            print(msg, file=sys.stderr)
+    pool.shutdown(wait=not cancelled)
+
+
+class Task:
+    """后台任务句柄：工作函数通过它报告进度、推送部分结果并检查取消标志
+
+    exclusive 任务会修改应用数据（采集、导入、分析），同一时间只允许一个；
+    其余为只读任务，可与之并发。
+    """
+
+    def __init__(self, runner, name, on_progress=None, on_partial=None, exclusive=False):
+        self.runner = runner
+        self.name = name
+        self.on_progress = on_progress
+        self.on_partial = on_partial
+        self.exclusive = exclusive
+        self.status = "排队中"
+        self.detail = ""
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._progress = None
+        self._progress_posted = False
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check(self):
+        """取消检查点：已请求取消时抛出 TaskCancelled"""
+        if self._cancel.is_set():
+            raise TaskCancelled()
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def progress(self, done, total=None, text=None):
+        """报告进度（同时是取消检查点）；主线程来不及处理时只保留最新一次"""
+        self.check()
+        if text:
+            self.detail = text
+        elif total:
+            self.detail = f"{done}/{total}"
+        if not self.on_progress:
+            return
+        with self._lock:
+            self._progress = (done, total, text)
+            if self._progress_posted:
+                return
+            self._progress_posted = True
+        self.runner.post(self._deliver_progress)
+
+    def _deliver_progress(self):
+        with self._lock:
+            value, self._progress_posted = self._progress, False
+        if value is not None:
+            self.on_progress(*value)
+
+    def partial(self, data):
+        """推送部分结果，在主线程回调 on_partial"""
+        self.check()
+        if self.on_partial:
+            self.runner.post(self.on_partial, data)
+
+
+class TaskRunner:
+    """固定数量的后台工作线程 + 单一回调队列
+
+    工作函数以 fn(task, *args) 的形式在工作线程执行，不得直接操作 Tk 控件；
+    进度、部分结果与完成/失败回调都经 post() 入队，由主线程的 after() 轮询执行。
+    """
+
+    MAX_HISTORY = 200
+
+    def __init__(self, master, max_workers=4, poll_ms=50, budget_ms=LOG_FLUSH_BUDGET_MS):
+        self.master = master
+        self.poll_ms = poll_ms
+        self.budget_ms = budget_ms
+        self.tasks = []
+        self._jobs = queue.Queue()
+        self._callbacks = queue.Queue()
+        for i in range(max_workers):
+            threading.Thread(target=self._worker_loop, name=f"task-{i}", daemon=True).start()
+        self.master.after(self.poll_ms, self._poll)
+
+    def submit(self, fn, *args, name="", on_progress=None, on_partial=None, on_result=None, on_error=None,
+               on_done=None, on_cancel=None, exclusive=False):
+        task = Task(self, name or getattr(fn, '__name__', '任务'), on_progress, on_partial, exclusive)
+        self.tasks.append(task)
+        if len(self.tasks) > self.MAX_HISTORY:
+            finished = [t for t in self.tasks if t.finished is not None]
+            for t in finished[:len(self.tasks) - self.MAX_HISTORY]:
+                self.tasks.remove(t)
+        self._jobs.put((task, fn, args, on_result, on_error, on_done, on_cancel))
+        return task
+
+    def post(self, callback, *args):
+        """从任意线程安排 callback(*args) 在主线程执行"""
+        self._callbacks.put((callback, args))
+
+    def running(self, exclusive=None):
+        return [t for t in self.tasks if t.finished is None and (exclusive is None or t.exclusive == exclusive)]
+
+    def cancel_all(self):
+        for t in self.running():
+            t.cancel()
+
+    def _worker_loop(self):
+        while True:
+            task, fn, args, on_result, on_error, on_done, on_cancel = self._jobs.get()
+            if task.cancelled:
+                outcome, value = "cancelled", None
+            else:
+                task.started = time.time()
+                task.status = "运行中"
+                _TASK_LOCAL.task = task
+                try:
+                    outcome, value = "ok", fn(task, *args)
+                except TaskCancelled:
+                    outcome, value = "cancelled", None
+                except Exception as e:
+                    import traceback
+                    traceback.print_exc()
+                    outcome, value = "error", e
+                finally:
+                    _TASK_LOCAL.task = None
+            self.post(self._finish, task, outcome, value, on_result, on_error, on_done, on_cancel)
+
+    def _finish(self, task, outcome, value, on_result, on_error, on_done, on_cancel):
+        task.finished = time.time()
+        task.status = {"ok": "完成", "error": "失败", "cancelled": "已取消"}[outcome]
+        if outcome == "error":
+            task.detail = str(value)
+        try:
+            if outcome == "ok" and on_result:
+                on_result(value)
+            elif outcome == "error" and on_error:
+                on_error(value)
+            elif outcome == "cancelled" and on_cancel:
+                on_cancel()
+        finally:
+            if on_done:
+                on_done()
+
+    def _poll(self):
+        deadline = time.perf_counter() + self.budget_ms / 1000.0
+        while time.perf_counter() < deadline:
+            try:
+                callback, args = self._callbacks.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception:
+                import traceback
+                traceback.print_exc()
+        self.master.after(self.poll_ms, self._poll)
+
+
 # -------------------------
 # GUI 主体
 # -------------------------
@@ -609,13 +5124,19 @@ class MomentsApp:
         self.all_posts = []
         self.graph = None
         self.analysis = None
+        self.person_index = None
+        self.search_index = None
+        self.graph_source = None  # 当前数据来自带互动表的 Parquet 文件时，分析直接读互动表
         self.alias_map = {}
         self.last_suggestions = []
+        self.window_series = None
         self.temp_dir = TEMP_DIR
 
         self._build_ui()
         self.ui_logger = UILogHandler(self.data_text, self.sys_text)
+        self.tasks = TaskRunner(master)
         self._schedule_ui_log_flush()
+        master.protocol("WM_DELETE_WINDOW", self._on_close)
 
     def _build_ui(self):
         # 顶部工具栏
@@ -636,7 +5157,7 @@ class MomentsApp:
         self.entry_timeout.pack(side='left', padx=2)
 
         ttk.Label(row1, text="导出格式", font=(FONT_NAME, FONT_SIZE_LABEL)).pack(side='left', padx=5)
-        self.combo_format = ttk.Combobox(row1, values=["json", "xlsx"], width=8, state="readonly")
+        self.combo_format = ttk.Combobox(row1, values=["json", "xlsx", "csv", "parquet"], width=8, state="readonly")
         self.combo_format.set("json")
         self.combo_format.pack(side='left', padx=2)
 
@@ -646,22 +5167,44 @@ class MomentsApp:
         self.entry_path.pack(side='left', padx=2)
         ttk.Button(row1, text="浏览...", command=self.choose_save_path).pack(side='left', padx=2)
 
+        self.store_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(row1, text="同时写入数据库", variable=self.store_var).pack(side='left', padx=8)
+        self.directed_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(row1, text="有向图", variable=self.directed_var).pack(side='left', padx=8)
+        self.collapse_dup_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(row1, text="分析前合并近似重复", variable=self.collapse_dup_var).pack(side='left', padx=8)
+        self.memprof_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(row1, text="内存剖析", variable=self.memprof_var,
+                        command=lambda: PROFILER.set_memory_tracking(self.memprof_var.get())).pack(side='left', padx=8)
+
         # 第二行：主要按钮
         btn_frame = ttk.Frame(top_frame)
         btn_frame.pack(fill='x', pady=8)
 
+        # 第三项为 True 的按钮会启动修改数据的独占任务，任务运行期间禁用；其余按钮始终可用
         button_configs = [
-            ("开始采集", self.start_collect),
-            ("导入数据", self.import_file),
-            ("关系网分析", self.start_analyze),
-            ("查看关系图", self.show_network_graph),
-            ("别名建议", self.run_alias_suggestion),
-            ("应用别名", self.apply_alias_map),
-            ("使用手册", self.show_data_interpretation),
+            ("开始采集", self.start_collect, True),
+            ("多账号采集", self.start_multi_collect, True),
+            ("导入数据", self.import_file, True),
+            ("关系网分析", self.start_analyze, True),
+            ("查看关系图", self.show_network_graph, False),
+            ("别名建议", self.run_alias_suggestion, False),
+            ("应用别名", self.apply_alias_map, True),
+            ("数据库分析", self.start_store_analyze, True),
+            ("时间窗口分析", self.start_window_analyze, False),
+            ("快照对比", self.start_snapshot_diff, False),
+            ("近似重复", self.show_near_duplicates, False),
+            ("任务列表", self.show_jobs, False),
+            ("导出性能数据", self.export_profile, False),
+            ("使用手册", self.show_data_interpretation, False),
         ]
 
-        for text, command in button_configs:
-            ttk.Button(btn_frame, text=text, command=command, width=14).pack(side='left', padx=3)
+        self.exclusive_buttons = []
+        for text, command, exclusive in button_configs:
+            btn = ttk.Button(btn_frame, text=text, command=command, width=12)
+            btn.pack(side='left', padx=3)
+            if exclusive:
+                self.exclusive_buttons.append(btn)
 
         # 进度条
         progress_frame = ttk.Frame(self.master)
@@ -670,6 +5213,9 @@ class MomentsApp:
         self.progress_var = tk.DoubleVar()
         self.progress = ttk.Progressbar(progress_frame, variable=self.progress_var, maximum=100, length=1000)
         self.progress.pack(side='left', fill='x', expand=True, padx=5)
+        self.btn_cancel = ttk.Button(progress_frame, text="取消", command=self.cancel_tasks, width=8)
+        self.btn_cancel.state(['disabled'])
+        self.btn_cancel.pack(side='left', padx=5)
 
         # 主体内容区
         main_pane = ttk.PanedWindow(self.master, orient='vertical')
@@ -679,6 +5225,28 @@ class MomentsApp:
         data_frame = ttk.LabelFrame(main_pane, text="数据展示区（采集/导入的全部数据）", padding=5)
         main_pane.add(data_frame, weight=3)
 
+        # 检索栏：关键词（空格=且，OR=或，-=排除，"短语"）+ 发布者 + 日期范围
+        search_frame = ttk.Frame(data_frame)
+        search_frame.pack(fill='x', pady=(0, 4))
+        ttk.Label(search_frame, text="检索", font=(FONT_NAME, FONT_SIZE_LABEL)).pack(side='left', padx=5)
+        self.entry_search = ttk.Entry(search_frame, width=40)
+        self.entry_search.pack(side='left', padx=2)
+        ttk.Label(search_frame, text="发布者", font=(FONT_NAME, FONT_SIZE_LABEL)).pack(side='left', padx=5)
+        self.entry_search_pub = ttk.Entry(search_frame, width=16)
+        self.entry_search_pub.pack(side='left', padx=2)
+        ttk.Label(search_frame, text="日期", font=(FONT_NAME, FONT_SIZE_LABEL)).pack(side='left', padx=5)
+        self.entry_search_start = ttk.Entry(search_frame, width=11)
+        self.entry_search_start.pack(side='left', padx=2)
+        ttk.Label(search_frame, text="至").pack(side='left')
+        self.entry_search_end = ttk.Entry(search_frame, width=11)
+        self.entry_search_end.pack(side='left', padx=2)
+        ttk.Button(search_frame, text="搜索", command=self.run_search, width=6).pack(side='left', padx=4)
+        ttk.Button(search_frame, text="清除", command=self.clear_search, width=6).pack(side='left', padx=2)
+        self.search_status_var = tk.StringVar(value="")
+        ttk.Label(search_frame, textvariable=self.search_status_var).pack(side='left', padx=8)
+        for entry in (self.entry_search, self.entry_search_pub, self.entry_search_start, self.entry_search_end):
+            entry.bind('<Return>', lambda e: self.run_search())
+
         tree_frame = ttk.Frame(data_frame)
         tree_frame.pack(fill='both', expand=True)
 
@@ -733,65 +5301,273 @@ class MomentsApp:
             self.ui_logger.flush_to_widgets()
         except Exception:
             pass
-        self.master.after(200, self._schedule_ui_log_flush)
+        # 积压未写完时尽快继续，否则按常规间隔刷新
+        self.master.after(20 if self.ui_logger.pending() else 200, self._schedule_ui_log_flush)
 
     def _set_buttons_state(self, enabled=True):
+        """独占任务开始/结束时切换相关按钮；取消按钮状态与之相反"""
         state = 'normal' if enabled else 'disabled'
-        for btn in self.master.winfo_children():
-            if isinstance(btn, (ttk.Frame, ttk.PanedWindow)):
-                self._disable_buttons_recursive(btn, state)
-
-    def _disable_buttons_recursive(self, parent, state):
-        for child in parent.winfo_children():
-            if isinstance(child, ttk.Button):
-                child.configure(state=state)
-            elif isinstance(child, (ttk.Frame, ttk.PanedWindow)):
-                self._disable_buttons_recursive(child, state)
+        for btn in self.exclusive_buttons:
+            btn.configure(state=state)
+        self.btn_cancel.configure(state='disabled' if enabled else 'normal')
+
+    def _busy(self):
+        """已有独占任务运行时提示并返回 True"""
+        running = self.tasks.running(exclusive=True)
+        if running:
+            messagebox.showwarning("请稍候", f"任务“{running[0].name}”正在运行，可在任务列表中查看或取消。")
+            return True
+        return False
+
+    def _on_task_progress(self, done, total=None, text=None):
+        if total:
+            self.progress_var.set(min(100, done / total * 100))
+        if text:
+            self.status_var.set(text)
+
+    def _task_error(self, title, status):
+        """生成任务失败回调（主线程执行）：记录日志、更新状态栏并弹窗"""
+        def handler(e):
+            self.ui_logger.log_sys(f"{title}：{e}")
+            self.status_var.set(status)
+            messagebox.showerror(title, str(e))
+
+        return handler
+
+    def cancel_tasks(self):
+        """取消正在运行的独占任务（只读任务可在任务列表中单独取消）"""
+        running = self.tasks.running(exclusive=True)
+        if not running:
+            return
+        for t in running:
+            t.cancel()
+        self.ui_logger.log_sys(f"已请求取消：{'、'.join(t.name for t in running)}，等待当前步骤结束...")
+
+    def show_jobs(self):
+        """任务列表：显示运行中与已结束的后台任务，可取消选中的任务"""
+        win = getattr(self, '_jobs_window', None)
+        if win is not None and win.winfo_exists():
+            win.lift()
+            return
+        win = self._jobs_window = tk.Toplevel(self.master)
+        win.title("任务列表")
+        win.geometry("760x360")
+        columns = ("任务", "类型", "状态", "开始", "耗时", "进度")
+        tree = ttk.Treeview(win, columns=columns, show='headings', height=12, style='Jobs.Treeview')
+        ttk.Style().configure('Jobs.Treeview', rowheight=24)
+        col_widths = {"任务": 140, "类型": 60, "状态": 70, "开始": 80, "耗时": 80, "进度": 300}
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=col_widths[col], anchor='w')
+        tree.pack(fill='both', expand=True, padx=8, pady=8)
+        rows = {}
+
+        def cancel_selected():
+            for iid in tree.selection():
+                task = rows.get(iid)
+                if task is not None and task.finished is None:
+                    task.cancel()
+
+        def refresh():
+            if not win.winfo_exists():
+                return
+            live = set()
+            for task in reversed(self.tasks.tasks):
+                iid = str(id(task))
+                live.add(iid)
+                started = datetime.datetime.fromtimestamp(task.started).strftime("%H:%M:%S") if task.started else "-"
+                values = (task.name, "独占" if task.exclusive else "只读", task.status, started,
+                          f"{task.elapsed:.1f}s", task.detail)
+                if iid in rows:
+                    tree.item(iid, values=values)
+                else:
+                    rows[iid] = task
+                    tree.insert('', 'end', iid=iid, values=values)
+            for iid in [i for i in rows if i not in live]:
+                tree.delete(iid)
+                del rows[iid]
+            win.after(500, refresh)
+
+        btn_frame = ttk.Frame(win)
+        btn_frame.pack(pady=6)
+        ttk.Button(btn_frame, text="取消所选", command=cancel_selected).grid(row=0, column=0, padx=6)
+        ttk.Button(btn_frame, text="关闭", command=win.destroy).grid(row=0, column=1, padx=6)
+        refresh()
+
+    def _on_close(self):
+        self.tasks.cancel_all()
+        self.master.destroy()
 
     def choose_save_path(self):
         fmt = self.combo_format.get() or 'json'
-        ft = [('JSON 文件', '*.json')] if fmt == 'json' else [('Excel 文件', '*.xlsx')]
+        ft = {'json': [('JSON 文件', '*.json')], 'csv': [('CSV 文件', '*.csv')],
+              'parquet': [('Parquet 文件', '*.parquet')]}.get(fmt, [('Excel 文件', '*.xlsx')])
         p = filedialog.asksaveasfilename(defaultextension=f".{fmt}", filetypes=ft, title="选择保存路径")
         if p:
             self.entry_path.delete(0, 'end')
             self.entry_path.insert(0, p)
 
     def import_file(self):
-        p = filedialog.askopenfilename(filetypes=[('JSON', '*.json'), ('Excel', '*.xlsx;*.xls')], title="选择导入文件")
+        if self._busy():
+            return
+        p = filedialog.askopenfilename(filetypes=[('JSON', '*.json'), ('Excel', '*.xlsx;*.xls'), ('CSV', '*.csv'),
+                                                  ('Parquet', '*.parquet')],
+                                       title="选择导入文件")
         if not p:
             return
-        try:
-            if p.lower().endswith('.json'):
-                with open(p, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                if isinstance(data, dict) and 'posts' in data:
-                    data = data['posts']
-                self.all_posts = data if isinstance(data, list) else []
-            else:
-                df = pd.read_excel(p)
-                posts = []
-                for _, row in df.iterrows():
-                    posts.append({
-                        "编号": row.get("编号", ""),
-                        "发布者": row.get("发布者", ""),
-                        "内容": row.get("内容", ""),
-                        "时间": row.get("时间", ""),
-                        "点赞": row.get("点赞", "") if "点赞" in row else "",
-                        "评论": row.get("评论", "") if "评论" in row else []
-                    })
-                self.all_posts = posts
-            self._refresh_treeview()
+
+        def work(task):
+            posts = load_posts_file(p, log_sys=lambda msg: self.ui_logger.log_progress(msg, "import"))
+            task.check()
+            # 以文件修改时间作为相对时间的参照
+            annotate_timestamps(posts, ref_ts=os.path.getmtime(p))
+            records = to_records(posts)
+            return records, SearchIndex.from_posts(records)
+
+        def on_result(result):
+            self._set_posts(*result, graph_source=p if has_graph_inputs_parquet(p) else None)
+            self._save_to_store(self.all_posts, source=f"import:{os.path.basename(p)}")
             self.ui_logger.log_data(f"已导入文件：{p}，条数：{len(self.all_posts)}")
             self.status_var.set(f"已加载 {len(self.all_posts)} 条数据")
             messagebox.showinfo("导入成功", f"已导入 {len(self.all_posts)} 条数据。")
+
+        self._set_buttons_state(False)
+        self.status_var.set("正在导入...")
+        self.tasks.submit(work, name="导入", on_result=on_result, on_error=self._task_error("导入失败", "导入失败"),
+                          on_cancel=lambda: self.status_var.set("导入已取消"),
+                          on_done=lambda: self._set_buttons_state(True), exclusive=True)
+
+    def _save_to_store(self, posts, source=""):
+        """将帖子 upsert 到 SQLite 帖子库（勾选"同时写入数据库"时），在后台任务中执行"""
+        if not posts or not self.store_var.get():
+            return
+        self.tasks.submit(lambda task: self._write_store(posts, source), name="写入数据库")
+
+    def _write_store(self, posts, source=""):
+        """写入帖子库并记录日志；不访问 Tk 控件，可在工作线程调用"""
+        try:
+            with PostStore(STORE_PATH) as store:
+                inserted, updated = store.upsert_posts(
+                    posts, source=source, log_sys=lambda msg: self.ui_logger.log_progress(msg, "store"))
+                total = store.count()
+            self.ui_logger.log_sys(f"数据库已更新：新增 {inserted} 条，更新 {updated} 条，库中共 {total} 条")
         except Exception as e:
-            messagebox.showerror("导入失败", str(e))
-            self.ui_logger.log_sys(f"导入失败：{e}")
+            self.ui_logger.log_sys(f"写入数据库失败：{e}")
+
+    def start_store_analyze(self):
+        """从 SQLite 帖子库按时间窗口 / 人员子集进行分析，不加载到数据展示区"""
+        if not os.path.exists(STORE_PATH):
+            messagebox.showwarning("提示", f"数据库 {STORE_PATH} 不存在，请先采集或导入数据。")
+            return
+
+        dlg = tk.Toplevel(self.master)
+        dlg.title("数据库分析")
+        dlg.geometry("420x220")
+        form = ttk.Frame(dlg)
+        form.pack(padx=10, pady=10, fill='x')
+        entries = {}
+        for row, (label, hint) in enumerate([("起始日期", "YYYY-MM-DD，可留空"),
+                                             ("结束日期", "YYYY-MM-DD，可留空"),
+                                             ("人员", "逗号分隔，可留空")]):
+            ttk.Label(form, text=label, font=(FONT_NAME, FONT_SIZE_LABEL)).grid(row=row, column=0, sticky='w', pady=4)
+            e = ttk.Entry(form, width=28)
+            e.grid(row=row, column=1, padx=6, pady=4)
+            ttk.Label(form, text=hint).grid(row=row, column=2, sticky='w')
+            entries[label] = e
+
+        def parse_date(text, end=False):
+            text = text.strip()
+            if not text:
+                return None
+            d = datetime.datetime.strptime(text, "%Y-%m-%d")
+            if end:
+                d += datetime.timedelta(days=1)
+            return d.timestamp()
 
-    def _refresh_treeview(self):
+        def on_ok():
+            try:
+                start_ts = parse_date(entries["起始日期"].get())
+                end_ts = parse_date(entries["结束日期"].get(), end=True)
+            except ValueError:
+                messagebox.showerror("参数错误", "日期格式应为 YYYY-MM-DD")
+                return
+            people = [x.strip() for x in entries["人员"].get().replace('，', ',').split(',') if x.strip()]
+            dlg.destroy()
+
+            queried = {}
+
+            def build():
+                with PostStore(STORE_PATH) as store:
+                    publishers = store.query_publishers(start_ts, end_ts, people or None)
+                    interactions = queried['interactions'] = store.query_interactions(start_ts, end_ts,
+                                                                                      people or None)
+                self.ui_logger.log_sys(f"数据库查询完成：{len(publishers)} 条帖子，{len(interactions)} 条互动")
+                if self.alias_map:
+                    publishers = [self.alias_map.get(p, p) for p in publishers]
+                return build_interaction_graph(publishers, interactions=interactions,
+                                               like_weight=LIKE_WEIGHT,
+                                               comment_weight=COMMENT_WEIGHT,
+                                               alias_map=self.alias_map,
+                                               log_sys=self.ui_logger.log_sys)
+
+            self._launch_analysis(build, lambda: build_person_index(interactions=queried['interactions'],
+                                                                    alias_map=self.alias_map))
+
+        ttk.Button(dlg, text="开始分析", command=on_ok).pack(pady=8)
+
+    def _set_posts(self, posts, search_index, graph_source=None):
+        """替换当前数据集（主线程调用）；检索索引在工作线程中随数据一起建立"""
+        self.all_posts = posts
+        self.search_index = search_index
+        self.graph_source = graph_source
+        self.search_status_var.set("")
+        self._refresh_treeview()
+
+    def run_search(self):
+        """按检索栏条件过滤数据表"""
+        index = self.search_index
+        if not self.all_posts or index is None:
+            return
+        query = self.entry_search.get().strip()
+        publishers = [x.strip() for x in self.entry_search_pub.get().replace('，', ',').split(',') if x.strip()]
+        try:
+            dates = []
+            for entry, end in ((self.entry_search_start, False), (self.entry_search_end, True)):
+                text = entry.get().strip()
+                if not text:
+                    dates.append(None)
+                    continue
+                d = datetime.datetime.strptime(text, "%Y-%m-%d")
+                if end:
+                    d += datetime.timedelta(days=1)
+                dates.append(d.timestamp())
+        except ValueError:
+            messagebox.showerror("参数错误", "日期格式应为 YYYY-MM-DD")
+            return
+        if not query and not publishers and dates == [None, None]:
+            self.clear_search()
+            return
+        t0 = time.perf_counter()
+        rows = index.search(query, publishers or None, dates[0], dates[1])
+        elapsed = (time.perf_counter() - t0) * 1000
+        self._refresh_treeview(rows[:SEARCH_DISPLAY_LIMIT])
+        status = f"命中 {len(rows)} 条（{elapsed:.0f} ms）"
+        if len(rows) > SEARCH_DISPLAY_LIMIT:
+            status += f"，显示前 {SEARCH_DISPLAY_LIMIT} 条"
+        self.search_status_var.set(status)
+
+    def clear_search(self):
+        for entry in (self.entry_search, self.entry_search_pub, self.entry_search_start, self.entry_search_end):
+            entry.delete(0, 'end')
+        self.search_status_var.set("")
+        self._refresh_treeview()
+
+    def _refresh_treeview(self, rows=None):
+        """刷新数据表；rows 为行号列表时只显示这些帖子（检索结果）"""
         for r in self.tree.get_children():
             self.tree.delete(r)
-        for row in self.all_posts:
+        posts = self.all_posts if rows is None else [self.all_posts[i] for i in rows]
+        for row in posts:
             comments = row.get('评论', [])
             if isinstance(comments, list):
                 comments_s = " | ".join([str(x) for x in comments[:3]])
@@ -804,7 +5580,7 @@ class MomentsApp:
                 row.get('编号', ''),
                 row.get('发布者', ''),
                 row.get('内容', '')[:100],
-                format_time_display(row.get('时间', '')),
+                format_time_display(row.get('时间', ''), row.get('时间戳')),
                 likes[:100] if isinstance(likes, str) else "",
                 comments_s
             ))
@@ -820,140 +5596,539 @@ class MomentsApp:
         if not save_path:
             messagebox.showerror("路径错误", "请先选择保存路径。")
             return
+        if self._busy():
+            return
+        fmt = self.combo_format.get()
+        to_store = self.store_var.get()
         self._set_buttons_state(False)
         self.status_var.set("正在采集...")
         self.progress_var.set(0)
         self.ui_logger.log_sys("准备开始采集（后台线程）...")
 
-        def progress_cb(count_now, target):
-            try:
-                val = min(100, int(count_now / target * 100))
-                self.progress_var.set(val)
-                self.master.update_idletasks()
-            except Exception:
-                pass
+        def work(task):
+            mark = PROFILER.mark()
+            search = SearchIndex()
+            posts = parse_moments_collect(target_count=count, timeout=timeout, on_post=search.add,
+                                          progress_callback=lambda n, total: task.progress(
+                                              n, total, f"正在采集：{n}/{total}"),
+                                          log_sys=self.ui_logger.log_sys,
+                                          log_data=lambda msg: self.ui_logger.log_progress(msg, "collect", "data"))
+            PROFILER.log_summary(self.ui_logger.log_sys, "采集耗时统计", since=mark)
+            self._save_posts_file(posts, save_path, fmt)
+            self.ui_logger.log_sys(f"采集并保存完成：{save_path}")
+            if to_store:
+                self._write_store(posts, source="collect")
+            return to_records(posts), search
+
+        def on_result(result):
+            self._set_posts(*result)
+            self.ui_logger.log_data(f"已采集 {len(self.all_posts)} 条并保存到 {save_path}")
+            self.status_var.set(f"采集完成：{len(self.all_posts)} 条")
+
+        def on_done():
+            self._set_buttons_state(True)
+            self.progress_var.set(0)
+
+        self.tasks.submit(work, name="采集", on_progress=self._on_task_progress, on_result=on_result,
+                          on_error=self._task_error("采集失败", "采集失败"),
+                          on_cancel=lambda: self.status_var.set("采集已取消"), on_done=on_done, exclusive=True)
+
+    def _save_posts_file(self, posts, save_path, fmt):
+        """按导出格式保存帖子（工作线程调用）"""
+        if fmt == 'json':
+            with open(save_path, 'w', encoding='utf-8') as f:
+                json.dump(to_dicts(posts), f, ensure_ascii=False, indent=2)
+        elif fmt == 'parquet':
+            save_posts_parquet(posts, save_path)
+        else:
+            write_posts_table(posts, save_path)
 
-        def worker():
-            try:
-                posts = parse_moments_collect(target_count=count, timeout=timeout, progress_callback=progress_cb,
-                                              log_sys=self.ui_logger.log_sys, log_data=self.ui_logger.log_data)
-                self.all_posts = posts
-                fmt = self.combo_format.get()
-                if fmt == 'json':
-                    with open(save_path, 'w', encoding='utf-8') as f:
-                        json.dump(self.all_posts, f, ensure_ascii=False, indent=2)
-                else:
-                    pd.DataFrame(self.all_posts).to_excel(save_path, index=False)
-                self.ui_logger.log_sys(f"采集并保存完成：{save_path}")
-                self._refresh_treeview()
-                self.ui_logger.log_data(f"已采集 {len(self.all_posts)} 条并保存到 {save_path}")
-                self.status_var.set(f"采集完成：{len(self.all_posts)} 条")
-            except Exception as e:
-                self.ui_logger.log_sys(f"采集异常：{e}")
-                messagebox.showerror("采集失败", str(e))
-                self.status_var.set("采集失败")
-            finally:
-                self._set_buttons_state(True)
-                self.progress_var.set(0)
+    def start_multi_collect(self):
+        """多账号采集：列出本机微信进程，也可添加回放文件代替真实账号"""
+        if self._busy():
+            return
+        self.tasks.submit(lambda task: list_wechat_accounts(), name="枚举微信账号",
+                          on_result=self._open_multi_collect_dialog,
+                          on_error=lambda e: self._open_multi_collect_dialog([]))
+
+    def _open_multi_collect_dialog(self, accounts):
+        accounts = list(accounts)
+        dlg = tk.Toplevel(self.master)
+        dlg.title("多账号采集")
+        dlg.geometry("520x380")
+        ttk.Label(dlg, text="选择要采集的账号（可多选，采集数量/超时/保存路径沿用主界面设置）",
+                  font=(FONT_NAME, 10)).pack(padx=8, pady=6, anchor='w')
+        listbox = tk.Listbox(dlg, selectmode='extended', height=12)
+        listbox.pack(fill='both', expand=True, padx=8)
+
+        def label(acc):
+            if acc.get('replay'):
+                return f"{acc['name']}  （回放：{acc['replay']}）"
+            return f"{acc['name']}  {' / '.join(acc.get('windows', [])[:2])}"
+
+        for acc in accounts:
+            listbox.insert('end', label(acc))
+        listbox.select_set(0, 'end')
+
+        def add_replay():
+            paths = filedialog.askopenfilenames(filetypes=[('JSON', '*.json'), ('Excel', '*.xlsx;*.xls'),
+                                                           ('CSV', '*.csv'), ('Parquet', '*.parquet')],
+                                                title="选择回放文件")
+            names = {acc['name'] for acc in accounts}
+            for p in paths:
+                # 账号名会写入帖子的"账号"列与帖子库会话名，同名文件（不同目录）追加序号区分
+                base = f"回放[{os.path.splitext(os.path.basename(p))[0]}]"
+                name, n = base, 2
+                while name in names:
+                    name, n = f"{base}#{n}", n + 1
+                names.add(name)
+                acc = {'name': name, 'replay': p}
+                accounts.append(acc)
+                listbox.insert('end', label(acc))
+                listbox.select_set('end')
 
-        threading.Thread(target=worker, daemon=True).start()
+        def on_ok():
+            chosen = [accounts[i] for i in listbox.curselection()]
+            if not chosen:
+                messagebox.showwarning("提示", "请至少选择一个账号。", parent=dlg)
+                return
+            dlg.destroy()
+            self._run_multi_collect(chosen)
+
+        btn_frame = ttk.Frame(dlg)
+        btn_frame.pack(pady=8)
+        ttk.Button(btn_frame, text="添加回放文件...", command=add_replay).grid(row=0, column=0, padx=6)
+        ttk.Button(btn_frame, text="开始采集", command=on_ok).grid(row=0, column=1, padx=6)
+        if not accounts:
+            ttk.Label(dlg, text="未检测到 WeChat.exe 进程，可添加回放文件进行离线测试。",
+                      foreground=ACCENT_COLOR).pack(pady=4)
+
+    def _run_multi_collect(self, accounts):
+        try:
+            count = int(self.entry_count.get())
+            timeout = int(self.entry_timeout.get())
+        except Exception:
+            messagebox.showerror("参数错误", "采集数量与超时必须为整数。")
+            return
+        save_path = self.entry_path.get().strip()
+        if not save_path:
+            messagebox.showerror("路径错误", "请先选择保存路径。")
+            return
+        if self._busy():
+            return
+        fmt = self.combo_format.get()
+        store_path = STORE_PATH if self.store_var.get() else None
+        self._set_buttons_state(False)
+        self.status_var.set(f"正在并行采集 {len(accounts)} 个账号...")
+        self.ui_logger.log_sys(f"多账号采集：{'、'.join(a['name'] for a in accounts)}")
+
+        def work(task):
+            posts, stats = collect_accounts(accounts, target_count=count, timeout=timeout, store_path=store_path,
+                                            log_sys=self.ui_logger.log_sys)
+            # 取消时 collect_accounts 返回已完成账号的结果，保存与建索引不再响应取消
+            with CancelShield(task.cancelled):
+                self._save_posts_file(posts, save_path, fmt)
+                self.ui_logger.log_sys(f"多账号采集结果已保存：{save_path}")
+                records = to_records(posts)
+                return records, SearchIndex.from_posts(records), stats
+
+        def on_result(result):
+            posts, search, stats = result
+            self._set_posts(posts, search)
+            n_cancelled = sum(1 for st in stats if st['状态'] == "已取消")
+            note = f"（已取消，{n_cancelled} 个账号未完成）" if n_cancelled else ""
+            self.ui_logger.log_data(f"多账号采集完成：{len(accounts)} 个账号，合并去重后 {len(posts)} 条{note}")
+            self.status_var.set(f"多账号采集完成：{len(posts)} 条{note}")
+
+        self.tasks.submit(work, name="多账号采集", on_result=on_result,
+                          on_error=self._task_error("多账号采集失败", "多账号采集失败"),
+                          on_cancel=lambda: self.status_var.set("多账号采集已取消"),
+                          on_done=lambda: self._set_buttons_state(True), exclusive=True)
 
     def start_analyze(self):
         if not self.all_posts:
             messagebox.showwarning("提示", "请先采集或导入数据再进行分析。")
             return
-        self._set_buttons_state(False)
-        self.status_var.set("正在分析...")
-        self.ui_logger.log_sys("分析线程已启动...")
 
-        def worker():
-            try:
-                self.ui_logger.log_sys("构建互动网络（基于所有互动数据）...")
+        directed = self.directed_var.get()
+        collapse = self.collapse_dup_var.get()
+        source = {'posts': self.all_posts}
+        graph_source = self.graph_source
+
+        def build():
+            if graph_source and not directed and not collapse:
+                # 导入的 Parquet 自带互动表：只读发布者与互动列构图，不再逐条解析帖子
+                return build_graph_from_file(graph_source, alias_map=self.alias_map, log_sys=self.ui_logger.log_sys)
+            posts = self.all_posts
+            if collapse:
+                # 转发/模板内容每组只保留一条，避免刷屏链条抬高相关人员的度中心性
+                posts = collapse_near_duplicates(posts, find_near_duplicates(posts))
+                self.ui_logger.log_sys(f"已合并近似重复：{len(self.all_posts)} 条 -> {len(posts)} 条")
+            source['posts'] = posts
+            # 从发布者列提取数据
+            publishers = [post.get('发布者', '') for post in posts if post.get('发布者', '')]
+
+            # 应用别名映射
+            if self.alias_map:
+                publishers = [self.alias_map.get(p, p) for p in publishers]
+
+            if directed:
+                csr = build_interaction_csr(posts, alias_map=self.alias_map,
+                                            log_sys=self.ui_logger.log_sys)
+                pub_counts = defaultdict(int)
+                for pub in publishers:
+                    pub_counts[pub] += 1
+                return csr, pub_counts
+
+            return build_interaction_graph(publishers, all_posts=posts,
+                                           like_weight=LIKE_WEIGHT,
+                                           comment_weight=COMMENT_WEIGHT,
+                                           alias_map=self.alias_map,
+                                           log_sys=self.ui_logger.log_sys)
+
+        self._launch_analysis(build, lambda: build_person_index(source['posts'], alias_map=self.alias_map))
+
+    def show_near_duplicates(self):
+        """近似重复检测：列出转发/模板内容的传播组，双击某组在数据表中查看"""
+        if not self.all_posts:
+            messagebox.showwarning("提示", "请先采集或导入数据。")
+            return
+        posts = self.all_posts
+
+        def work(task):
+            task.progress(0, None, "正在检测近似重复...")
+            groups = find_near_duplicates(posts)
+            return near_duplicate_report(posts, groups)
+
+        def on_result(report):
+            n_dup = sum(g['size'] for g in report)
+            self.ui_logger.log_sys(f"近似重复检测完成：{len(report)} 组，涉及 {n_dup} 条")
+            self._open_near_duplicate_window(posts, report)
+
+        self.tasks.submit(work, name="近似重复", on_progress=self._on_task_progress, on_result=on_result,
+                          on_error=self._task_error("检测失败", "近似重复检测失败"))
+
+    def _open_near_duplicate_window(self, posts, report):
+        win = tk.Toplevel(self.master)
+        win.title("近似重复内容（同内容传播）")
+        win.geometry("1000x520")
+        ttk.Label(win, text=f"共 {len(report)} 组、{sum(g['size'] for g in report)} 条，按涉及发布者数排序；"
+                            f"双击某组在数据表中查看", font=(FONT_NAME, 10)).pack(padx=8, pady=6, anchor='w')
+        columns = ("组", "条数", "发布者数", "时间跨度", "示例内容", "发布者")
+        tree = ttk.Treeview(win, columns=columns, show='headings', height=16)
+        col_widths = {"组": 40, "条数": 50, "发布者数": 70, "时间跨度": 160, "示例内容": 380, "发布者": 260}
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=col_widths[col], anchor='w')
+        vsb = ttk.Scrollbar(win, orient='vertical', command=tree.yview)
+        vsb.pack(side='right', fill='y')
+        tree.configure(yscrollcommand=vsb.set)
+        tree.pack(fill='both', expand=True, padx=8, pady=4)
+
+        def day(ts):
+            return datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d") if ts is not None else "?"
+
+        for i, group in enumerate(report):
+            span = f"{day(group['first_ts'])} ~ {day(group['last_ts'])}" if group['first_ts'] is not None else ""
+            names = "、".join(group['publishers'][:8])
+            if len(group['publishers']) > 8:
+                names += f"等 {len(group['publishers'])} 人"
+            tree.insert('', 'end', iid=str(i), values=(i + 1, group['size'], len(group['publishers']), span,
+                                                       group['sample'][:80], names))
+
+        def on_double_click(event):
+            iid = tree.identify_row(event.y)
+            if not iid:
+                return
+            if posts is not self.all_posts:
+                messagebox.showwarning("提示", "数据已更新，请重新检测。")
+                return
+            group = report[int(iid)]
+            self._refresh_treeview(group['rows'][:SEARCH_DISPLAY_LIMIT])
+            self.search_status_var.set(f"近似重复组 {int(iid) + 1}：{group['size']} 条（点击\"清除\"恢复）")
 
-                # 从发布者列提取数据
-                publishers = [post.get('发布者', '') for post in self.all_posts if post.get('发布者', '')]
+        tree.bind('<Double-1>', on_double_click)
+        ttk.Button(win, text="关闭", command=win.destroy).pack(pady=6)
 
-                # 应用别名映射
-                if self.alias_map:
-                    publishers = [self.alias_map.get(p, p) for p in publishers]
+    def _launch_analysis(self, build_graph, build_index=None):
+        """后台构建网络并输出分析报告；build_graph 返回 (G, pub_counts)，build_index 返回人员索引
+
+        G 为 InteractionCSR 时直接在 CSR 上分析，分析结束后才为可视化转换为 networkx 有向图。
+        """
+        if self._busy():
+            return
+        self._set_buttons_state(False)
+        self.status_var.set("正在分析...")
+        self.ui_logger.log_sys("分析线程已启动...")
 
-                G, pub_counts = build_interaction_graph(publishers, all_posts=self.all_posts,
-                                                        like_weight=LIKE_WEIGHT,
-                                                        comment_weight=COMMENT_WEIGHT,
-                                                        alias_map=self.alias_map,
-                                                        log_sys=self.ui_logger.log_sys)
-                self.graph = G
+        def work(task):
+            mark = PROFILER.mark()
+            self.ui_logger.log_sys("构建互动网络（基于所有互动数据）...")
+            task.progress(0, None, "正在构建互动网络...")
+            G, pub_counts = build_graph()
+            task.check()
+
+            graph_cache = {}
+            analysis = analyze_graph(G, pub_counts, None, use_louvain=True,
+                                     log_sys=self.ui_logger.log_sys,
+                                     progress_callback=lambda done, total, label: task.progress(
+                                         done, total, f"正在分析：{label}（{done}/{total}）"),
+                                     graph_cache=graph_cache)
+            if isinstance(G, InteractionCSR):
+                G = graph_cache.get('G') or G.to_networkx(directed=True)
+            PROFILER.log_summary(self.ui_logger.log_sys, "分析耗时统计", since=mark)
+
+            # 中文化分析结果展示
+            self.ui_logger.log_data("=" * 70)
+            self.ui_logger.log_data("【微信朋友圈互动网络分析结果】")
+            self.ui_logger.log_data("=" * 70)
+
+            self.ui_logger.log_data("")
+            self.ui_logger.log_data("📊 网络基本信息")
+            self.ui_logger.log_data("-" * 70)
+            self.ui_logger.log_data(f"  参与人数（节点数）：{analysis.get('num_nodes', 0)} 人")
+            self.ui_logger.log_data(f"  互动关系总数（边数）：{analysis.get('num_edges', 0)} 条")
+            self.ui_logger.log_data(f"  网络密度：{analysis.get('network_density', 0):.4f}")
+            self.ui_logger.log_data(f"  平均互动强度：{analysis.get('avg_weight', 0):.2f}")
+            self.ui_logger.log_data(f"  最高互动强度：{analysis.get('max_weight', 0):.0f}")
+
+            self.ui_logger.log_data("")
+            self.ui_logger.log_data("👥 社交活跃度排行 Top 10（按度中心性）")
+            self.ui_logger.log_data("-" * 70)
+            for i, (name, val) in enumerate(analysis.get('top_degree', [])[:10], start=1):
+                bar_len = min(50, int(val * 30))
+                bar = "█" * bar_len
+                self.ui_logger.log_data(f"  {i:2d}. {name:20s} 活跃度: {val:.4f} {bar}")
+
+            self.ui_logger.log_data("")
+            self.ui_logger.log_data("🌉 网络桥梁人物 Top 10（按介数中心性）")
+            self.ui_logger.log_data("-" * 70)
+            for i, (name, val) in enumerate(analysis.get('top_betweenness', [])[:10], start=1):
+                bar_len = min(50, int(val * 30))
+                bar = "█" * bar_len
+                self.ui_logger.log_data(f"  {i:2d}. {name:20s} 指数: {val:.4f} {bar}")
+
+            self.ui_logger.log_data("")
+            self.ui_logger.log_data("⭐ 影响力排行 Top 10（按 PageRank）")
+            self.ui_logger.log_data("-" * 70)
+            for i, (name, val) in enumerate(analysis.get('top_pagerank', [])[:10], start=1):
+                auth = analysis.get('authorities', {}).get(name, 0)
+                self.ui_logger.log_data(f"  {i:2d}. {name:20s} PageRank: {val:.4f}  权威值: {auth:.4f}")
+
+            self.ui_logger.log_data("")
+            self.ui_logger.log_data("🧭 核心-边缘结构（k-core）")
+            self.ui_logger.log_data("-" * 70)
+            core_number = analysis.get('core_number', {})
+            max_core = analysis.get('max_core', 0)
+            if core_number:
+                core_members = [name for name, c in core_number.items() if c == max_core]
+                members_str = "、".join(core_members[:15])
+                if len(core_members) > 15:
+                    members_str += f"等 {len(core_members)} 人"
+                self.ui_logger.log_data(f"  最高核数：{max_core}（核心圈 {len(core_members)} 人）")
+                self.ui_logger.log_data(f"    核心成员: {members_str}")
+                periphery = sum(1 for c in core_number.values() if c <= 1)
+                self.ui_logger.log_data(f"  边缘成员（核数 ≤ 1）：{periphery} 人")
+
+            self.ui_logger.log_data("")
+            self.ui_logger.log_data("🎯 社区划分结果")
+            self.ui_logger.log_data("-" * 70)
+            community_groups = analysis.get('community_groups', {})
+            if not community_groups:
+                self.ui_logger.log_data("  未能检测到明显社区结构")
+            else:
+                sorted_communities = sorted(community_groups.items(),
+                                            key=lambda item: len(item[1]), reverse=True)
+                for cid, members in sorted_communities:
+                    self.ui_logger.log_data("")
+                    self.ui_logger.log_data(f"  社区 {cid + 1} （{len(members)} 人）")
+                    members_to_show = members[:10]
+                    members_str = "    成员: " + "、".join(members_to_show)
+                    if len(members) > 10:
+                        members_str += f"等 {len(members) - 10} 人"
+                    self.ui_logger.log_data(members_str)
+
+            self.ui_logger.log_data("")
+            self.ui_logger.log_data("✅ 分析完成！")
+            self.ui_logger.log_data("=" * 70)
+
+            index = None
+            if build_index is not None:
+                task.progress(0, None, "正在建立人员索引...")
+                index = build_index()
+                self.ui_logger.log_sys(f"人员索引已建立：{len(index)} 人，{len(index.edges)} 条关系")
+            return G, analysis, index
+
+        def on_result(result):
+            self.graph, self.analysis, self.person_index = result
+            analysis = self.analysis
+            n_comm = len(analysis.get('community_groups', {}))
+            self.status_var.set(
+                f"分析完成：{analysis.get('num_nodes', 0)} 人，{analysis.get('num_edges', 0)} 条关系，{n_comm} 个社区")
+            messagebox.showinfo("分析完成",
+                                f"分析已完成：{analysis.get('num_nodes', 0)} 人参与，{analysis.get('num_edges', 0)} 条互动关系，{n_comm} 个社区")
+
+        def on_done():
+            self._set_buttons_state(True)
+            self.progress_var.set(0)
+
+        self.tasks.submit(work, name="关系网分析", on_progress=self._on_task_progress, on_result=on_result,
+                          on_error=self._task_error("分析失败", "分析失败"),
+                          on_cancel=lambda: self.status_var.set("分析已取消"), on_done=on_done, exclusive=True)
+
+    def start_window_analyze(self):
+        """按周/日滑动窗口分析互动模式随时间的变化"""
+        if not self.all_posts:
+            messagebox.showwarning("提示", "请先采集或导入数据再进行分析。")
+            return
 
-                analysis = analyze_graph(G, pub_counts, self.all_posts, use_louvain=True,
-                                         log_sys=self.ui_logger.log_sys)
-                self.analysis = analysis
+        dlg = tk.Toplevel(self.master)
+        dlg.title("时间窗口分析")
+        dlg.geometry("320x200")
+        form = ttk.Frame(dlg)
+        form.pack(padx=10, pady=10, fill='x')
+        ttk.Label(form, text="窗口天数", font=(FONT_NAME, FONT_SIZE_LABEL)).grid(row=0, column=0, sticky='w', pady=4)
+        entry_window = ttk.Entry(form, width=10)
+        entry_window.insert(0, "7")
+        entry_window.grid(row=0, column=1, padx=6)
+        ttk.Label(form, text="步长天数", font=(FONT_NAME, FONT_SIZE_LABEL)).grid(row=1, column=0, sticky='w', pady=4)
+        entry_step = ttk.Entry(form, width=10)
+        entry_step.insert(0, "1")
+        entry_step.grid(row=1, column=1, padx=6)
+        communities_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(form, text="计算社区指标（较慢）", variable=communities_var).grid(row=2, column=0, columnspan=2,
+                                                                                 sticky='w', pady=4)
 
-                # 中文化分析结果展示
+        def on_ok():
+            try:
+                window_days = int(entry_window.get())
+                step_days = int(entry_step.get())
+                if window_days <= 0 or step_days <= 0:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("参数错误", "窗口与步长必须为正整数。")
+                return
+            with_communities = communities_var.get()
+            dlg.destroy()
+            self.status_var.set("正在进行时间窗口分析...")
+
+            def work(task):
+                df = analyze_time_windows(self.all_posts, window_days=window_days, step_days=step_days,
+                                          alias_map=self.alias_map, with_communities=with_communities,
+                                          log_sys=self.ui_logger.log_sys)
+                if df.empty:
+                    return df
                 self.ui_logger.log_data("=" * 70)
-                self.ui_logger.log_data("【微信朋友圈互动网络分析结果】")
+                self.ui_logger.log_data(f"【时间窗口分析】窗口 {window_days} 天，步长 {step_days} 天，共 {len(df)} 个窗口")
+                self.ui_logger.log_data("-" * 70)
+                for _, r in df.iterrows():
+                    line = (f"  {r['窗口开始']} ~ {r['窗口结束']}  帖子 {r['帖子数']:4d}  人数 {r['节点数']:4d}  "
+                            f"关系 {r['边数']:5d}  密度 {r['密度']:.4f}  最大度 {r['最大度']}")
+                    if '社区数' in r:
+                        line += f"  社区 {r['社区数']}  模块度 {r['模块度']:.3f}"
+                    self.ui_logger.log_data(line)
                 self.ui_logger.log_data("=" * 70)
+                return df
 
-                self.ui_logger.log_data("")
-                self.ui_logger.log_data("📊 网络基本信息")
-                self.ui_logger.log_data("-" * 70)
-                self.ui_logger.log_data(f"  参与人数（节点数）：{analysis.get('num_nodes', 0)} 人")
-                self.ui_logger.log_data(f"  互动关系总数（边数）：{analysis.get('num_edges', 0)} 条")
-                self.ui_logger.log_data(f"  网络密度：{analysis.get('network_density', 0):.4f}")
-                self.ui_logger.log_data(f"  平均互动强度：{analysis.get('avg_weight', 0):.2f}")
-                self.ui_logger.log_data(f"  最高互动强度：{analysis.get('max_weight', 0):.0f}")
-
-                self.ui_logger.log_data("")
-                self.ui_logger.log_data("👥 社交活跃度排行 Top 10（按度中心性）")
-                self.ui_logger.log_data("-" * 70)
-                for i, (name, val) in enumerate(analysis.get('top_degree', [])[:10], start=1):
-                    bar_len = min(50, int(val * 30))
-                    bar = "█" * bar_len
-                    self.ui_logger.log_data(f"  {i:2d}. {name:20s} 活跃度: {val:.4f} {bar}")
+            def on_result(df):
+                if df.empty:
+                    self.ui_logger.log_sys("没有带时间戳的帖子，无法进行时间窗口分析。")
+                    self.status_var.set("时间窗口分析：无可用数据")
+                    return
+                self.window_series = df
+                self.status_var.set(f"时间窗口分析完成：{len(df)} 个窗口")
+                self._export_window_series()
 
-                self.ui_logger.log_data("")
-                self.ui_logger.log_data("🌉 网络桥梁人物 Top 10（按介数中心性）")
-                self.ui_logger.log_data("-" * 70)
-                for i, (name, val) in enumerate(analysis.get('top_betweenness', [])[:10], start=1):
-                    bar_len = min(50, int(val * 30))
-                    bar = "█" * bar_len
-                    self.ui_logger.log_data(f"  {i:2d}. {name:20s} 指数: {val:.4f} {bar}")
+            def on_error(e):
+                self.ui_logger.log_sys(f"时间窗口分析异常：{e}")
+                self.status_var.set("时间窗口分析失败")
 
-                self.ui_logger.log_data("")
-                self.ui_logger.log_data("🎯 社区划分结果")
-                self.ui_logger.log_data("-" * 70)
-                community_groups = analysis.get('community_groups', {})
-                if not community_groups:
-                    self.ui_logger.log_data("  未能检测到明显社区结构")
-                else:
-                    sorted_communities = sorted(community_groups.items(),
-                                                key=lambda item: len(item[1]), reverse=True)
-                    for cid, members in sorted_communities:
-                        self.ui_logger.log_data("")
-                        self.ui_logger.log_data(f"  社区 {cid + 1} （{len(members)} 人）")
-                        members_to_show = members[:10]
-                        members_str = "    成员: " + "、".join(members_to_show)
-                        if len(members) > 10:
-                            members_str += f"等 {len(members) - 10} 人"
-                        self.ui_logger.log_data(members_str)
-
-                self.ui_logger.log_data("")
-                self.ui_logger.log_data("✅ 分析完成！")
-                self.ui_logger.log_data("=" * 70)
+            self.tasks.submit(work, name="时间窗口分析", on_result=on_result, on_error=on_error,
+                              on_cancel=lambda: self.status_var.set("时间窗口分析已取消"))
+
+        ttk.Button(dlg, text="开始分析", command=on_ok).pack(pady=8)
 
-                self.status_var.set(
-                    f"分析完成：{analysis.get('num_nodes', 0)} 人，{analysis.get('num_edges', 0)} 条关系，{len(community_groups)} 个社区")
-                messagebox.showinfo("分析完成",
-                                    f"分析已完成：{analysis.get('num_nodes', 0)} 人参与，{analysis.get('num_edges', 0)} 条互动关系，{len(community_groups)} 个社区")
+    def start_snapshot_diff(self):
+        """对比两次采集（如每周一次）的数据文件：关系增减、名次变化与社区迁移"""
+        filetypes = [('JSON', '*.json'), ('Excel', '*.xlsx;*.xls'), ('CSV', '*.csv'), ('Parquet', '*.parquet')]
+        old_path = filedialog.askopenfilename(filetypes=filetypes, title="选择较早的快照（旧）")
+        if not old_path:
+            return
+        new_path = filedialog.askopenfilename(filetypes=filetypes, title="选择较新的快照（新）")
+        if not new_path:
+            return
+        alias_map = dict(self.alias_map)
+        self.status_var.set("正在进行快照对比...")
+
+        def work(task):
+            G_old, G_new = (build_graph_from_file(p, alias_map=alias_map)[0] for p in (old_path, new_path))
+            task.check()
+            diff = diff_snapshots(G_old, G_new, alias_map=alias_map, log_sys=self.ui_logger.log_sys,
+                                  progress_callback=lambda done, total, text: task.progress(done, total, text))
+            self.ui_logger.log_data("=" * 70)
+            self.ui_logger.log_data(f"【快照对比】{os.path.basename(old_path)} -> {os.path.basename(new_path)}")
+            self.ui_logger.log_data("-" * 70)
+            for k, v in diff['概要'].items():
+                self.ui_logger.log_data(f"  {k}：{v}")
+            self.ui_logger.log_data("  变化最大的关系：")
+            for _, r in diff['关系变化'].head(10).iterrows():
+                self.ui_logger.log_data(f"    {r['人员A']} - {r['人员B']}  {r['变化']}  "
+                                        f"{r['旧强度']:g} -> {r['新强度']:g}")
+            self.ui_logger.log_data("=" * 70)
+            return diff
+
+        def on_result(diff):
+            self.status_var.set(f"快照对比完成：关系变化 {len(diff['关系变化'])} 条，"
+                                f"社区迁移 {diff['概要']['社区迁移人数']} 人")
+            if not messagebox.askyesno("导出", "快照对比完成，是否导出结果表格？"):
+                return
+            save_path = filedialog.asksaveasfilename(defaultextension=".xlsx",
+                                                     filetypes=[("Excel", "*.xlsx"), ("CSV（每表一个文件）", "*.csv")])
+            if not save_path:
+                return
+            try:
+                files = export_snapshot_diff(diff, save_path)
+                self.ui_logger.log_sys("快照对比结果已导出：" + "，".join(files))
             except Exception as e:
-                self.ui_logger.log_sys(f"分析异常：{e}")
-                import traceback
-                traceback.print_exc()
-                messagebox.showerror("分析失败", str(e))
-                self.status_var.set("分析失败")
-            finally:
-                self._set_buttons_state(True)
+                messagebox.showerror("失败", f"导出失败：{e}")
+
+        self.tasks.submit(work, name="快照对比", on_progress=self._on_task_progress, on_result=on_result,
+                          on_error=self._task_error("快照对比失败", "快照对比失败"),
+                          on_cancel=lambda: self.status_var.set("快照对比已取消"))
+
+    def _export_window_series(self):
+        if not messagebox.askyesno("导出", "时间窗口分析完成，是否导出时间序列？"):
+            return
+        save_path = filedialog.asksaveasfilename(defaultextension=".csv",
+                                                 filetypes=[("CSV", "*.csv"), ("Excel", "*.xlsx")])
+        if not save_path:
+            return
+        try:
+            if save_path.endswith('.xlsx'):
+                self.window_series.to_excel(save_path, index=False)
+            else:
+                self.window_series.to_csv(save_path, index=False, encoding='utf-8-sig')
+            self.ui_logger.log_sys(f"时间序列已导出：{save_path}")
+        except Exception as e:
+            messagebox.showerror("失败", f"导出失败：{e}")
 
-        threading.Thread(target=worker, daemon=True).start()
+    def export_profile(self):
+        if not PROFILER.events:
+            messagebox.showinfo("提示", "暂无性能数据，请先运行采集或分析。")
+            return
+        p = filedialog.asksaveasfilename(defaultextension=".json",
+                                         filetypes=[("Chrome Trace", "*.trace.json"), ("JSON 汇总", "*.json")],
+                                         title="导出性能数据")
+        if not p:
+            return
+        try:
+            if p.lower().endswith('.trace.json'):
+                PROFILER.export_chrome_trace(p)
+            else:
+                PROFILER.export_json(p)
+            self.ui_logger.log_sys(f"性能数据已导出：{p}")
+        except Exception as e:
+            messagebox.showerror("导出失败", str(e))
 
     def run_alias_suggestion(self):
         if not self.all_posts:
@@ -989,51 +6164,53 @@ class MomentsApp:
     def _do_alias_suggestion(self, threshold):
         self.ui_logger.log_sys(f"开始从发布者列进行别名聚类（阈值 {threshold}）...")
 
-        def worker():
-            try:
-                suggestions = suggest_aliases_from_publishers(self.all_posts, threshold=threshold)
-                self.last_suggestions = suggestions
-                if not suggestions:
-                    self.ui_logger.log_sys("未发现满足阈值的相似名称。")
-                    messagebox.showinfo("别名建议", "未发现满足阈值的相似名称。")
-                    return
-
-                preview = "\n".join([f"{a}  <->  {b}  (相似度: {s:.3f})"
-                                     for a, b, s in suggestions[:500]])
+        def work(task):
+            mark = PROFILER.mark()
+            suggestions = suggest_aliases_from_publishers(self.all_posts, threshold=threshold)
+            PROFILER.log_summary(self.ui_logger.log_sys, "别名建议耗时统计", since=mark)
+            return suggestions, build_alias_map_from_suggestions(suggestions)
+
+        def on_result(result):
+            suggestions, amap = result
+            self.last_suggestions = suggestions
+            if not suggestions:
+                self.ui_logger.log_sys("未发现满足阈值的相似名称。")
+                messagebox.showinfo("别名建议", "未发现满足阈值的相似名称。")
+                return
 
-                def on_save():
-                    p = filedialog.asksaveasfilename(defaultextension=".json",
-                                                     filetypes=[("JSON", "*.json")])
-                    if not p:
-                        return
-                    try:
-                        with open(p, 'w', encoding='utf-8') as f:
-                            json.dump([{"a": a, "b": b, "score": s} for a, b, s in suggestions],
-                                      f, ensure_ascii=False, indent=2)
-                        messagebox.showinfo("保存成功", f"已保存 {len(suggestions)} 条建议")
-                    except Exception as e:
-                        messagebox.showerror("保存失败", str(e))
-
-                amap = build_alias_map_from_suggestions(suggestions)
-                self._last_auto_alias_map = amap
-                self.ui_logger.log_sys(f"自动生成 alias_map（{len(amap)} 项），可点击'应用别名'应用。")
-
-                preview_dlg = tk.Toplevel(self.master)
-                preview_dlg.title("别名建议预览")
-                preview_dlg.geometry("900x600")
-                txt = tk.Text(preview_dlg, wrap='word', font=(FONT_NAME, 10))
-                txt.pack(padx=6, pady=6, fill='both', expand=True)
-                txt.insert('1.0', preview)
-                txt.configure(state='disabled')
-                btn_frame = ttk.Frame(preview_dlg)
-                btn_frame.pack(pady=6)
-                ttk.Button(btn_frame, text="保存建议", command=on_save).grid(row=0, column=0, padx=6)
-                ttk.Button(btn_frame, text="关闭", command=preview_dlg.destroy).grid(row=0, column=1, padx=6)
-            except Exception as e:
-                self.ui_logger.log_sys(f"别名建议异常：{e}")
-                messagebox.showerror("别名建议失败", str(e))
+            preview = "\n".join([f"{a}  <->  {b}  (相似度: {s:.3f})"
+                                 for a, b, s in suggestions[:500]])
 
-        threading.Thread(target=worker, daemon=True).start()
+            def on_save():
+                p = filedialog.asksaveasfilename(defaultextension=".json",
+                                                 filetypes=[("JSON", "*.json")])
+                if not p:
+                    return
+                try:
+                    with open(p, 'w', encoding='utf-8') as f:
+                        json.dump([{"a": a, "b": b, "score": s} for a, b, s in suggestions],
+                                  f, ensure_ascii=False, indent=2)
+                    messagebox.showinfo("保存成功", f"已保存 {len(suggestions)} 条建议")
+                except Exception as e:
+                    messagebox.showerror("保存失败", str(e))
+
+            self._last_auto_alias_map = amap
+            self.ui_logger.log_sys(f"自动生成 alias_map（{len(amap)} 项），可点击'应用别名'应用。")
+
+            preview_dlg = tk.Toplevel(self.master)
+            preview_dlg.title("别名建议预览")
+            preview_dlg.geometry("900x600")
+            txt = tk.Text(preview_dlg, wrap='word', font=(FONT_NAME, 10))
+            txt.pack(padx=6, pady=6, fill='both', expand=True)
+            txt.insert('1.0', preview)
+            txt.configure(state='disabled')
+            btn_frame = ttk.Frame(preview_dlg)
+            btn_frame.pack(pady=6)
+            ttk.Button(btn_frame, text="保存建议", command=on_save).grid(row=0, column=0, padx=6)
+            ttk.Button(btn_frame, text="关闭", command=preview_dlg.destroy).grid(row=0, column=1, padx=6)
+
+        self.tasks.submit(work, name="别名建议", on_result=on_result,
+                          on_error=self._task_error("别名建议失败", "别名建议失败"))
 
     def apply_alias_map(self):
         amap = getattr(self, '_last_auto_alias_map', None)
@@ -1053,318 +6230,554 @@ class MomentsApp:
             return
 
         self.ui_logger.log_sys("正在生成关系图...")
+        G, analysis = self.graph, self.analysis
 
-        def worker():
-            try:
-                import tkinter.simpledialog as simpledialog
-
-                # 创建新窗口
-                graph_window = tk.Toplevel(self.master)
-                graph_window.title("朋友圈互动关系网络图")
-                graph_window.geometry("1200x800")
-
-                # 创建控制面板
-                control_frame = ttk.Frame(graph_window)
-                control_frame.pack(fill='x', padx=10, pady=10)
-
-                ttk.Label(control_frame, text="可视化选项：", font=(FONT_NAME, 11, "bold")).pack(side='left', padx=5)
-
-                layout_var = tk.StringVar(value="spring")
-                ttk.Label(control_frame, text="布局：").pack(side='left', padx=5)
-                layout_combo = ttk.Combobox(control_frame, textvariable=layout_var,
-                                            values=["spring", "circular", "kamada_kawai"],
-                                            state="readonly", width=12)
-                layout_combo.pack(side='left', padx=2)
-
-                node_size_var = tk.DoubleVar(value=300)
-                ttk.Label(control_frame, text="节点大小：").pack(side='left', padx=5)
-                ttk.Scale(control_frame, from_=50, to=1000, variable=node_size_var,
-                          orient='horizontal', length=150).pack(side='left', padx=2)
-
-                show_labels_var = tk.BooleanVar(value=True)
-                ttk.Checkbutton(control_frame, text="显示标签", variable=show_labels_var).pack(side='left', padx=5)
-
-                show_edges_var = tk.BooleanVar(value=True)
-                ttk.Checkbutton(control_frame, text="显示连接线", variable=show_edges_var).pack(side='left', padx=5)
-
-                # 添加选择特定人员的功能（多选）
-                ttk.Label(control_frame, text="选择人员：").pack(side='left', padx=5)
-                
-                # 创建一个框架来容纳Listbox和滚动条
-                list_frame = ttk.Frame(control_frame)
-                list_frame.pack(side='left', padx=2)
-                
-                # 创建滚动条
-                scrollbar = ttk.Scrollbar(list_frame, orient='vertical')
-                scrollbar.pack(side='right', fill='y')
-                
-                # 过滤掉包含'回复'的人员
-                all_people = [person for person in sorted(list(self.graph.nodes())) if '回复' not in person]
-                
-                # 创建Listbox，设置为多选模式，增大宽度和高度
-                person_listbox = tk.Listbox(list_frame, yscrollcommand=scrollbar.set,
-                                          selectmode='extended', width=25, height=8)
-                person_listbox.pack(side='left', fill='both', expand=True)
-                
-                # 绑定滚动条
-                scrollbar.config(command=person_listbox.yview)
-                
-                # 填充人员列表
-                for person in all_people:
-                    person_listbox.insert('end', person)
-
-                # 添加全选/取消全选按钮
-                def select_all():
-                    person_listbox.select_set(0, 'end')
-                
-                def deselect_all():
-                    person_listbox.selection_clear(0, 'end')
-                
-                select_frame = ttk.Frame(control_frame)
-                select_frame.pack(side='left', padx=2)
-                
-                ttk.Button(select_frame, text="全选", command=select_all, width=5).pack()
-                ttk.Button(select_frame, text="取消全选", command=deselect_all, width=7).pack()
-
-                # 添加关系深度选择
-                ttk.Label(control_frame, text="关系深度：").pack(side='left', padx=5)
-                depth_var = tk.IntVar(value=1)
-                depth_combo = ttk.Combobox(control_frame, textvariable=depth_var,
-                                          values=[1, 2, 3],
-                                          state="readonly", width=5)
-                depth_combo.pack(side='left', padx=2)
-
-                def update_graph():
-                    plt.close('all')
-
-                    G = self.graph
-                    analysis = self.analysis
-
-                    # 处理选择特定人员的情况
-                    selected_indices = person_listbox.curselection()
-                    if selected_indices:
-                        # 获取所有选中的人员
-                        selected_people = [person_listbox.get(i) for i in selected_indices]
-                        
-                        # 获取与选定人员有关系的节点
-                        depth = depth_var.get()
-                        related_nodes = set()
+        def work(task):
+            # 人员列表与默认排序在后台准备，窗口控件只在主线程创建；排序结果缓存在分析结果中
+            all_people = [person for person in sorted(G.nodes()) if '回复' not in person]
+            ranking = analysis_ranking(G, analysis)
+            ranking.order(*DEFAULT_NODE_ORDER)
+            return all_people, ranking
+
+        self.tasks.submit(work, name="关系图", on_result=lambda r: self._open_graph_window(*r),
+                          on_error=self._task_error("生成失败", "生成关系图失败"))
+
+    def _open_graph_window(self, all_people, ranking):
+        try:
+            import tkinter.simpledialog as simpledialog
+
+            # 创建新窗口
+            graph_window = tk.Toplevel(self.master)
+            graph_window.title("朋友圈互动关系网络图")
+            graph_window.geometry("1200x800")
+
+            # 创建控制面板
+            control_frame = ttk.Frame(graph_window)
+            control_frame.pack(fill='x', padx=10, pady=10)
+
+            ttk.Label(control_frame, text="可视化选项：", font=(FONT_NAME, 11, "bold")).pack(side='left', padx=5)
+
+            layout_var = tk.StringVar(value="spring")
+            ttk.Label(control_frame, text="布局：").pack(side='left', padx=5)
+            layout_combo = ttk.Combobox(control_frame, textvariable=layout_var,
+                                        values=["spring", "circular", "kamada_kawai"],
+                                        state="readonly", width=12)
+            layout_combo.pack(side='left', padx=2)
+
+            node_size_var = tk.DoubleVar(value=300)
+            ttk.Label(control_frame, text="节点大小：").pack(side='left', padx=5)
+            ttk.Scale(control_frame, from_=50, to=1000, variable=node_size_var,
+                      orient='horizontal', length=150).pack(side='left', padx=2)
+
+            show_labels_var = tk.BooleanVar(value=True)
+            ttk.Checkbutton(control_frame, text="显示标签", variable=show_labels_var).pack(side='left', padx=5)
+
+            show_edges_var = tk.BooleanVar(value=True)
+            ttk.Checkbutton(control_frame, text="显示连接线", variable=show_edges_var).pack(side='left', padx=5)
+
+            # 添加选择特定人员的功能（多选）
+            ttk.Label(control_frame, text="选择人员：").pack(side='left', padx=5)
+            
+            # 创建一个框架来容纳Listbox和滚动条
+            list_frame = ttk.Frame(control_frame)
+            list_frame.pack(side='left', padx=2)
+            
+            # 创建滚动条
+            scrollbar = ttk.Scrollbar(list_frame, orient='vertical')
+            scrollbar.pack(side='right', fill='y')
+            
+            # 创建Listbox，设置为多选模式，增大宽度和高度
+            person_listbox = tk.Listbox(list_frame, yscrollcommand=scrollbar.set,
+                                      selectmode='extended', width=25, height=8)
+            person_listbox.pack(side='left', fill='both', expand=True)
+            
+            # 绑定滚动条
+            scrollbar.config(command=person_listbox.yview)
+            
+            # 填充人员列表
+            for person in all_people:
+                person_listbox.insert('end', person)
+
+            # 添加全选/取消全选按钮
+            def select_all():
+                person_listbox.select_set(0, 'end')
+            
+            def deselect_all():
+                person_listbox.selection_clear(0, 'end')
+            
+            select_frame = ttk.Frame(control_frame)
+            select_frame.pack(side='left', padx=2)
+            
+            ttk.Button(select_frame, text="全选", command=select_all, width=5).pack()
+            ttk.Button(select_frame, text="取消全选", command=deselect_all, width=7).pack()
+
+            # 添加关系深度选择
+            ttk.Label(control_frame, text="关系深度：").pack(side='left', padx=5)
+            depth_var = tk.IntVar(value=1)
+            depth_combo = ttk.Combobox(control_frame, textvariable=depth_var,
+                                      values=[1, 2, 3],
+                                      state="readonly", width=5)
+            depth_combo.pack(side='left', padx=2)
+
+            # 当前窗口最近一次生成的图表，导出时保存它而不是 pyplot 的"当前图"
+            chart = {'fig': None}
+
+            def update_graph():
+                plt.close('all')
+
+                G = self.graph
+                analysis = self.analysis
+
+                # 处理选择特定人员的情况
+                selected_indices = person_listbox.curselection()
+                if selected_indices:
+                    # 获取所有选中的人员
+                    selected_people = [person_listbox.get(i) for i in selected_indices]
+                    
+                    # 获取与选定人员有关系的节点
+                    depth = depth_var.get()
+                    related_nodes = set()
+                    
+                    for person in selected_people:
+                        related_nodes.add(person)
                         
-                        for person in selected_people:
-                            related_nodes.add(person)
+                        if depth >= 1:
+                            # 一级关系
+                            for neighbor in nx.all_neighbors(G, person):
+                                related_nodes.add(neighbor)
                             
-                            if depth >= 1:
-                                # 一级关系
-                                for neighbor in G.neighbors(person):
+                        if depth >= 2:
+                            # 二级关系
+                            level1 = list(nx.all_neighbors(G, person))
+                            for n in level1:
+                                for neighbor in nx.all_neighbors(G, n):
                                     related_nodes.add(neighbor)
-                                
-                            if depth >= 2:
-                                # 二级关系
-                                level1 = list(G.neighbors(person))
-                                for n in level1:
-                                    for neighbor in G.neighbors(n):
+                            
+                        if depth >= 3:
+                            # 三级关系
+                            level1 = list(nx.all_neighbors(G, person))
+                            for n in level1:
+                                level2 = list(nx.all_neighbors(G, n))
+                                for neighbor in level2:
+                                    if neighbor not in related_nodes:
                                         related_nodes.add(neighbor)
-                                
-                            if depth >= 3:
-                                # 三级关系
-                                level1 = list(G.neighbors(person))
-                                for n in level1:
-                                    level2 = list(G.neighbors(n))
-                                    for neighbor in level2:
-                                        if neighbor not in related_nodes:
-                                            related_nodes.add(neighbor)
-                                        for level3_neighbor in G.neighbors(neighbor):
-                                            related_nodes.add(level3_neighbor)
-                        
-                        # 创建子图
-                        G = G.subgraph(related_nodes)
-                        
-                        # 记录选中的人员用于标题显示
-                        selected_person = ', '.join(selected_people[:3])
-                        if len(selected_people) > 3:
-                            selected_person += f' 等{len(selected_people)}人'
-                    else:
-                        selected_person = "全部人员"
-
-                    fig, ax = plt.subplots(figsize=(12, 8), dpi=100)
-                    fig.patch.set_facecolor('#f5f5f5')
-
-                    # 选择布局
-                    layout_type = layout_var.get()
-                    if layout_type == "spring":
+                                    for level3_neighbor in nx.all_neighbors(G, neighbor):
+                                        related_nodes.add(level3_neighbor)
+                    
+                    # 创建子图
+                    G = G.subgraph(related_nodes)
+                    
+                    # 记录选中的人员用于标题显示
+                    selected_person = ', '.join(selected_people[:3])
+                    if len(selected_people) > 3:
+                        selected_person += f' 等{len(selected_people)}人'
+                else:
+                    selected_person = "全部人员"
+
+                fig, ax = plt.subplots(figsize=(12, 8), dpi=100)
+                fig.patch.set_facecolor('#f5f5f5')
+                chart['fig'] = fig
+
+                # 选择布局
+                layout_type = layout_var.get()
+                if layout_type == "spring":
+                    pos = nx.spring_layout(G, k=0.5, iterations=50, seed=42)
+                elif layout_type == "circular":
+                    pos = nx.circular_layout(G)
+                else:  # kamada_kawai
+                    try:
+                        pos = nx.kamada_kawai_layout(G)
+                    except:
                         pos = nx.spring_layout(G, k=0.5, iterations=50, seed=42)
-                    elif layout_type == "circular":
-                        pos = nx.circular_layout(G)
-                    else:  # kamada_kawai
-                        try:
-                            pos = nx.kamada_kawai_layout(G)
-                        except:
-                            pos = nx.spring_layout(G, k=0.5, iterations=50, seed=42)
-
-                    # 绘制边
-                    if show_edges_var.get():
-                        # 创建一个仅包含有点赞的边的子图
-                        # 评论数据仍然参与计算权重和中心性，但不在关系图中显示
-                        edges_with_likes = [(u, v) for u, v, d in G.edges(data=True) if d.get('likes', 0) > 0]
-                        
-                        # 绘制有点赞的边
-                        if edges_with_likes:
-                            nx.draw_networkx_edges(G, pos, ax=ax, alpha=0.3, width=1.5,
-                                                   edge_color='#999999', edge_cmap=plt.cm.Blues,
-                                                   edgelist=edges_with_likes)
-
-                    # 计算节点颜色（根据度中心性）
-                    degree_cent = analysis.get('degree_centrality', {})
-                    node_colors = [degree_cent.get(node, 0) for node in G.nodes()]
-
-                    # 计算节点大小（根据度）
-                    node_size = node_size_var.get()
-                    node_sizes = [node_size * (1 + degree_cent.get(node, 0.1)) for node in G.nodes()]
-
-                    # 绘制节点
-                    nodes = nx.draw_networkx_nodes(G, pos, ax=ax,
-                                                   node_color=node_colors,
-                                                   node_size=node_sizes,
-                                                   cmap=plt.cm.RdYlGn,
-                                                   alpha=0.8,
-                                                   vmin=0, vmax=1)
-
-                    # 绘制标签
-                    if show_labels_var.get():
-                        nx.draw_networkx_labels(G, pos, ax=ax, font_size=8,
-                                                font_family=FONT_NAME)
-
-                    # 添加图例和信息
-                    info_text = f"""网络统计信息
+
+                # 绘制边
+                if show_edges_var.get():
+                    # 创建一个仅包含有点赞的边的子图
+                    # 评论数据仍然参与计算权重和中心性，但不在关系图中显示
+                    edges_with_likes = [(u, v) for u, v, d in G.edges(data=True) if d.get('likes', 0) > 0]
+                    
+                    # 绘制有点赞的边
+                    if edges_with_likes:
+                        nx.draw_networkx_edges(G, pos, ax=ax, alpha=0.3, width=1.5,
+                                               edge_color='#999999', edge_cmap=plt.cm.Blues,
+                                               edgelist=edges_with_likes)
+
+                # 计算节点颜色（根据度中心性）
+                degree_cent = analysis.get('degree_centrality', {})
+                node_colors = [degree_cent.get(node, 0) for node in G.nodes()]
+
+                # 计算节点大小（根据度）
+                node_size = node_size_var.get()
+                node_sizes = [node_size * (1 + degree_cent.get(node, 0.1)) for node in G.nodes()]
+
+                # 绘制节点
+                nodes = nx.draw_networkx_nodes(G, pos, ax=ax,
+                                               node_color=node_colors,
+                                               node_size=node_sizes,
+                                               cmap=plt.cm.RdYlGn,
+                                               alpha=0.8,
+                                               vmin=0, vmax=1)
+
+                # 绘制标签
+                if show_labels_var.get():
+                    nx.draw_networkx_labels(G, pos, ax=ax, font_size=8,
+                                            font_family=FONT_NAME)
+
+                # 添加图例和信息
+                info_text = f"""网络统计信息
 节点数（人）：{analysis.get('num_nodes', 0)}
 边数（关系）：{analysis.get('num_edges', 0)}
 网络密度：{analysis.get('network_density', 0):.4f}
 平均互动强度：{analysis.get('avg_weight', 0):.2f}"""
 
-                    ax.text(0.02, 0.98, info_text, transform=ax.transAxes,
-                            fontsize=10, verticalalignment='top',
-                            bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8),
-                            fontproperties={'family': FONT_NAME, 'size': 9})
-
-                    # 添加颜色条
-                    sm = plt.cm.ScalarMappable(cmap=plt.cm.RdYlGn,
-                                               norm=plt.Normalize(vmin=0, vmax=1))
-                    sm.set_array([])
-                    cbar = plt.colorbar(sm, ax=ax, fraction=0.046, pad=0.04)
-                    cbar.set_label('度中心性', fontproperties={'family': FONT_NAME, 'size': 9})
-
-                    # 根据是否选择了特定人员来设置标题
-                    if selected_person != "全部人员":
-                        depth_text = {1: "直接关系", 2: "朋友的朋友", 3: "三级关系"}.get(depth, "关系")
-                        ax.set_title(f'{selected_person}的朋友圈{depth_text}网络', fontsize=14,
-                                    fontproperties={'family': FONT_NAME, 'size': 12, 'weight': 'bold'})
-                    else:
-                        ax.set_title('朋友圈互动关系网络', fontsize=14,
-                                    fontproperties={'family': FONT_NAME, 'size': 12, 'weight': 'bold'})
-                    ax.axis('off')
-                    plt.tight_layout()
-                    plt.show()
-
-                ttk.Button(control_frame, text="生成图表", command=update_graph).pack(side='left', padx=20)
+                ax.text(0.02, 0.98, info_text, transform=ax.transAxes,
+                        fontsize=10, verticalalignment='top',
+                        bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8),
+                        fontproperties={'family': FONT_NAME, 'size': 9})
+
+                # 添加颜色条
+                sm = plt.cm.ScalarMappable(cmap=plt.cm.RdYlGn,
+                                           norm=plt.Normalize(vmin=0, vmax=1))
+                sm.set_array([])
+                cbar = plt.colorbar(sm, ax=ax, fraction=0.046, pad=0.04)
+                cbar.set_label('度中心性', fontproperties={'family': FONT_NAME, 'size': 9})
+
+                # 根据是否选择了特定人员来设置标题
+                if selected_person != "全部人员":
+                    depth_text = {1: "直接关系", 2: "朋友的朋友", 3: "三级关系"}.get(depth, "关系")
+                    ax.set_title(f'{selected_person}的朋友圈{depth_text}网络', fontsize=14,
+                                fontproperties={'family': FONT_NAME, 'size': 12, 'weight': 'bold'})
+                else:
+                    ax.set_title('朋友圈互动关系网络', fontsize=14,
+                                fontproperties={'family': FONT_NAME, 'size': 12, 'weight': 'bold'})
+                ax.axis('off')
+                plt.tight_layout()
+                plt.show()
+
+            ttk.Button(control_frame, text="生成图表", command=update_graph).pack(side='left', padx=20)
+
+            # 创建信息展示区
+            info_frame = ttk.LabelFrame(graph_window, text="节点详细信息（双击查看人员互动明细，点击列标题排序）",
+                                        padding=5)
+            info_frame.pack(fill='both', expand=True, padx=10, pady=10)
+
+            # 创建树形视图
+            columns = ("节点", "度中心性", "介数中心性", "PageRank", "k-核", "所属社区", "互动数")
+            info_tree = ttk.Treeview(info_frame, columns=columns, show='headings', height=20)
+
+            col_widths = {"节点": 150, "度中心性": 100, "介数中心性": 100, "PageRank": 100, "k-核": 60,
+                          "所属社区": 80, "互动数": 80}
+            # 可排序的列：(指标, 并列时依次比较的指标)
+            sort_columns = {"度中心性": DEFAULT_NODE_ORDER, "介数中心性": ('betweenness', ('degree_centrality',)),
+                            "PageRank": ('pagerank', ('degree_centrality',)),
+                            "k-核": ('core_number', ('degree_centrality', 'pagerank')),
+                            "互动数": ('degree', ('pagerank',))}
+            table = {'sort': "度中心性", 'page': 0}
+            communities = self.analysis.get('communities', {})
+            columns_values = {key: np.nan_to_num(ranking.values(key))
+                              for key in ('degree_centrality', 'betweenness', 'pagerank', 'core_number', 'degree')}
+
+            def show_page():
+                # 每页只取当前排序的一段下标，排序本身按列缓存，翻页和切换列不重复排序
+                key, ties = sort_columns[table['sort']]
+                pages = max(1, -(-len(ranking) // NODE_TABLE_PAGE_SIZE))
+                table['page'] = min(max(table['page'], 0), pages - 1)
+                info_tree.delete(*info_tree.get_children())
+                for i in ranking.page(key, table['page'] * NODE_TABLE_PAGE_SIZE, NODE_TABLE_PAGE_SIZE, ties).tolist():
+                    node = ranking.nodes[i]
+                    info_tree.insert('', 'end', values=(
+                        node,
+                        f"{columns_values['degree_centrality'][i]:.4f}",
+                        f"{columns_values['betweenness'][i]:.4f}",
+                        f"{columns_values['pagerank'][i]:.4f}",
+                        f"{int(columns_values['core_number'][i])}",
+                        f"社区 {communities.get(node, -1) + 1}",
+                        f"{int(columns_values['degree'][i])}"
+                    ))
+                for col in sort_columns:
+                    info_tree.heading(col, text=col + (" ▼" if col == table['sort'] else ""))
+                page_var.set(f"按{table['sort']}排序  第 {table['page'] + 1}/{pages} 页（共 {len(ranking)} 人）")
 
-                # 创建信息展示区
-                info_frame = ttk.LabelFrame(graph_window, text="节点详细信息", padding=5)
-                info_frame.pack(fill='both', expand=True, padx=10, pady=10)
+            def sort_by(col):
+                table['sort'], table['page'] = col, 0
+                show_page()
 
-                # 创建树形视图
-                columns = ("节点", "度中心性", "介数中心性", "所属社区", "互动数")
-                info_tree = ttk.Treeview(info_frame, columns=columns, show='headings', height=20)
+            def turn_page(delta):
+                table['page'] += delta
+                show_page()
 
-                col_widths = {"节点": 150, "度中心性": 100, "介数中心性": 100, "所属社区": 80, "互动数": 80}
-                for col in columns:
+            for col in columns:
+                if col in sort_columns:
+                    info_tree.heading(col, text=col, command=lambda c=col: sort_by(c))
+                else:
                     info_tree.heading(col, text=col)
-                    info_tree.column(col, width=col_widths[col], anchor='w')
+                info_tree.column(col, width=col_widths[col], anchor='w')
+
+            page_frame = ttk.Frame(info_frame)
+            page_frame.pack(side='bottom', fill='x')
+            page_var = tk.StringVar()
+            ttk.Button(page_frame, text="上一页", command=lambda: turn_page(-1)).pack(side='left', padx=5)
+            ttk.Button(page_frame, text="下一页", command=lambda: turn_page(1)).pack(side='left', padx=5)
+            ttk.Label(page_frame, textvariable=page_var).pack(side='left', padx=10)
+
+            vsb = ttk.Scrollbar(info_frame, orient='vertical', command=info_tree.yview)
+            vsb.pack(side='right', fill='y')
+            info_tree.configure(yscrollcommand=vsb.set)
+            info_tree.pack(fill='both', expand=True)
+            show_page()
+
+            def on_node_double_click(event):
+                iid = info_tree.identify_row(event.y)
+                if iid:
+                    self.show_person_detail(info_tree.item(iid, 'values')[0])
+
+            info_tree.bind('<Double-1>', on_node_double_click)
+
+            # 导出功能
+            export_frame = ttk.Frame(graph_window)
+            export_frame.pack(fill='x', padx=10, pady=10)
+
+            def export_graph():
+                if chart['fig'] is None:
+                    messagebox.showwarning("提示", "请先点击\"生成图表\"。")
+                    return
+                save_path = filedialog.asksaveasfilename(
+                    defaultextension=".png",
+                    filetypes=[("PNG图片", "*.png"), ("PDF", "*.pdf"), ("SVG", "*.svg")]
+                )
+                if save_path:
+                    try:
+                        chart['fig'].savefig(save_path, dpi=300, bbox_inches='tight')
+                        messagebox.showinfo("成功", f"关系图已保存到：{save_path}")
+                        self.ui_logger.log_sys(f"关系图已导出：{save_path}")
+                    except Exception as e:
+                        messagebox.showerror("失败", f"导出失败：{e}")
+
+            def export_node_data():
+                save_path = filedialog.asksaveasfilename(
+                    defaultextension=".xlsx",
+                    filetypes=[("Excel", "*.xlsx"), ("CSV", "*.csv")]
+                )
+                if save_path:
+                    try:
+                        # 与节点表默认顺序一致，复用已缓存的排序
+                        ranking = analysis_ranking(self.graph, self.analysis)
+                        order = ranking.order(*DEFAULT_NODE_ORDER)
+                        communities = self.analysis.get('communities', {})
+                        nodes = [ranking.nodes[i] for i in order.tolist()]
+
+                        def column(key):
+                            return np.nan_to_num(ranking.values(key)[order])
+
+                        df = pd.DataFrame({
+                            '节点': nodes,
+                            '度': column('degree').astype(np.int64),
+                            '度中心性': column('degree_centrality'),
+                            '介数中心性': column('betweenness'),
+                            'PageRank': column('pagerank'),
+                            '枢纽值': column('hubs'),
+                            '权威值': column('authorities'),
+                            'k-核': column('core_number').astype(np.int64),
+                            '所属社区': [communities.get(node, -1) + 1 for node in nodes]
+                        })
+                        if save_path.endswith('.xlsx'):
+                            df.to_excel(save_path, index=False)
+                        else:
+                            df.to_csv(save_path, index=False, encoding='utf-8')
+
+                        messagebox.showinfo("成功", f"数据已保存到：{save_path}")
+                        self.ui_logger.log_sys(f"节点数据已导出：{save_path}")
+                    except Exception as e:
+                        messagebox.showerror("失败", f"导出失败：{e}")
+
+            def export_network():
+                save_path = filedialog.asksaveasfilename(
+                    defaultextension=".graphml",
+                    filetypes=[("GraphML", "*.graphml"), ("GEXF", "*.gexf"), ("边表 CSV (gzip)", "*.csv.gz"),
+                               ("GraphML (gzip)", "*.graphml.gz"), ("GEXF (gzip)", "*.gexf.gz")]
+                )
+                if not save_path:
+                    return
+                G, analysis = self.graph, self.analysis
 
-                # 填充数据
-                degree_cent = self.analysis.get('degree_centrality', {})
-                betweenness = self.analysis.get('betweenness', {})
-                communities = self.analysis.get('communities', {})
+                def on_result(info):
+                    files = "\n".join(info['files'])
+                    self.ui_logger.log_sys(f"网络已导出：{info['nodes']} 个节点，{info['edges']} 条边 -> {files}")
+                    messagebox.showinfo("成功", f"网络已导出（{info['nodes']} 个节点，{info['edges']} 条边）：\n{files}")
 
-                for node in sorted(self.graph.nodes(),
-                                   key=lambda x: degree_cent.get(x, 0), reverse=True):
-                    degree = self.graph.degree(node)
-                    info_tree.insert('', 'end', values=(
-                        node,
-                        f"{degree_cent.get(node, 0):.4f}",
-                        f"{betweenness.get(node, 0):.4f}",
-                        f"社区 {communities.get(node, -1) + 1}",
-                        f"{degree}"
-                    ))
+                self.tasks.submit(lambda task: export_graph_file(G, analysis, save_path), name="导出网络",
+                                  on_result=on_result, on_error=self._task_error("导出失败", "网络导出失败"))
 
-                vsb = ttk.Scrollbar(info_frame, orient='vertical', command=info_tree.yview)
-                vsb.pack(side='right', fill='y')
-                info_tree.configure(yscrollcommand=vsb.set)
-                info_tree.pack(fill='both', expand=True)
+            def export_html():
+                save_path = filedialog.asksaveasfilename(defaultextension=".html", filetypes=[("网页", "*.html")])
+                if not save_path:
+                    return
+                G, analysis = self.graph, self.analysis
 
-                # 导出功能
-                export_frame = ttk.Frame(graph_window)
-                export_frame.pack(fill='x', padx=10, pady=10)
+                def on_result(info):
+                    size = info['bytes'] / 1024 / 1024
+                    self.ui_logger.log_sys(f"交互网页已导出：{info['nodes']} 个节点，{info['edges']} 条边，"
+                                           f"{size:.1f} MB -> {save_path}")
+                    messagebox.showinfo("成功", f"交互网页已导出（{size:.1f} MB），可直接用浏览器离线打开：\n{save_path}")
 
-                def export_graph():
-                    save_path = filedialog.asksaveasfilename(
-                        defaultextension=".png",
-                        filetypes=[("PNG图片", "*.png"), ("PDF", "*.pdf"), ("SVG", "*.svg")]
-                    )
-                    if save_path:
-                        try:
-                            plt.savefig(save_path, dpi=300, bbox_inches='tight')
-                            messagebox.showinfo("成功", f"关系图已保存到：{save_path}")
-                            self.ui_logger.log_sys(f"关系图已导出：{save_path}")
-                        except Exception as e:
-                            messagebox.showerror("失败", f"导出失败：{e}")
-
-                def export_node_data():
+                self.tasks.submit(lambda task: export_html_viewer(G, analysis, save_path), name="导出交互网页",
+                                  on_result=on_result, on_error=self._task_error("导出失败", "交互网页导出失败"))
+
+            def batch_export():
+                out_dir = filedialog.askdirectory(title="选择图片输出目录")
+                if not out_dir:
+                    return
+                G, analysis = self.graph, self.analysis
+                people = [person_listbox.get(i) for i in person_listbox.curselection()]
+                depth, node_size = depth_var.get(), node_size_var.get()
+
+                def work(task):
+                    task.progress(0, None, "正在计算布局...")
+                    # 选中了人员时为每人各出一张关系网，否则为每个社区各出一张
+                    return batch_render_images(G, analysis, out_dir, people=people,
+                                               communities=() if people else 'all', depth=depth,
+                                               node_size=node_size, log_sys=self.ui_logger.log_sys,
+                                               progress_callback=lambda done, total, name: task.progress(
+                                                   done, total, f"正在出图：{name}（{done}/{total}）"))
+
+                def on_result(results):
+                    total = sum(r['用时'] for r in results)
+                    self.ui_logger.log_sys(f"批量出图完成：{len(results)} 张，渲染合计 {total:.1f}s -> {out_dir}")
+                    messagebox.showinfo("成功", f"已生成 {len(results)} 张图片：\n{out_dir}")
+
+                self.tasks.submit(work, name="批量出图", on_progress=self._on_task_progress, on_result=on_result,
+                                  on_error=self._task_error("出图失败", "批量出图失败"))
+
+            def predict_ties():
+                G = self.graph
+
+                def work(task):
+                    task.progress(0, None, "正在计算潜在关系...")
+                    return predict_links(G, k=10, log_sys=self.ui_logger.log_sys,
+                                         progress_callback=lambda done, total: task.progress(
+                                             done, total, f"正在计算潜在关系（{done}/{total}）"))
+
+                def on_result(result):
+                    candidates, ties = result
+                    self.ui_logger.log_data("=" * 70)
+                    self.ui_logger.log_data("【潜在关系预测】共同好友多、且共同好友本身交友不广的两人更可能相识（Adamic-Adar）")
+                    for _, r in candidates.nlargest(15, 'Adamic-Adar').iterrows():
+                        self.ui_logger.log_data(f"  {r['人员']} - {r['候选']}  Adamic-Adar {r['Adamic-Adar']:.3f}  "
+                                                f"共同好友 {r['共同好友数']}")
+                    self.ui_logger.log_data("=" * 70)
+                    if not messagebox.askyesno("导出", f"已为 {candidates['人员'].nunique()} 人计算潜在关系，是否导出？"):
+                        return
                     save_path = filedialog.asksaveasfilename(
-                        defaultextension=".xlsx",
-                        filetypes=[("Excel", "*.xlsx"), ("CSV", "*.csv")]
-                    )
-                    if save_path:
-                        try:
-                            degree_cent = self.analysis.get('degree_centrality', {})
-                            betweenness = self.analysis.get('betweenness', {})
-                            communities = self.analysis.get('communities', {})
-
-                            rows = []
-                            for node in self.graph.nodes():
-                                rows.append({
-                                    '节点': node,
-                                    '度': self.graph.degree(node),
-                                    '度中心性': degree_cent.get(node, 0),
-                                    '介数中心性': betweenness.get(node, 0),
-                                    '所属社区': communities.get(node, -1) + 1
-                                })
-
-                            df = pd.DataFrame(rows)
-                            if save_path.endswith('.xlsx'):
-                                df.to_excel(save_path, index=False)
-                            else:
-                                df.to_csv(save_path, index=False, encoding='utf-8')
-
-                            messagebox.showinfo("成功", f"数据已保存到：{save_path}")
-                            self.ui_logger.log_sys(f"节点数据已导出：{save_path}")
-                        except Exception as e:
-                            messagebox.showerror("失败", f"导出失败：{e}")
-
-                ttk.Button(export_frame, text="导出图表(PNG/PDF/SVG)", command=export_graph).pack(side='left', padx=5)
-                ttk.Button(export_frame, text="导出节点数据(Excel/CSV)", command=export_node_data).pack(side='left',
-                                                                                                        padx=5)
-
-                # 生成初始图表
-                update_graph()
-                self.ui_logger.log_sys("关系图已生成。")
+                        defaultextension=".xlsx", filetypes=[("Excel", "*.xlsx"), ("CSV（每表一个文件）", "*.csv")])
+                    if not save_path:
+                        return
+                    try:
+                        files = export_tables([('潜在关系', candidates), ('关系强度', ties)], save_path)
+                        self.ui_logger.log_sys("潜在关系已导出：" + "，".join(files))
+                    except Exception as e:
+                        messagebox.showerror("失败", f"导出失败：{e}")
 
-            except Exception as e:
-                self.ui_logger.log_sys(f"生成关系图异常：{e}")
-                import traceback
-                traceback.print_exc()
-                messagebox.showerror("生成失败", str(e))
+                self.tasks.submit(work, name="潜在关系预测", on_progress=self._on_task_progress, on_result=on_result,
+                                  on_error=self._task_error("预测失败", "潜在关系预测失败"))
+
+            ttk.Button(export_frame, text="导出图表(PNG/PDF/SVG)", command=export_graph).pack(side='left', padx=5)
+            ttk.Button(export_frame, text="批量出图(人员/社区)", command=batch_export).pack(side='left', padx=5)
+            ttk.Button(export_frame, text="导出节点数据(Excel/CSV)", command=export_node_data).pack(side='left',
+                                                                                                    padx=5)
+            ttk.Button(export_frame, text="导出网络(GraphML/GEXF/CSV)", command=export_network).pack(side='left',
+                                                                                                    padx=5)
+            ttk.Button(export_frame, text="导出交互网页(HTML)", command=export_html).pack(side='left', padx=5)
+            ttk.Button(export_frame, text="潜在关系预测", command=predict_ties).pack(side='left', padx=5)
+
+            # 生成初始图表
+            update_graph()
+            self.ui_logger.log_sys("关系图已生成。")
+
+        except Exception as e:
+            self.ui_logger.log_sys(f"生成关系图异常：{e}")
+            import traceback
+            traceback.print_exc()
+            messagebox.showerror("生成失败", str(e))
+
+    def show_person_detail(self, name):
+        """人员互动明细：各角色涉及的帖子与互动最强的关系，选中关系时只列出支撑该关系的帖子"""
+        index = self.person_index
+        if index is None:
+            messagebox.showwarning("提示", "请先完成关系网分析。")
+            return
+        roles = index.person(name)
+        ties = index.strongest_ties(name, k=50)
+
+        win = tk.Toplevel(self.master)
+        win.title(f"人员互动明细：{name}")
+        win.geometry("1000x640")
+        summary = "，".join(f"{role} {len(pids)} 条" for role, pids in roles.items())
+        ttk.Label(win, text=f"{name}：{summary}，关系 {len(index.neighbors.get(index.norm(name), ()))} 人",
+                  font=(FONT_NAME, 11, "bold")).pack(padx=8, pady=6, anchor='w')
+
+        pane = ttk.PanedWindow(win, orient='horizontal')
+        pane.pack(fill='both', expand=True, padx=8, pady=4)
+
+        tie_frame = ttk.LabelFrame(pane, text="关系最密切（按互动强度）", padding=4)
+        tie_columns = ("人员", "强度", "点赞", "评论", "回复", "帖子数")
+        tie_tree = ttk.Treeview(tie_frame, columns=tie_columns, show='headings', height=20)
+        tie_widths = {"人员": 120, "强度": 50, "点赞": 45, "评论": 45, "回复": 45, "帖子数": 55}
+        for col in tie_columns:
+            tie_tree.heading(col, text=col)
+            tie_tree.column(col, width=tie_widths[col], anchor='w')
+        tie_tree.pack(fill='both', expand=True)
+        pane.add(tie_frame, weight=1)
+
+        post_frame = ttk.LabelFrame(pane, text="相关帖子", padding=4)
+        post_columns = ("编号", "角色", "发布者", "内容", "时间")
+        post_tree = ttk.Treeview(post_frame, columns=post_columns, show='headings', height=20)
+        post_widths = {"编号": 60, "角色": 50, "发布者": 100, "内容": 320, "时间": 90}
+        for col in post_columns:
+            post_tree.heading(col, text=col)
+            post_tree.column(col, width=post_widths[col], anchor='w')
+        vsb = ttk.Scrollbar(post_frame, orient='vertical', command=post_tree.yview)
+        vsb.pack(side='right', fill='y')
+        post_tree.configure(yscrollcommand=vsb.set)
+        post_tree.pack(fill='both', expand=True)
+        pane.add(post_frame, weight=2)
+
+        def fill_posts(rows):
+            post_tree.delete(*post_tree.get_children())
+            for pid, role in rows:
+                post = index.post(pid) or {}
+                post_tree.insert('', 'end', values=(
+                    pid, role, post.get('发布者', ''), str(post.get('内容', '') or '')[:100],
+                    format_time_display(post.get('时间', ''), post.get('时间戳'))))
+
+        def person_rows():
+            return [(pid, role) for role, pids in roles.items() for pid in pids]
+
+        for other, weight, n_posts in ties:
+            edge = index.edge(name, other)
+            tie_tree.insert('', 'end', values=(other, f"{weight:g}", edge[KIND_LIKE], edge[KIND_COMMENT],
+                                               edge[KIND_REPLY], n_posts))
+
+        def on_tie_select(event=None):
+            sel = tie_tree.selection()
+            if not sel:
+                post_frame.configure(text="相关帖子")
+                fill_posts(person_rows())
+                return
+            other = tie_tree.item(sel[0], 'values')[0]
+            post_frame.configure(text=f"{name} 与 {other} 的互动帖子")
+            fill_posts([(pid, "关系") for pid in index.edge(name, other)['帖子']])
+
+        def show_all():
+            # 清空选择会触发 on_tie_select，由其恢复完整帖子列表
+            tie_tree.selection_remove(*tie_tree.selection())
+
+        tie_tree.bind('<<TreeviewSelect>>', on_tie_select)
+        btn_frame = ttk.Frame(win)
+        btn_frame.pack(pady=6)
+        ttk.Button(btn_frame, text="显示全部帖子", command=show_all).grid(row=0, column=0, padx=6)
+        ttk.Button(btn_frame, text="关闭", command=win.destroy).grid(row=0, column=1, padx=6)
+        fill_posts(person_rows())
 
-        threading.Thread(target=worker, daemon=True).start()
     def show_data_interpretation(self):
         """显示软件使用手册"""
         dlg = tk.Toplevel(self.master)
@@ -1451,4 +6864,14 @@ def main():
 
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    if "--bench" in sys.argv[1:]:
+        sys.exit(bench_main(sys.argv[1:]))
+    if "--diff" in sys.argv[1:]:
+        sys.exit(diff_main(sys.argv[1:]))
+    if "--render" in sys.argv[1:]:
+        sys.exit(render_main(sys.argv[1:]))
+    if "--person" in sys.argv[1:]:
+        sys.exit(person_main(sys.argv[1:]))
     main()
\ No newline at end of file